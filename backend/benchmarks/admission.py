@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Check LLM admission control against the stub provider.
+
+Runs the application lifespan in-process with small admission limits and
+sends a burst of ``--requests`` concurrent Anthropic chat turns, each in its
+own conversation. The script checks that:
+
+* the stub never sees more than ``--max-concurrency`` calls in flight
+* requests beyond the queue get a fast 429 with a ``Retry-After`` header,
+  and a rejected turn stores no user message
+* a turn answered from the response cache is served even when the queue is
+  full
+* the p99 latency of admitted requests stays within the queue deadline plus
+  the upstream latency
+* queued requests are served round-robin across conversations, so one busy
+  conversation does not starve the others
+* an upstream 429 halves the provider limit and pauses admissions, and the
+  limit recovers after successful calls
+* ``retry-after`` and rate-limit reset headers are parsed in all formats
+
+Usage (from the backend directory):
+    python -m benchmarks.admission [--requests 60] [--max-concurrency 4] [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.stubs import StubServer, create_provider_app
+
+MODEL = "claude-3-5-sonnet-20241022"
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+def _percentile(values: list, percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def _timed_post(client, path: str, body: dict):
+    start = time.perf_counter()
+    response = await client.post(path, json=body)
+    return response, time.perf_counter() - start
+
+
+async def check_burst(requests: int, max_concurrency: int, latency: float, queue_timeout: float, app) -> bool:
+    import httpx
+    from main import app as chat_app
+    from services.conversation import conversation_manager
+    from services.llm import llm_service
+
+    ok = True
+    async with chat_app.router.lifespan_context(chat_app):
+        # Keep the SDK warm-up out of the measurements
+        await llm_service.ready()
+        transport = httpx.ASGITransport(app=chat_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://chat", timeout=60) as client:
+            body = {"message": "Which roles fit a data engineer?", "model_provider": "anthropic",
+                    "model_name": MODEL, "use_cache": False}
+            results = await asyncio.gather(*(
+                _timed_post(client, f"/chat/conversations/burst-{i}/messages", body) for i in range(requests)
+            ))
+            admitted = [elapsed for response, elapsed in results if response.status_code == 200]
+            rejected = [(response, elapsed) for response, elapsed in results if response.status_code == 429]
+            other = [response.status_code for response, _ in results if response.status_code not in (200, 429)]
+
+            ok &= _check("upstream concurrency within the limit",
+                         0 < app.state.max_in_flight <= max_concurrency and not other,
+                         f"max {app.state.max_in_flight} in flight (limit {max_concurrency}), "
+                         f"{len(admitted)} admitted, {len(rejected)} rejected")
+
+            fast = max((elapsed for _, elapsed in rejected), default=0.0)
+            ok &= _check("overflow gets a fast 429 with Retry-After",
+                         bool(rejected) and all(r.headers.get("retry-after", "").isdigit() for r, _ in rejected)
+                         and fast < latency,
+                         f"slowest rejection {fast * 1000:.1f} ms, "
+                         f"Retry-After {rejected[0][0].headers.get('retry-after') if rejected else None}s")
+
+            stored = sum(len(c.messages) for c in conversation_manager.get_all_conversations())
+            ok &= _check("rejected turns store nothing", stored == 2 * len(admitted),
+                         f"{stored} messages for {len(admitted)} admitted turns")
+
+            p99 = _percentile(admitted, 99)
+            ok &= _check("admitted p99 within the queue deadline", p99 <= queue_timeout + latency * 2,
+                         f"p50 {_percentile(admitted, 50) * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms")
+
+            # A turn the response cache answers needs no slot, even with the queue full
+            cached = dict(body, use_cache=True)
+            await client.post("/chat/conversations/cached-0/messages", json=cached)
+            burst = [_timed_post(client, f"/chat/conversations/busy-{i}/messages", body) for i in range(requests)]
+            results = await asyncio.gather(*burst, _timed_post(client, "/chat/conversations/cached-1/messages", cached))
+            (hit, elapsed), busy = results[-1], [response.status_code for response, _ in results[:-1]]
+            ok &= _check("cache hits skip admission", hit.status_code == 200 and 429 in busy,
+                         f"{hit.status_code} in {elapsed * 1000:.1f} ms while {busy.count(429)} turns got 429")
+
+            # The stub starts rate limiting below our limit
+            app.state.rate_limit = max(1, max_concurrency // 2)
+            results = await asyncio.gather(*(
+                _timed_post(client, f"/chat/conversations/limited-{i}/messages", body)
+                for i in range(max_concurrency * 2)
+            ))
+            stats = llm_service.admission_stats()["anthropic"]
+            ok &= _check("upstream 429 lowers the limit", stats["throttled"] > 0 and stats["limit"] < max_concurrency,
+                         f"{app.state.rate_limited} upstream 429s, limit now {stats['limit']}, "
+                         f"statuses {sorted(r.status_code for r, _ in results)}")
+
+            app.state.rate_limit = 0
+            for i in range(max_concurrency * 4):
+                await client.post(f"/chat/conversations/recover-{i}/messages", json=body)
+            stats = llm_service.admission_stats()["anthropic"]
+            ok &= _check("limit recovers after successful calls", stats["limit"] == max_concurrency,
+                         f"limit {stats['limit']}")
+            print(json.dumps(stats, indent=2))
+    return ok
+
+
+async def check_fairness() -> bool:
+    from services.admission import AdmissionController
+
+    controller = AdmissionController(max_concurrency=1, max_concurrency_per_model=1, queue_size=32, queue_timeout=10)
+    order = []
+
+    async def turn(conversation_id: str):
+        ticket = await controller.acquire("anthropic", MODEL, conversation_id)
+        try:
+            order.append(conversation_id)
+            await asyncio.sleep(0.01)
+        finally:
+            ticket.release()
+
+    tasks = [asyncio.ensure_future(turn("hog")) for _ in range(10)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.ensure_future(turn(f"user-{i}")) for i in range(3)]
+    await asyncio.gather(*tasks)
+    last_user = max(order.index(f"user-{i}") for i in range(3))
+    return _check("round-robin across conversations", last_user <= 6,
+                  f"all single-request conversations served by grant {last_user + 1} of {len(order)}")
+
+
+async def check_observe() -> bool:
+    from services.admission import AdmissionController
+
+    controller = AdmissionController(max_concurrency=8, queue_size=4, queue_timeout=0.5)
+    controller.observe("openai", 429, {"retry-after": "2"})
+    stats = controller.stats()["openai"]
+    ok = _check("429 halves the limit and pauses", stats["limit"] == 4 and stats["paused_seconds"] > 1.5,
+                f"limit {stats['limit']}, paused {stats['paused_seconds']}s")
+    start = time.perf_counter()
+    try:
+        await controller.acquire("openai", "gpt-4o")
+        rejected = False
+    except Exception:
+        rejected = True
+    ok &= _check("paused beyond the deadline rejects at once", rejected and time.perf_counter() - start < 0.05)
+
+    controller.observe("anthropic", 200, {"anthropic-ratelimit-tokens-remaining": "0",
+                                           "anthropic-ratelimit-tokens-reset": "1s"})
+    ok &= _check("exhausted rate-limit headers pause", controller.stats()["anthropic"]["paused_seconds"] > 0.5)
+    return ok
+
+
+def check_parse_reset() -> bool:
+    from services.admission import parse_reset
+
+    reset_at = (datetime.now(timezone.utc) + timedelta(seconds=30)).isoformat().replace("+00:00", "Z")
+    cases = {"2": 2.0, "1.5": 1.5, "20ms": 0.02, "1m30s": 90.0, "6m0s": 360.0, "": None, "soon": None}
+    ok = all(abs((parse_reset(value) or 0) - (expected or 0)) < 1e-9 and (parse_reset(value) is None) == (expected is None)
+             for value, expected in cases.items())
+    parsed = parse_reset(reset_at)
+    return _check("reset headers parsed", ok and parsed is not None and 28 < parsed <= 30,
+                  f"RFC 3339 timestamp -> {parsed:.1f}s" if parsed is not None else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--queue-timeout", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub provider latency (s)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    app = create_provider_app(latency=args.latency)
+    with StubServer(app) as stub:
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["OPENAI_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = stub.url
+        os.environ["OPENAI_AGENTS_DISABLE_TRACING"] = "1"
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.max_concurrency)
+        os.environ["LLM_MAX_CONCURRENCY_PER_MODEL"] = str(args.max_concurrency)
+        os.environ["LLM_QUEUE_SIZE"] = str(args.queue_size)
+        os.environ["LLM_QUEUE_TIMEOUT_SECONDS"] = str(args.queue_timeout)
+        os.environ["RESPONSE_CACHE_ENABLED"] = "true"
+        ok = asyncio.run(check_burst(args.requests, args.max_concurrency, args.latency, args.queue_timeout, app))
+    ok &= asyncio.run(check_fairness())
+    ok &= asyncio.run(check_observe())
+    ok &= check_parse_reset()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare ``POST /chat/batch`` with one ``POST /chat/message`` call per prompt.
+
+Serves the application against the stub provider with a fixed latency. It
+sends ``--sequential`` prompts one at a time, then ``--items`` prompts in
+one batch (with a few items that reference a missing upload). The script
+checks that:
+
+* the batch streams one NDJSON line per item, covering every index once,
+  with the first line arriving long before the last
+* at most ``--concurrency`` provider calls run at once
+* the bad items fail on their own with a 404 while the rest succeed
+* the batch is much faster per prompt than sequential calls
+
+Usage (from the backend directory):
+    python -m benchmarks.batch_chat [--items 200] [--concurrency 16] [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from benchmarks.stubs import StubServer, create_provider_app
+
+MODEL = "claude-3-5-sonnet-20241022"
+BAD_ITEMS = (3, 17)
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+def _item(i: int) -> dict:
+    item = {"message": f"Rewrite job summary {i}", "model_provider": "anthropic", "model_name": MODEL}
+    if i in BAD_ITEMS:
+        item["file_id"] = "missing"
+    return item
+
+
+async def run(app_url: str, provider_app, items: int, sequential: int, concurrency: int) -> bool:
+    import httpx
+
+    ok = True
+    async with httpx.AsyncClient(base_url=app_url, timeout=300) as client:
+        # The first call waits for the SDK warm-up; keep it out of the timing
+        (await client.post("/chat/message", json=_item(999))).raise_for_status()
+        start = time.perf_counter()
+        for i in range(sequential):
+            response = await client.post("/chat/message", json=_item(1000 + i))
+            response.raise_for_status()
+        per_call = (time.perf_counter() - start) / sequential
+
+        provider_app.state.max_in_flight = 0
+        results = []
+        first_line = None
+        start = time.perf_counter()
+        async with client.stream("POST", "/chat/batch", json={
+            "items": [_item(i) for i in range(items)], "max_concurrency": concurrency
+        }) as response:
+            async for line in response.aiter_lines():
+                if line:
+                    first_line = first_line or time.perf_counter() - start
+                    results.append(json.loads(line))
+        elapsed = time.perf_counter() - start
+
+    indices = [result["index"] for result in results]
+    failed = {result["index"]: result["status"] for result in results if result["status"] != 200}
+    ok &= _check("one result per item", sorted(indices) == list(range(items)),
+                 f"{len(results)} lines for {items} items, content-type {response.headers['content-type']}")
+    ok &= _check("results stream as they finish", first_line < elapsed / 4 and indices != sorted(indices),
+                 f"first line after {first_line * 1000:.0f} ms, last after {elapsed * 1000:.0f} ms")
+    ok &= _check("concurrency cap respected", provider_app.state.max_in_flight <= concurrency,
+                 f"max {provider_app.state.max_in_flight} provider calls in flight")
+    ok &= _check("failures reported per item", failed == {i: 404 for i in BAD_ITEMS if i < items}, str(failed))
+    batch_per_item = elapsed / items
+    ok &= _check("batch beats sequential calls", batch_per_item < per_call / (concurrency / 2),
+                 f"{per_call * 1000:.0f} ms per sequential call, {batch_per_item * 1000:.1f} ms per batch item "
+                 f"(x{per_call / batch_per_item:.1f})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--sequential", type=int, default=10, help="prompts sent one call at a time")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub provider latency (s)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    provider_app = create_provider_app(latency=args.latency)
+    with StubServer(provider_app) as provider:
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["OPENAI_BASE_URL"] = f"{provider.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = provider.url
+        os.environ["OPENAI_AGENTS_DISABLE_TRACING"] = "1"
+        # Serve the app over HTTP so the NDJSON stream arrives line by line
+        from main import app as chat_app
+        with StubServer(chat_app) as app_server:
+            ok = asyncio.run(run(app_server.url, provider_app, args.items, args.sequential, args.concurrency))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compare message write throughput for the conversation store backends.
+
+Drives ``ConversationManager.add_message`` for the in-memory and SQLite
+(WAL, write-behind) backends and reports messages per second on the request
+path, plus how long the SQLite writer takes to make everything durable.
+
+Usage (from the backend directory):
+    python -m benchmarks.conversation_store [--conversations 100] [--messages 20000]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from models.chat import MessageRole, ModelProvider
+from services.conversation import ConversationManager
+from services.storage import InMemoryConversationStore, SQLiteConversationStore
+
+
+def _run(manager: ConversationManager, conversations: int, messages: int) -> dict:
+    manager.start()
+    ids = [
+        manager.create_conversation(ModelProvider.ANTHROPIC, "claude-3-haiku-20240307").id
+        for _ in range(conversations)
+    ]
+
+    start = time.perf_counter()
+    for i in range(messages):
+        role = MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT
+        manager.add_message(ids[i % conversations], role, f"message {i} " + "lorem ipsum " * 40)
+    request_path = time.perf_counter() - start
+
+    manager.store.flush()
+    durable = time.perf_counter() - start
+    manager.close()
+    return {"request_path": request_path, "durable": durable}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "memory": InMemoryConversationStore(),
+            "sqlite": SQLiteConversationStore(os.path.join(tmp, "conversations.db")),
+        }
+        for name, store in backends.items():
+            result = _run(ConversationManager(store=store), args.conversations, args.messages)
+            print(f"{name:>7}: {args.messages / result['request_path']:10.0f} msgs/s on the request path, "
+                  f"{args.messages / result['durable']:10.0f} msgs/s durable")
+            if isinstance(store, SQLiteConversationStore):
+                print(f"         {store.ops_written} writes committed in {store.batches_written} transactions")
+
+        # Reload from disk to confirm nothing was lost
+        store = SQLiteConversationStore(os.path.join(tmp, "conversations.db"))
+        store.start()
+        reloaded = store.list_conversations()
+        store.close()
+        total = sum(len(c.messages) for c in reloaded)
+        print(f"reloaded {len(reloaded)} conversations / {total} messages from SQLite")
+
+
+if __name__ == "__main__":
+    main()
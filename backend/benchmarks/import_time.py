@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Check application cold-start time against a budget.
+
+Runs ``python -X importtime -c "import main"`` in a fresh interpreter and
+reports the cumulative import time and the slowest top-level imports. A
+second fresh interpreter imports ``main`` and runs the lifespan startup, to
+measure the time until the app can serve requests. The script fails when:
+
+* importing ``main`` takes longer than ``--budget-ms``
+* import plus lifespan startup takes longer than ``--ready-budget-ms``
+* any of the heavy SDKs that must load on first use or in the background
+  warm-up (openai, anthropic, agents, tritonclient, fitz, PyPDF2) is
+  imported by ``import main`` itself
+
+Usage (from the backend directory):
+    python -m benchmarks.import_time [--budget-ms 1500] [--ready-budget-ms 1000] [--runs 3]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+DEFERRED_MODULES = ("openai", "anthropic", "agents", "tritonclient", "fitz", "PyPDF2")
+
+READY_SCRIPT = """
+import asyncio, os, time
+start = time.perf_counter()
+import main
+async def ready():
+    async with main.app.router.lifespan_context(main.app):
+        print(f"{(time.perf_counter() - start) * 1000:.1f}", flush=True)
+        # Skip waiting on the background warm-up thread at shutdown
+        os._exit(0)
+asyncio.run(ready())
+"""
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+def _import_profile() -> list:
+    """``(module, self_us, cumulative_us)`` rows for ``import main``"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            capture_output=True, text=True, check=True, env=_env())
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=1500.0,
+                        help="budget for `import main` as measured by -X importtime (adds overhead)")
+    parser.add_argument("--ready-budget-ms", type=float, default=1000.0,
+                        help="budget for `import main` plus lifespan startup")
+    parser.add_argument("--runs", type=int, default=3, help="take the best of this many runs")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    profiles = [_import_profile() for _ in range(args.runs)]
+    totals = [next(cumulative for name, _, cumulative in rows if name == "main") for rows in profiles]
+    best = min(range(args.runs), key=totals.__getitem__)
+    rows = profiles[best]
+
+    print(f"slowest imports (cumulative, best of {args.runs} runs):")
+    for name, _, cumulative in sorted(rows, key=lambda row: -row[2])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    ready_times = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, "-c", READY_SCRIPT], capture_output=True, text=True, env=_env())
+        lines = result.stdout.splitlines()
+        if result.returncode != 0 or not lines:
+            print(result.stderr)
+            sys.exit(1)
+        ready_times.append(float(lines[0]))
+
+    imported = sorted({name.split(".")[0] for name, *_ in rows} & set(DEFERRED_MODULES))
+    ok = _check("import main within budget", totals[best] / 1000 <= args.budget_ms,
+                f"{totals[best] / 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    ok &= _check("ready within budget", min(ready_times) <= args.ready_budget_ms,
+                 f"{min(ready_times):.1f} ms (budget {args.ready_budget_ms:.0f} ms)")
+    ok &= _check("heavy SDKs deferred", not imported,
+                 f"imported at startup: {', '.join(imported)}" if imported else "")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
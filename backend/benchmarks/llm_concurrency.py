@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Check that concurrent chats do not serialize on the event loop.
+
+Starts a local stub provider with a fixed latency, then fires N parallel
+completions through ``LLMService`` for each provider. With non-blocking
+clients on a shared pool, N parallel chats should finish in roughly the time
+of one.
+
+Usage (from the backend directory):
+    python -m benchmarks.llm_concurrency [--parallel 20] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.stubs import StubServer, create_provider_app
+
+
+async def _time_calls(call, n: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(n)))
+    return time.perf_counter() - start
+
+
+async def run(parallel: int) -> bool:
+    from config.settings import get_settings
+    from services.llm import LLMService, create_http_client
+
+    service = LLMService()
+    http_client = create_http_client(get_settings())
+    service.init_clients(http_client)
+    messages = [{"role": "user", "content": "Hello"}]
+
+    checks = {
+        "openai": lambda: service._generate_openai_response(messages, "gpt-4o-mini"),
+        "anthropic": lambda: service._generate_anthropic_response(messages, "claude-3-haiku-20240307"),
+    }
+
+    ok = True
+    try:
+        for name, call in checks.items():
+            single = await _time_calls(call, 1)
+            burst = await _time_calls(call, parallel)
+            ratio = burst / single
+            passed = ratio < 2.0
+            ok = ok and passed
+            status = "✅" if passed else "❌"
+            print(f"{status} {name}: 1 chat {single:.2f}s, {parallel} parallel chats {burst:.2f}s (x{ratio:.2f})")
+    finally:
+        await http_client.aclose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parallel", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with StubServer(create_provider_app(latency=args.latency)) as stub:
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["OPENAI_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = stub.url
+        ok = asyncio.run(run(args.parallel))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
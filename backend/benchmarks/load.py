@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the application against local stand-ins for OpenAI,
+Anthropic and Triton.
+
+The application runs as its own uvicorn process, like in production, so its
+RSS is measured on its own. The stub provider answers the Anthropic
+Messages and OpenAI Responses APIs with a latency and token-rate profile
+(the OpenAI agent hands off and calls ``job_search_tool``), and the fake
+Triton server answers searches.
+
+Each scenario is a weighted mix of operations:
+
+* ``chat``: non-streaming Anthropic turns
+* ``stream``: streamed Anthropic and OpenAI turns
+* ``agent``: non-streaming OpenAI agent turns with a handoff and a search
+* ``search``: job searches with a mix of repeated and new queries
+* ``upload``: PDF uploads
+* ``mixed``: all of the above, weighted like interactive use
+
+Every scenario runs for ``--duration`` seconds at each ``--concurrency``
+level with closed-loop clients. The report has throughput, p50/p95/p99
+latency, time to first token for streamed turns, per-operation latency and
+error counts, and application RSS (start, end, peak and growth). It is
+saved as JSON. ``--compare`` checks it against an earlier result and fails
+on a p95 latency or throughput regression beyond ``--tolerance``.
+
+Usage (from the backend directory):
+    python -m benchmarks.load [--profile realistic] [--scenarios chat,stream,mixed]
+        [--concurrency 1,8,32] [--duration 5] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.stubs import StubServer, free_port, create_provider_app, create_triton_app
+
+# Upstream behaviour: time to first token (or whole response), tokens per
+# second once streaming, and Triton latency
+PROFILES = {
+    "fast": {"latency": 0.02, "tokens_per_second": 500.0, "triton_latency": 0.005},
+    "realistic": {"latency": 0.4, "tokens_per_second": 60.0, "triton_latency": 0.05},
+    "slow": {"latency": 1.5, "tokens_per_second": 20.0, "triton_latency": 0.2},
+}
+
+SCENARIOS = {
+    "chat": {"chat_anthropic": 1},
+    "stream": {"stream_anthropic": 1, "stream_openai": 1},
+    "agent": {"agent_openai": 1},
+    "search": {"search": 1},
+    "upload": {"upload": 1},
+    "mixed": {"stream_anthropic": 4, "stream_openai": 2, "chat_anthropic": 1, "agent_openai": 1,
+              "search": 2, "upload": 1},
+}
+
+ANTHROPIC_MODEL = "claude-3-5-sonnet-20241022"
+OPENAI_MODEL = "gpt-4o-mini"
+REPLY = " ".join(["Here is a considered answer with enough tokens to stream."] * 8)
+QUERIES = [f"{level} {role} {place}" for level in ("junior", "senior", "staff")
+           for role in ("data engineer", "ml engineer", "backend developer", "analyst")
+           for place in ("remote", "new york", "berlin")]
+# Conversations are restarted after this many turns so prompts stay realistic
+TURNS_PER_CONVERSATION = 10
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 1) if value is not None else None
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process (Linux)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _make_pdfs(workdir: str, count: int) -> List[str]:
+    import fitz
+
+    paths = []
+    for i in range(count):
+        path = os.path.join(workdir, f"resume-{i}.pdf")
+        doc = fitz.open()
+        for page_num in range(4):
+            doc.new_page().insert_text((72, 72), f"Resume {i}, page {page_num + 1}: data engineer, Python, SQL")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+class Operations:
+    """The requests a simulated user makes; each returns (ok, status, time to first token)"""
+
+    def __init__(self, client, pdf_paths: List[str]):
+        self.client = client
+        self.pdf_paths = pdf_paths
+
+    async def _turn(self, conversation_id: str, provider: str, model: str) -> Tuple[bool, int, None]:
+        response = await self.client.post(f"/chat/conversations/{conversation_id}/messages", json={
+            "message": random.choice(QUERIES), "model_provider": provider, "model_name": model
+        })
+        return response.status_code == 200, response.status_code, None
+
+    async def _stream(self, conversation_id: str, provider: str, model: str) -> Tuple[bool, int, Optional[float]]:
+        start = time.perf_counter()
+        ttft = None
+        ok = False
+        async with self.client.stream("POST", f"/chat/conversations/{conversation_id}/messages/stream", json={
+            "message": random.choice(QUERIES), "model_provider": provider, "model_name": model
+        }) as response:
+            async for line in response.aiter_lines():
+                if line == "event: delta" and ttft is None:
+                    ttft = time.perf_counter() - start
+                elif line == "event: done":
+                    ok = True
+                elif line == "event: error":
+                    ok = False
+            return ok and response.status_code == 200, response.status_code, ttft
+
+    async def chat_anthropic(self, conversation_id: str):
+        return await self._turn(conversation_id, "anthropic", ANTHROPIC_MODEL)
+
+    async def agent_openai(self, conversation_id: str):
+        return await self._turn(conversation_id, "openai", OPENAI_MODEL)
+
+    async def stream_anthropic(self, conversation_id: str):
+        return await self._stream(conversation_id, "anthropic", ANTHROPIC_MODEL)
+
+    async def stream_openai(self, conversation_id: str):
+        return await self._stream(conversation_id, "openai", OPENAI_MODEL)
+
+    async def search(self, conversation_id: str):
+        response = await self.client.post("/search/search", json={
+            "text_to_embed": [random.choice(QUERIES)], "es_query": {}, "k": 5
+        })
+        return response.status_code == 200, response.status_code, None
+
+    async def upload(self, conversation_id: str):
+        path = random.choice(self.pdf_paths)
+        with open(path, "rb") as f:
+            response = await self.client.post("/chat/upload", files={"file": (os.path.basename(path), f,
+                                                                              "application/pdf")})
+        return response.status_code == 200, response.status_code, None
+
+
+async def _sample_rss(pid: int, samples: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        rss = _rss_mb(pid)
+        if rss is not None:
+            samples.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.25)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(ops: Operations, pid: int, scenario: str, concurrency: int, duration: float) -> Dict[str, Any]:
+    """Drive one scenario with ``concurrency`` closed-loop clients for ``duration`` seconds"""
+    names, weights = zip(*SCENARIOS[scenario].items())
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    by_operation: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, int] = defaultdict(int)
+    errors: Dict[str, int] = defaultdict(int)
+
+    async def client(worker: int):
+        turn = 0
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            conversation_id = f"load-{scenario}-{concurrency}-{worker}-{turn // TURNS_PER_CONVERSATION}"
+            start = time.perf_counter()
+            try:
+                ok, status, ttft = await getattr(ops, name)(conversation_id)
+            except Exception as e:
+                ok, status, ttft = False, type(e).__name__, None
+            elapsed = time.perf_counter() - start
+            statuses[str(status)] += 1
+            if ok:
+                latencies.append(elapsed)
+                by_operation[name].append(elapsed)
+                if ttft is not None:
+                    ttfts.append(ttft)
+            else:
+                errors[name] += 1
+            turn += 1
+
+    rss_samples: List[float] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(pid, rss_samples, stop))
+    rss_start = _rss_mb(pid)
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(client(worker) for worker in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+    rss_end = _rss_mb(pid)
+
+    completed = len(latencies)
+    failed = sum(errors.values())
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": completed + failed,
+        "errors": failed,
+        "error_rate": round(failed / max(completed + failed, 1), 4),
+        "throughput_rps": round(completed / elapsed, 2),
+        "latency_ms": {f"p{p}": _ms(_percentile(latencies, p)) for p in (50, 95, 99)},
+        "ttft_ms": {f"p{p}": _ms(_percentile(ttfts, p)) for p in (50, 95, 99)} if ttfts else None,
+        "operations": {
+            name: {"count": len(values), "errors": errors.get(name, 0),
+                   **{f"p{p}_ms": _ms(_percentile(values, p)) for p in (50, 95, 99)}}
+            for name, values in sorted(by_operation.items())
+        },
+        "statuses": dict(statuses),
+        "rss_mb": {
+            "start": round(rss_start, 1) if rss_start else None,
+            "end": round(rss_end, 1) if rss_end else None,
+            "peak": round(max(rss_samples), 1) if rss_samples else None,
+            "growth": round(rss_end - rss_start, 1) if rss_start and rss_end else None,
+        },
+    }
+
+
+def _print_result(result: Dict[str, Any]):
+    latency, ttft, rss = result["latency_ms"], result["ttft_ms"], result["rss_mb"]
+    line = (f"  {result['scenario']:<7} c={result['concurrency']:<3} {result['throughput_rps']:>7.1f} req/s  "
+            f"p50 {latency['p50']} / p95 {latency['p95']} / p99 {latency['p99']} ms")
+    if ttft:
+        line += f"  ttft p50 {ttft['p50']} / p95 {ttft['p95']} ms"
+    line += f"  errors {result['errors']}/{result['requests']}"
+    if rss["growth"] is not None:
+        line += f"  rss {rss['end']} MB ({rss['growth']:+.1f})"
+    print(line)
+
+
+def _start_app(env: Dict[str, str], port: int) -> subprocess.Popen:
+    # Logs go to a file: nothing reads a pipe during the run, and once its
+    # buffer filled up the application would block on its next log line
+    log = tempfile.TemporaryFile(mode="w+")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL, stderr=log, text=True,
+    )
+    process.log = log
+    return process
+
+
+async def _wait_ready(client, process: subprocess.Popen, timeout: float = 60.0):
+    import httpx
+
+    give_up = time.perf_counter() + timeout
+    while time.perf_counter() < give_up:
+        if process.poll() is not None:
+            process.log.seek(0)
+            raise RuntimeError(f"Application exited: {process.log.read()[-2000:]}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Application did not start in time")
+
+
+async def run_suite(args, env: Dict[str, str], pdf_paths: List[str]) -> List[Dict[str, Any]]:
+    import httpx
+
+    port = free_port()
+    process = _start_app(env, port)
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency) * 2,
+                              max_keepalive_connections=max(args.concurrency) * 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+            await _wait_ready(client, process)
+            ops = Operations(client, pdf_paths)
+            # One of each operation first, so warm-up and first connections are not measured
+            for name in sorted({name for mix in SCENARIOS.values() for name in mix}):
+                await getattr(ops, name)("load-warmup")
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    result = await run_level(ops, process.pid, scenario, concurrency, args.duration)
+                    _print_result(result)
+                    results.append(result)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        process.log.close()
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> bool:
+    """Compare p95 latency and throughput with an earlier run, level by level"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {(baseline.get('commit') or 'unknown')[:12]}):")
+    ok = True
+    for result in results:
+        old = before.get((result["scenario"], result["concurrency"]))
+        if old is None:
+            continue
+        old_p95, new_p95 = old["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        old_rps, new_rps = old["throughput_rps"], result["throughput_rps"]
+        slower = bool(old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance))
+        fewer = bool(old_rps and new_rps < old_rps * (1 - tolerance))
+        ok &= _check(f"{result['scenario']} c={result['concurrency']}", not (slower or fewer),
+                     f"p95 {old_p95} -> {new_p95} ms, {old_rps} -> {new_rps} req/s")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--latency", type=float, help="override the profile's time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, help="override the profile's streaming rate")
+    parser.add_argument("--triton-latency", type=float, help="override the profile's Triton latency (s)")
+    parser.add_argument("--scenarios", default="chat,stream,agent,search,upload,mixed")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario and level")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", help="result file (default: data/benchmarks/load-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95/throughput regression")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}; choose from {sorted(SCENARIOS)}")
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+    logging.disable(logging.WARNING)
+    random.seed(args.seed)
+
+    profile = dict(PROFILES[args.profile])
+    for key in ("latency", "tokens_per_second", "triton_latency"):
+        if getattr(args, key) is not None:
+            profile[key] = getattr(args, key)
+    commit = _git_commit()
+
+    provider_app = create_provider_app(latency=profile["latency"], reply=REPLY,
+                                       token_delay=1 / profile["tokens_per_second"], agent_tools=True)
+    triton_app = create_triton_app(latency=profile["triton_latency"], instances=max(args.concurrency))
+    with tempfile.TemporaryDirectory() as workdir, StubServer(provider_app) as provider, \
+            StubServer(triton_app) as triton:
+        pdf_paths = _make_pdfs(workdir, 8)
+        env = {
+            **os.environ,
+            "OPENAI_API_KEY": "sk-stub",
+            "ANTHROPIC_API_KEY": "sk-ant-stub",
+            "OPENAI_BASE_URL": f"{provider.url}/v1",
+            "ANTHROPIC_BASE_URL": provider.url,
+            "OPENAI_AGENTS_DISABLE_TRACING": "1",
+            "TRITON_ENDPOINT": f"127.0.0.1:{triton.port}",
+            "LOG_LEVEL": "WARNING",
+            "UPLOAD_SPOOL_DIR": workdir,
+        }
+        print(f"Profile {args.profile}: {profile}")
+        results = asyncio.run(run_suite(args, env, pdf_paths))
+
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "profile": {"name": args.profile, **profile},
+        "duration_s": args.duration,
+        "results": results,
+    }
+    output = args.output or os.path.join("data", "benchmarks", f"load-{(commit or 'unknown')[:12]}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    ok = True
+    for result in results:
+        if result["error_rate"] > args.max_error_rate:
+            ok &= _check(f"{result['scenario']} c={result['concurrency']} error rate", False,
+                         f"{result['errors']}/{result['requests']} failed: {result['statuses']}")
+    if args.compare:
+        ok &= compare(results, args.compare, args.tolerance)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
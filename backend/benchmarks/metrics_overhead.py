@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Measure metrics recording overhead and check the /metrics endpoint.
+
+The script:
+
+* times ``Histogram.observe`` and ``Counter.inc`` on a cached label child
+  and fails if either costs more than ``--budget-ns`` per call
+* records from ``--threads`` threads at once and checks that no update is
+  lost (each thread accumulates into its own shard)
+* runs the application against the stub provider and fake Triton server,
+  sends an Anthropic chat turn and an OpenAI agent turn, runs a search and
+  uploads a PDF. It then checks that ``GET /metrics`` is valid Prometheus
+  text and has every expected metric family
+
+Usage (from the backend directory):
+    python -m benchmarks.metrics_overhead [--calls 200000] [--threads 8] [--budget-ns 2000]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.stubs import StubServer, create_provider_app, create_triton_app
+
+EXPECTED_FAMILIES = (
+    "semantix_send_message_seconds",
+    "semantix_llm_call_seconds",
+    "semantix_llm_tokens_total",
+    "semantix_agent_turn_seconds",
+    "semantix_agent_handoffs_total",
+    "semantix_search_infer_seconds",
+    "semantix_search_results",
+    "semantix_pdf_extract_seconds",
+    "semantix_pdf_pages",
+    "semantix_conversations_stored",
+    "semantix_messages_stored",
+    "semantix_message_bytes_stored",
+)
+
+SAMPLE_RE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*",?)*\})? \S+$')
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+def _per_call_ns(fn, calls: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        fn()
+    elapsed = time.perf_counter_ns() - start
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        pass
+    return (elapsed - (time.perf_counter_ns() - start)) / calls
+
+
+def check_overhead(calls: int, threads: int, budget_ns: float) -> bool:
+    from services.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "Benchmark histogram", ["provider", "model"])
+    counter = registry.counter("bench_total", "Benchmark counter", ["kind"])
+    child = histogram.labels("anthropic", "claude")
+    counter_child = counter.labels("input")
+
+    observe_ns = _per_call_ns(lambda: child.observe(0.042), calls)
+    inc_ns = _per_call_ns(counter_child.inc, calls)
+    labels_ns = _per_call_ns(lambda: histogram.labels("anthropic", "claude").observe(0.042), calls)
+    ok = _check("observe within budget", observe_ns <= budget_ns,
+                f"{observe_ns:.0f} ns per observe, {labels_ns:.0f} ns with a label lookup")
+    ok &= _check("inc within budget", inc_ns <= budget_ns, f"{inc_ns:.0f} ns per inc")
+
+    per_thread = calls // threads
+    before = counter_child.value()
+
+    def record():
+        for _ in range(per_thread):
+            counter_child.inc()
+            child.observe(0.001)
+
+    workers = [threading.Thread(target=record) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    counts, _ = child.snapshot()
+    ok &= _check("no lost updates across threads",
+                 counter_child.value() - before == per_thread * threads
+                 and sum(counts) == calls * 2 + per_thread * threads,
+                 f"{threads} threads x {per_thread} updates")
+    return ok
+
+
+async def check_endpoint(pdf_path: str) -> bool:
+    import httpx
+    from main import app as chat_app
+
+    async with chat_app.router.lifespan_context(chat_app):
+        transport = httpx.ASGITransport(app=chat_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://chat", timeout=60) as client:
+            for provider, model in (("anthropic", "claude-3-5-sonnet-20241022"), ("openai", "gpt-4o-mini")):
+                response = await client.post("/chat/conversations/metrics/messages", json={
+                    "message": "Find data engineering jobs", "model_provider": provider, "model_name": model
+                })
+                response.raise_for_status()
+            response = await client.post("/search/search", json={
+                "text_to_embed": ["data engineer"], "es_query": {}, "k": 3
+            })
+            response.raise_for_status()
+            with open(pdf_path, "rb") as f:
+                response = await client.post("/chat/upload", files={"file": ("resume.pdf", f, "application/pdf")})
+            response.raise_for_status()
+
+            start = time.perf_counter()
+            response = await client.get("/metrics")
+            elapsed = time.perf_counter() - start
+
+    text = response.text
+    lines = text.splitlines()
+    families = {line.split()[2] for line in lines if line.startswith("# TYPE ")}
+    invalid = [line for line in lines if line and not line.startswith("#") and not SAMPLE_RE.match(line)]
+    missing = [name for name in EXPECTED_FAMILIES if name not in families]
+    ok = _check("/metrics is valid Prometheus text",
+                response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+                and not invalid, f"{len(lines)} lines in {elapsed * 1000:.1f} ms" + (f", invalid: {invalid[:3]}"
+                                                                                       if invalid else ""))
+    ok &= _check("all metric families exported", not missing, f"missing: {missing}" if missing else "")
+    recorded = [name for name in EXPECTED_FAMILIES
+                if any(line.startswith(name) and not line.startswith("#") for line in lines)]
+    print(f"  families with samples: {len(recorded)}/{len(EXPECTED_FAMILIES)}")
+    for line in lines:
+        if line.startswith(("semantix_send_message_seconds_count", "semantix_messages_stored",
+                            "semantix_pdf_pages_sum", "semantix_llm_tokens_total")):
+            print(f"  {line}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--budget-ns", type=float, default=2000.0, help="max cost per recorded sample")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    ok = check_overhead(args.calls, args.threads, args.budget_ns)
+
+    import fitz
+    with tempfile.TemporaryDirectory() as workdir, \
+            StubServer(create_provider_app(latency=0.05)) as provider, \
+            StubServer(create_triton_app(latency=0.01)) as triton:
+        pdf_path = os.path.join(workdir, "resume.pdf")
+        doc = fitz.open()
+        for page_num in range(3):
+            doc.new_page().insert_text((72, 72), f"Page {page_num + 1}: senior data engineer, Python, SQL")
+        doc.save(pdf_path)
+        doc.close()
+
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["OPENAI_BASE_URL"] = f"{provider.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = provider.url
+        os.environ["OPENAI_AGENTS_DISABLE_TRACING"] = "1"
+        os.environ["TRITON_ENDPOINT"] = f"127.0.0.1:{triton.port}"
+        ok &= asyncio.run(check_endpoint(pdf_path))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
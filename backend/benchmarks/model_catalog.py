@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Check the /chat/models catalog against the stub provider.
+
+Runs the application lifespan in-process, with the OpenAI model list served
+by the stub provider, and checks that:
+
+* ``GET /chat/models`` returns the snapshot with an ``ETag``, and a request
+  with a matching ``If-None-Match`` gets an empty 304
+* ``--concurrency`` concurrent requests make no model list calls once the
+  snapshot exists
+* concurrent refreshes share one model list call (single-flight)
+* a stale snapshot is served immediately while it is refreshed in the
+  background
+
+It also prints the mean latency of ``GET /chat/models`` under load.
+
+Usage (from the backend directory):
+    python -m benchmarks.model_catalog [--concurrency 200] [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from benchmarks.stubs import StubServer, create_provider_app
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+async def run(concurrency: int, latency: float, app) -> bool:
+    import httpx
+    from main import app as chat_app
+    from services.model_catalog import model_catalog
+
+    ok = True
+    async with chat_app.router.lifespan_context(chat_app):
+        transport = httpx.ASGITransport(app=chat_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://chat") as client:
+            first = await client.get("/chat/models")
+            etag = first.headers.get("etag")
+            ok &= _check("models served with an ETag", first.status_code == 200 and bool(etag),
+                         f"{len(first.json())} models, ETag {etag}")
+
+            revalidated = await client.get("/chat/models", headers={"If-None-Match": etag})
+            ok &= _check("matching If-None-Match gets 304",
+                         revalidated.status_code == 304 and not revalidated.content)
+
+            calls = app.state.model_list_calls
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(client.get("/chat/models") for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            ok &= _check("concurrent requests served from the snapshot",
+                         all(r.status_code == 200 for r in responses) and app.state.model_list_calls == calls,
+                         f"{app.state.model_list_calls - calls} model list calls, "
+                         f"{elapsed * 1000 / concurrency:.2f} ms per request")
+
+            calls = app.state.model_list_calls
+            await asyncio.gather(*(model_catalog.refresh() for _ in range(concurrency)))
+            ok &= _check("concurrent refreshes share one model list call",
+                         app.state.model_list_calls - calls == 1,
+                         f"{app.state.model_list_calls - calls} calls")
+
+            calls = app.state.model_list_calls
+            refresh_seconds = model_catalog.refresh_seconds
+            model_catalog.refresh_seconds = 0
+            start = time.perf_counter()
+            stale = await client.get("/chat/models")
+            served_in = time.perf_counter() - start
+            model_catalog.refresh_seconds = refresh_seconds
+            await asyncio.sleep(latency * 2)
+            ok &= _check("stale snapshot served without waiting for the refresh",
+                         stale.status_code == 200 and served_in < latency and
+                         app.state.model_list_calls - calls == 1,
+                         f"{served_in * 1000:.1f} ms, refreshed in the background")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub provider latency (s)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    app = create_provider_app(latency=args.latency)
+    with StubServer(app) as stub:
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["OPENAI_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = stub.url
+        os.environ["OPENAI_AGENTS_DISABLE_TRACING"] = "1"
+        ok = asyncio.run(run(args.concurrency, args.latency, app))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
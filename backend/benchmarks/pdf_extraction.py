@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compare PDF text extraction throughput: inline vs the worker pool.
+
+Generates a text-heavy PDF with ``--pages`` pages and extracts it
+``--documents`` times concurrently with:
+
+* ``inline``: the previous path. The upload is read into memory, PyMuPDF
+  runs synchronously on the event loop, and the text is built with ``+=``.
+* ``pool``: ``FileProcessor._extract_pdf_text``, which splits the spooled
+  file into page ranges across the process pool.
+
+Reports pages per second and the longest event loop stall seen by a 10 ms
+ticker task while the extraction runs.
+
+Usage (from the backend directory):
+    python -m benchmarks.pdf_extraction [--pages 300] [--documents 4] [--workers 4]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import fitz
+
+
+def _make_pdf(pages: int, path: str) -> str:
+    doc = fitz.open()
+    paragraph = "Senior data engineer with experience in distributed systems, Python and SQL. " * 6
+    for page_num in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), f"Page {page_num + 1}\n" + paragraph * 8, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+async def _inline(pdf_path: str) -> str:
+    with open(pdf_path, "rb") as f:
+        pdf_content = f.read()
+    text_content = ""
+    doc = fitz.open(stream=pdf_content, filetype="pdf")
+    for page_num in range(doc.page_count):
+        text_content += doc[page_num].get_text()
+    return text_content.strip()
+
+
+async def _measure(extract, pdf_path: str, documents: int) -> dict:
+    stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal stall
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stall = max(stall, time.perf_counter() - before - 0.01)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    texts = await asyncio.gather(*(extract(pdf_path) for _ in range(documents)))
+    elapsed = time.perf_counter() - start
+    running = False
+    await tick
+    return {"elapsed": elapsed, "stall": stall, "characters": len(texts[0])}
+
+
+async def _main(args):
+    os.environ["PDF_WORKERS"] = str(args.workers)
+    from services.file_processor import FileProcessor
+
+    tmp = tempfile.mkdtemp()
+    pdf_path = _make_pdf(args.pages, os.path.join(tmp, "document.pdf"))
+    processor = FileProcessor()
+    # Warm the pool so worker start-up is not counted
+    await processor._extract_pdf_text(_make_pdf(1, os.path.join(tmp, "warmup.pdf")))
+
+    for name, extract in (("inline", _inline), ("pool", processor._extract_pdf_text)):
+        result = await _measure(extract, pdf_path, args.documents)
+        pages = args.pages * args.documents
+        print(f"{name:>7}: {pages / result['elapsed']:8.0f} pages/s, "
+              f"max event loop stall {result['stall'] * 1000:7.1f} ms, {result['characters']} chars/document")
+    processor.close()
+    shutil.rmtree(tmp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Measure the cost of building the LLM input over a long conversation.
+
+Plays a conversation of ``--turns`` user/assistant turns, with a PDF-sized
+attachment on every ``--attach-every``-th user message, and times the prompt
+build on each turn for:
+
+* ``rebuild``: the per-turn rebuild that used to live in the chat router.
+  It concatenates every message with its attachment text, then copies the
+  result again into Anthropic format.
+* ``log``: ``PromptAssembler`` over the conversation's incremental message
+  log.
+
+The token budget is set high enough, and retrieval is turned off, so both
+send the full history with every attachment and only the bookkeeping
+differs.
+
+Usage (from the backend directory):
+    python -m benchmarks.prompt_assembly [--turns 200] [--attach-every 10] [--attachment-kb 200]
+"""
+
+import argparse
+import logging
+import time
+
+from models.chat import MessageRole, ModelProvider
+from services.conversation import ConversationManager
+from services.llm import llm_service
+from services.prompt import PromptAssembler
+from services.storage import InMemoryConversationStore
+
+
+def _rebuild(conversation, attachments):
+    messages = []
+    for msg in conversation.messages:
+        file_text = attachments.get(msg.attachment_id) if msg.attachment_id else None
+        if file_text:
+            messages.append({"role": msg.role.value, "content": msg.content + '\n\nUser Uploaded File:\n' + file_text})
+        else:
+            messages.append({"role": msg.role.value, "content": msg.content})
+    anthropic_messages = []
+    for msg in messages:
+        if msg["role"] != "system":
+            anthropic_messages.append({"role": msg["role"], "content": msg["content"]})
+    return anthropic_messages
+
+
+def _run(mode: str, turns: int, attach_every: int, attachment_kb: int) -> float:
+    manager = ConversationManager(store=InMemoryConversationStore())
+    conversation = manager.create_conversation(ModelProvider.ANTHROPIC, "claude-3-5-sonnet-20241022")
+    attachments = {}
+    assembler = PromptAssembler(resolve_attachment=attachments.get)
+    assembler.settings.prompt_token_budget = 10 ** 9
+    assembler.settings.prompt_token_budgets = {}
+    assembler.settings.retrieval_enabled = False
+
+    elapsed = 0.0
+    for turn in range(turns):
+        attachment_id = None
+        if turn % attach_every == 0:
+            attachment_id = f"pdf-{turn}"
+            attachments[attachment_id] = f"page text {turn} " * (attachment_kb * 1024 // 16)
+        manager.add_message(conversation.id, MessageRole.USER, f"question {turn} " + "about the job " * 20,
+                            attachment_id=attachment_id)
+
+        start = time.perf_counter()
+        if mode == "rebuild":
+            _rebuild(conversation, attachments)
+        else:
+            llm_service._build_anthropic_request(
+                assembler.assemble(conversation, conversation.model_name, ModelProvider.ANTHROPIC),
+                conversation.model_name
+            )
+        elapsed += time.perf_counter() - start
+
+        manager.add_message(conversation.id, MessageRole.ASSISTANT, f"answer {turn} " + "with details " * 60)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--attach-every", type=int, default=10)
+    parser.add_argument("--attachment-kb", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    results = {mode: _run(mode, args.turns, args.attach_every, args.attachment_kb) for mode in ("rebuild", "log")}
+    for mode, elapsed in results.items():
+        print(f"{mode:>8}: {elapsed * 1000:9.1f} ms total, {elapsed * 1e6 / args.turns:9.1f} us per turn")
+    print(f"speedup: {results['rebuild'] / results['log']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
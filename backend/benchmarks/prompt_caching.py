@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check prompt-cache request shape and usage accounting against the stub provider.
+
+Plays a short conversation with an uploaded file through ``PromptAssembler``
+and ``LLMService.generate_response`` for each provider. The stub provider
+simulates prompt caches (see ``benchmarks.stubs.PromptCacheSim``). The
+script checks that:
+
+* Anthropic requests carry the uploaded file in a system block marked with
+  ``cache_control``, use at most four breakpoints, and mark the last
+  message before the current turn from the second turn on
+* the uploaded file leads the OpenAI input, so the automatic prefix cache
+  can match it
+* from the second turn on, cached input tokens are reported in the
+  per-request usage and in ``LLMService.usage_stats()``
+
+Usage (from the backend directory):
+    python -m benchmarks.prompt_caching [--turns 3]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from benchmarks.stubs import StubServer, create_provider_app
+
+RESUME = " ".join(
+    f"Led project {n} on data pipelines, search relevance and model serving for hiring products."
+    for n in range(60)
+)
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+async def _converse(service, assembler, manager, provider, model_name: str, turns: int, stub) -> bool:
+    from models.chat import MessageRole, TokenUsage
+
+    conversation = manager.create_conversation(provider, model_name)
+    usages = []
+    ok = True
+    for turn in range(turns):
+        manager.add_message(conversation.id, MessageRole.USER, f"Question {turn}: which roles fit my resume?",
+                            attachment_id="resume" if turn == 0 else None)
+        messages = assembler.assemble(conversation, model_name, provider)
+        usage = TokenUsage()
+        reply = await service.generate_response(messages, provider, model_name, usage=usage)
+        manager.add_message(conversation.id, MessageRole.ASSISTANT, reply)
+        usages.append(usage)
+
+        if provider.value == "anthropic":
+            body = stub.app.state.last_bodies["messages"]
+            system = body["system"]
+            breakpoints = sum("cache_control" in block for block in system)
+            for msg in body["messages"]:
+                if isinstance(msg["content"], list):
+                    breakpoints += sum("cache_control" in block for block in msg["content"])
+            ok &= _check(f"anthropic turn {turn}: file in a cached system block",
+                         any("cache_control" in block and block["text"] == RESUME for block in system))
+            ok &= _check(f"anthropic turn {turn}: breakpoints", breakpoints <= 4, f"{breakpoints}")
+            if turn:
+                previous = body["messages"][-2]["content"]
+                ok &= _check(f"anthropic turn {turn}: history breakpoint",
+                             isinstance(previous, list) and "cache_control" in previous[-1])
+        else:
+            body = stub.app.state.last_bodies["responses"]
+            first = body["input"][0]
+            ok &= _check(f"openai turn {turn}: file leads the input",
+                         first["role"] == "system" and any(part["text"] == RESUME for part in first["content"]))
+
+    first, later = usages[0], usages[1:]
+    if provider.value == "anthropic":
+        ok &= _check("anthropic first turn writes the cache", first.cache_write_tokens > 0,
+                     f"{first.cache_write_tokens} tokens written")
+    ok &= _check(f"{provider.value} later turns read the cache",
+                 all(usage.cached_input_tokens > 0 for usage in later),
+                 ", ".join(f"{u.cached_input_tokens}/{u.input_tokens}" for u in later))
+    totals = service.usage_stats()[model_name]
+    ok &= _check(f"{provider.value} usage totals",
+                 totals["requests"] == turns and
+                 totals["cached_input_tokens"] == sum(u.cached_input_tokens for u in usages),
+                 f"cached input ratio {totals['cached_input_ratio']}")
+    return ok
+
+
+async def run(turns: int, stub) -> bool:
+    from config.settings import get_settings
+    from models.chat import ModelProvider
+    from services.conversation import ConversationManager
+    from services.llm import LLMService, create_http_client
+    from services.prompt import PromptAssembler
+    from services.storage import InMemoryConversationStore
+
+    service = LLMService()
+    http_client = create_http_client(get_settings())
+    service.init_clients(http_client)
+    manager = ConversationManager(store=InMemoryConversationStore())
+    assembler = PromptAssembler(resolve_attachment={"resume": RESUME}.get)
+
+    ok = True
+    try:
+        ok &= await _converse(service, assembler, manager, ModelProvider.ANTHROPIC,
+                              "claude-3-5-sonnet-20241022", turns, stub)
+        ok &= await _converse(service, assembler, manager, ModelProvider.OPENAI, "gpt-4o", turns, stub)
+    finally:
+        await http_client.aclose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with StubServer(create_provider_app(latency=0.01)) as stub:
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["OPENAI_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = stub.url
+        os.environ["OPENAI_AGENTS_DISABLE_TRACING"] = "1"
+        ok = asyncio.run(run(args.turns, stub))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
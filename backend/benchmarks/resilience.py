@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Check hedging, deadlines and circuit breaking against stubs with injected faults.
+
+The stub provider and the fake Triton server add ``--slow-latency`` to a
+random ``--slow-fraction`` of requests. The script checks that:
+
+* hedging cuts the p99 latency of ``LLMService.generate_response``
+  (Anthropic) and of ``Searcher.search`` well below the unhedged p99,
+  without sending more than the retry budget allows
+* a request with ``X-Request-Timeout`` gets a 504 once its deadline passes,
+  instead of waiting for a slow Triton
+* a hanging Triton opens the search circuit after a few timed-out attempts;
+  later searches fail fast with a 503, and the circuit closes again once
+  Triton recovers
+
+Usage (from the backend directory):
+    python -m benchmarks.resilience [--requests 300] [--concurrency 8] [--slow-fraction 0.03]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from benchmarks.stubs import StubServer, create_provider_app, create_triton_app
+
+MODEL = "claude-3-5-sonnet-20241022"
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+def _percentile(values: list, percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def _latencies(call, requests: int, concurrency: int) -> list:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> float:
+        async with gate:
+            start = time.perf_counter()
+            await call(i)
+            return time.perf_counter() - start
+
+    return await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+async def _compare_hedging(name: str, policy, call, requests: int, concurrency: int) -> bool:
+    """Run the same load without and with hedging and compare tail latency"""
+    hedge_percentile = policy.hedge_percentile
+    results = {}
+    for label, percentile in (("unhedged", 0), ("hedged", hedge_percentile)):
+        policy.hedge_percentile = percentile
+        # Prime the latency window so hedging is active from the first measured call
+        await _latencies(call, policy.min_samples + 10, concurrency)
+        hedges = policy.hedges
+        latencies = await _latencies(call, requests, concurrency)
+        results[label] = (_percentile(latencies, 50), _percentile(latencies, 99), policy.hedges - hedges)
+    policy.hedge_percentile = hedge_percentile
+
+    (_, slow_p99, _), (p50, fast_p99, hedges) = results["unhedged"], results["hedged"]
+    print(f"  {name}: unhedged p99 {slow_p99 * 1000:.0f} ms, hedged p50 {p50 * 1000:.0f} ms / "
+          f"p99 {fast_p99 * 1000:.0f} ms, {hedges} hedges for {requests} calls")
+    ok = _check(f"{name} hedging cuts p99", fast_p99 < slow_p99 / 2)
+    ok &= _check(f"{name} hedges within the retry budget",
+                 hedges <= requests * policy.budget.ratio + policy.budget.max_tokens)
+    return ok
+
+
+async def check_llm(requests: int, concurrency: int) -> bool:
+    from config.settings import get_settings
+    from models.chat import ModelProvider
+    from services.llm import LLMService, create_http_client
+
+    service = LLMService()
+    http_client = create_http_client(get_settings())
+    service.init_clients(http_client)
+    provider = ModelProvider.ANTHROPIC
+
+    async def call(i: int):
+        await service.generate_response([{"role": "user", "content": f"Question {i}"}], provider, MODEL,
+                                        use_cache=False)
+
+    try:
+        return await _compare_hedging("anthropic", service.resilience[provider], call, requests, concurrency)
+    finally:
+        await http_client.aclose()
+
+
+async def check_search(url: str, requests: int, concurrency: int) -> bool:
+    from services.resilience import ResiliencePolicy
+    from services.search_client import Searcher
+
+    searcher = Searcher(url=url, conn_limit=concurrency * 2, resilience=ResiliencePolicy("triton-search"))
+    await searcher.start()
+
+    async def call(i: int):
+        await searcher.search(query=f"ml engineer {i}", k=5)
+
+    try:
+        return await _compare_hedging("search", searcher.resilience, call, requests, concurrency)
+    finally:
+        await searcher.close()
+
+
+async def check_deadline_and_circuit(triton_app) -> bool:
+    import httpx
+    from main import app as chat_app
+    from services.search_client import SEARCHER
+
+    ok = True
+    body = {"text_to_embed": ["data engineer"], "es_query": {}, "k": 3}
+    async with chat_app.router.lifespan_context(chat_app):
+        transport = httpx.ASGITransport(app=chat_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://chat", timeout=60) as client:
+            # Connect first so the warm-up is not part of the measurements
+            await client.post("/search/search", json=body)
+
+            triton_app.state.slow_fraction, triton_app.state.slow_latency = 1.0, 30.0
+            start = time.perf_counter()
+            response = await client.post("/search/search", json=body, headers={"X-Request-Timeout": "0.3"})
+            elapsed = time.perf_counter() - start
+            ok &= _check("deadline from X-Request-Timeout gives a 504",
+                         response.status_code == 504 and elapsed < 0.5,
+                         f"{response.status_code} after {elapsed * 1000:.0f} ms")
+
+            breaker = SEARCHER.resilience.breaker
+            statuses = []
+            while breaker.state == breaker.CLOSED and len(statuses) < 10:
+                statuses.append((await client.post("/search/search", json=body)).status_code)
+            start = time.perf_counter()
+            response = await client.post("/search/search", json=body)
+            elapsed = time.perf_counter() - start
+            ok &= _check("hanging Triton opens the circuit and fails fast",
+                         breaker.state == breaker.OPEN and response.status_code == 503 and elapsed < 0.05
+                         and "retry-after" in response.headers,
+                         f"opened after {len(statuses)} requests {statuses}, then 503 in {elapsed * 1000:.1f} ms")
+
+            triton_app.state.slow_fraction = 0.0
+            await asyncio.sleep(breaker.reset_seconds)
+            response = await client.post("/search/search", json=body)
+            ok &= _check("circuit closes once Triton recovers",
+                         response.status_code == 200 and breaker.state == breaker.CLOSED)
+            print(json.dumps(SEARCHER.stats()["resilience"], indent=2))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="normal upstream latency (s)")
+    parser.add_argument("--slow-fraction", type=float, default=0.03, help="fraction of requests slowed down")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="extra latency of slow requests (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    random.seed(args.seed)
+
+    provider_app = create_provider_app(latency=args.latency, slow_fraction=args.slow_fraction,
+                                       slow_latency=args.slow_latency)
+    triton_app = create_triton_app(latency=args.latency, instances=args.concurrency * 2,
+                                   slow_fraction=args.slow_fraction, slow_latency=args.slow_latency)
+    with StubServer(provider_app) as provider, StubServer(triton_app) as triton:
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["OPENAI_BASE_URL"] = f"{provider.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = provider.url
+        os.environ["OPENAI_AGENTS_DISABLE_TRACING"] = "1"
+        os.environ["TRITON_ENDPOINT"] = f"127.0.0.1:{triton.port}"
+        # Small limits so the circuit test runs quickly
+        os.environ["SEARCH_ATTEMPT_TIMEOUT_SECONDS"] = "0.2"
+        os.environ["CIRCUIT_FAILURE_THRESHOLD"] = "3"
+        os.environ["CIRCUIT_RESET_SECONDS"] = "1"
+        # One search per infer call, so every request reaches the fake server
+        os.environ["SEARCH_BATCH_MAX_SIZE"] = "1"
+
+        ok = asyncio.run(check_llm(args.requests, args.concurrency))
+        ok &= asyncio.run(check_search(f"127.0.0.1:{triton.port}", args.requests, args.concurrency))
+        triton_app.state.slow_fraction = 0.0
+        ok &= asyncio.run(check_deadline_and_circuit(triton_app))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Check the LLM response cache against the stub provider.
+
+Sends Anthropic requests through ``LLMService.generate_response`` with the
+response cache enabled. The script checks that:
+
+* ``--concurrency`` identical concurrent requests make one upstream call
+  (single-flight) and all get the same reply
+* a repeat of the same request is served from the cache without an
+  upstream call
+* a request with ``use_cache=False`` and a request with different messages
+  both go upstream
+* a request whose first caller is cancelled still completes for the others
+
+It then prints the cache stats: hit rate and saved upstream latency.
+
+Usage (from the backend directory):
+    python -m benchmarks.response_cache [--concurrency 50] [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from benchmarks.stubs import StubServer, create_provider_app
+
+MODEL = "claude-3-5-sonnet-20241022"
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+async def run(concurrency: int, app) -> bool:
+    from config.settings import get_settings
+    from models.chat import ModelProvider
+    from services.llm import LLMService, create_http_client
+
+    service = LLMService()
+    http_client = create_http_client(get_settings())
+    service.init_clients(http_client)
+    provider = ModelProvider.ANTHROPIC
+    messages = [{"role": "user", "content": "Which roles fit a data engineer?"}]
+
+    ok = True
+    try:
+        before = app.state.requests
+        replies = await asyncio.gather(*(service.generate_response(messages, provider, MODEL)
+                                         for _ in range(concurrency)))
+        ok &= _check("concurrent identical requests share one upstream call",
+                     app.state.requests - before == 1 and len(set(replies)) == 1,
+                     f"{app.state.requests - before} upstream calls for {concurrency} requests")
+
+        before = app.state.requests
+        await service.generate_response(list(messages), provider, MODEL)
+        ok &= _check("repeat request served from cache", app.state.requests == before)
+
+        before = app.state.requests
+        await service.generate_response(messages, provider, MODEL, use_cache=False)
+        ok &= _check("use_cache=False goes upstream", app.state.requests - before == 1)
+
+        before = app.state.requests
+        await service.generate_response([{"role": "user", "content": "And a data scientist?"}], provider, MODEL)
+        ok &= _check("different messages go upstream", app.state.requests - before == 1)
+
+        other = [{"role": "user", "content": "Retry after disconnect"}]
+        first = asyncio.ensure_future(service.generate_response(other, provider, MODEL))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(service.generate_response(other, provider, MODEL))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        reply = await second
+        ok &= _check("cancelling the first caller does not cancel the shared call", bool(reply))
+
+        print(json.dumps(service.response_cache_stats(), indent=2))
+    finally:
+        await http_client.aclose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub provider latency (s)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    app = create_provider_app(latency=args.latency)
+    with StubServer(app) as stub:
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["ANTHROPIC_BASE_URL"] = stub.url
+        os.environ["RESPONSE_CACHE_ENABLED"] = "true"
+        os.environ["OPENAI_AGENTS_DISABLE_TRACING"] = "1"
+        ok = asyncio.run(run(args.concurrency, app))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Compare job search throughput with and without micro-batching.
+
+Starts a fake Triton server whose ``searcher`` model has a fixed per-call
+cost plus a small per-item cost (one model instance), then fires concurrent
+searches through ``Searcher`` with batching disabled and enabled.
+
+Usage (from the backend directory):
+    python -m benchmarks.search_batching [--requests 500] [--concurrency 100]
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.stubs import StubServer, create_triton_app
+from services.search_client import Searcher
+
+
+async def _run(url: str, max_batch_size: int, window_ms: float, requests: int, concurrency: int) -> dict:
+    searcher = Searcher(url=url, conn_limit=concurrency, max_batch_size=max_batch_size, batch_window_ms=window_ms)
+    await searcher.start()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with gate:
+            results = await searcher.search(query=f"ml engineer {i % 50}", k=5)
+            assert len(results) == 5 and results[0]["title"].startswith(f"ml engineer {i % 50} ")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await searcher.close()
+    return {"elapsed": elapsed, "throughput": requests / elapsed, **searcher.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.02, help="fixed cost per infer call (s)")
+    parser.add_argument("--per-item-latency", type=float, default=0.0005, help="cost per query in a batch (s)")
+    args = parser.parse_args()
+
+    app = create_triton_app(latency=args.latency, per_item_latency=args.per_item_latency)
+    with StubServer(app) as triton:
+        url = f"127.0.0.1:{triton.port}"
+        for label, batch_size in (("unbatched", 1), ("batched", args.max_batch_size)):
+            calls_before = app.state.infer_calls
+            result = asyncio.run(_run(url, batch_size, args.window_ms, args.requests, args.concurrency))
+            calls = app.state.infer_calls - calls_before
+            print(f"{label:>10}: {result['throughput']:8.1f} searches/s "
+                  f"({args.requests} searches in {result['elapsed']:.2f}s, {calls} infer calls)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+"""
+Local stand-ins for upstream services used by the benchmark scripts.
+
+The stub provider speaks just enough of the OpenAI and Anthropic HTTP APIs
+for the SDK clients in ``services.llm`` to work against it, and the fake
+Triton server speaks the KServe v2 binary-tensor protocol used by
+``tritonclient``. Both use fixed latencies so concurrency effects are easy
+to see, plus optional injected faults: a ``slow_fraction`` of requests
+take ``slow_latency`` longer, and an ``error_fraction`` fail with a 503.
+The fault settings live on ``app.state`` and can be changed while running.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from tritonclient.utils import deserialize_bytes_tensor, serialize_byte_tensor
+
+
+def _inject_faults(app: FastAPI) -> float:
+    """Extra delay for this request, or -1 if it should fail"""
+    if random.random() < app.state.error_fraction:
+        return -1.0
+    if random.random() < app.state.slow_fraction:
+        return app.state.slow_latency
+    return 0.0
+
+
+def _set_faults(app: FastAPI, slow_fraction: float, slow_latency: float, error_fraction: float):
+    app.state.slow_fraction = slow_fraction
+    app.state.slow_latency = slow_latency
+    app.state.error_fraction = error_fraction
+    app.state.failed = 0
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _text_blocks(content) -> list:
+    """``(text, cache_control)`` pairs for a string or a list of content blocks"""
+    if content is None:
+        return []
+    if isinstance(content, str):
+        return [(content, False)]
+    return [(block.get("text", ""), "cache_control" in block) for block in content]
+
+
+class PromptCacheSim:
+    """Approximate provider prompt caches over request prefixes.
+
+    Prefix hashes are taken at every content block boundary (about 4
+    characters per token).
+
+    * Anthropic mode writes a prefix at each ``cache_control`` breakpoint.
+      On read it looks back up to 20 blocks from each breakpoint for a prefix
+      written earlier.
+    * Automatic mode (OpenAI) caches every boundary of prompts of at least
+      1024 tokens and serves the longest prefix seen before.
+    """
+
+    LOOKBACK_BLOCKS = 20
+    MIN_AUTOMATIC_TOKENS = 1024
+
+    def __init__(self):
+        self.prefixes = set()
+
+    @staticmethod
+    def _boundaries(blocks: list) -> list:
+        digest = hashlib.sha256()
+        chars = 0
+        boundaries = []
+        for text, _ in blocks:
+            digest.update(text.encode())
+            digest.update(b"\x00")
+            chars += len(text)
+            boundaries.append((digest.copy().hexdigest(), chars // 4))
+        return boundaries
+
+    def anthropic(self, blocks: list) -> dict:
+        boundaries = self._boundaries(blocks)
+        total = boundaries[-1][1] if boundaries else 0
+        breakpoints = [index for index, (_, marked) in enumerate(blocks) if marked]
+        read = 0
+        for index in breakpoints:
+            for back in range(index, max(-1, index - self.LOOKBACK_BLOCKS), -1):
+                if boundaries[back][0] in self.prefixes:
+                    read = max(read, boundaries[back][1])
+                    break
+        write = 0
+        if breakpoints:
+            write = max(0, boundaries[breakpoints[-1]][1] - read)
+            for index in breakpoints:
+                self.prefixes.add(boundaries[index][0])
+        return {"input_tokens": total - read - write, "cache_read_input_tokens": read,
+                "cache_creation_input_tokens": write}
+
+    def automatic(self, blocks: list) -> int:
+        boundaries = self._boundaries(blocks)
+        if not boundaries or boundaries[-1][1] < self.MIN_AUTOMATIC_TOKENS:
+            return 0
+        cached = max((tokens for digest, tokens in boundaries if digest in self.prefixes), default=0)
+        self.prefixes.update(digest for digest, _ in boundaries)
+        return cached
+
+
+def create_provider_app(latency: float = 0.5, reply: str = "Hello from the stub provider",
+                        token_delay: float = 0.0, rate_limit: int = 0, slow_fraction: float = 0.0,
+                        slow_latency: float = 0.0, error_fraction: float = 0.0,
+                        agent_tools: bool = False) -> FastAPI:
+    """Build a fake OpenAI + Anthropic API.
+
+    ``latency`` is the delay before the first token (or the whole response
+    when not streaming); ``token_delay`` is the gap between streamed tokens.
+    With ``rate_limit`` > 0, Anthropic requests beyond that many in flight
+    get a 429 with ``retry-after`` and rate-limit headers, like a provider
+    concurrency limit; it can be changed later via ``app.state.rate_limit``.
+    Faults are injected into non-streaming Anthropic requests. With
+    ``agent_tools``, non-streaming Responses API calls act like a model that
+    hands off to the job search agent and calls ``job_search_tool`` once
+    before answering.
+    """
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.in_flight = 0
+    app.state.max_in_flight = 0
+    app.state.rate_limited = 0
+    app.state.rate_limit = rate_limit
+    app.state.model_list_calls = 0
+    app.state.last_bodies = {}
+    _set_faults(app, slow_fraction, slow_latency, error_fraction)
+    anthropic_cache = PromptCacheSim()
+    openai_cache = PromptCacheSim()
+    tokens = [word + " " for word in reply.split(" ")]
+    tokens[-1] = tokens[-1].rstrip()
+
+    async def token_stream():
+        await asyncio.sleep(latency)
+        for token in tokens:
+            yield token
+            if token_delay:
+                await asyncio.sleep(token_delay)
+
+    def usage_openai_responses(body: dict) -> dict:
+        blocks = _text_blocks(body.get("instructions"))
+        items = body.get("input")
+        for item in [items] if isinstance(items, str) else items or []:
+            blocks.extend(_text_blocks(item if isinstance(item, str) else item.get("content")))
+        input_tokens = max(sum(len(text) for text, _ in blocks) // 4, 1)
+        cached = openai_cache.automatic(blocks)
+        return {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": cached},
+            "output_tokens": len(tokens),
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + len(tokens),
+        }
+
+    def next_tool_call(body: dict):
+        tools = [tool.get("name", "") for tool in body.get("tools") or []]
+        items = body.get("input")
+        items = [] if isinstance(items, str) else items or []
+        answered = {item.get("call_id") for item in items
+                    if isinstance(item, dict) and item.get("type") == "function_call_output"}
+        if "job_search_tool" in tools and "call_search" not in answered:
+            return {"call_id": "call_search", "name": "job_search_tool",
+                    "arguments": json.dumps({"query": "data engineer", "k": 3})}
+        if "transfer_to_job_search_agent" in tools and not answered:
+            return {"call_id": "call_handoff", "name": "transfer_to_job_search_agent", "arguments": "{}"}
+        return None
+
+    def responses_object(response_id: str, model: str, text: str, status: str, usage: dict = None,
+                         tool_call: dict = None) -> dict:
+        output = []
+        if tool_call:
+            output.append({"type": "function_call", "id": f"fc_{tool_call['call_id']}", "status": "completed",
+                           **tool_call})
+        elif status == "completed":
+            output.append({
+                "type": "message", "id": "msg_stub", "role": "assistant", "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            })
+        return {
+            "id": response_id, "object": "response", "created_at": int(time.time()), "model": model,
+            "status": status, "output": output, "parallel_tool_calls": True, "tool_choice": "auto",
+            "tools": [], "usage": usage,
+        }
+
+    @app.get("/v1/models")
+    async def list_models():
+        app.state.model_list_calls += 1
+        await asyncio.sleep(latency)
+        return {
+            "object": "list",
+            "data": [
+                {"id": "gpt-4o-mini", "object": "model", "created": 0, "owned_by": "stub"},
+                {"id": "gpt-5", "object": "model", "created": 0, "owned_by": "stub"},
+            ],
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: dict):
+        app.state.requests += 1
+        app.state.last_bodies["chat_completions"] = body
+        await asyncio.sleep(latency)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": len(tokens), "total_tokens": 10 + len(tokens)},
+        }
+
+    @app.post("/v1/responses")
+    async def responses(body: dict):
+        """OpenAI Responses API, used by the agents SDK"""
+        app.state.requests += 1
+        app.state.last_bodies["responses"] = body
+        model = body.get("model", "stub")
+        response_id = f"resp_{uuid.uuid4().hex}"
+        usage = usage_openai_responses(body)
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            tool_call = next_tool_call(body) if agent_tools else None
+            return responses_object(response_id, model, reply, "completed", usage, tool_call)
+
+        async def events():
+            seq = 0
+
+            def frame(event_type: str, **data) -> str:
+                nonlocal seq
+                seq += 1
+                return _sse(event_type, {"type": event_type, "sequence_number": seq, **data})
+
+            yield frame("response.created", response=responses_object(response_id, model, "", "in_progress"))
+            yield frame("response.output_item.added", output_index=0, item={
+                "type": "message", "id": "msg_stub", "role": "assistant", "status": "in_progress", "content": [],
+            })
+            yield frame("response.content_part.added", item_id="msg_stub", output_index=0, content_index=0,
+                        part={"type": "output_text", "text": "", "annotations": []})
+            async for token in token_stream():
+                yield frame("response.output_text.delta", item_id="msg_stub", output_index=0,
+                            content_index=0, delta=token, logprobs=[])
+            yield frame("response.output_text.done", item_id="msg_stub", output_index=0,
+                        content_index=0, text=reply, logprobs=[])
+            completed = responses_object(response_id, model, reply, "completed", usage)
+            yield frame("response.output_item.done", output_index=0, item=completed["output"][0])
+            yield frame("response.completed", response=completed)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    def rate_limit_headers(remaining: int) -> dict:
+        return {
+            "anthropic-ratelimit-requests-limit": str(app.state.rate_limit),
+            "anthropic-ratelimit-requests-remaining": str(remaining),
+            "anthropic-ratelimit-requests-reset": "1s",
+        }
+
+    @app.post("/v1/messages")
+    async def anthropic_messages(body: dict):
+        app.state.requests += 1
+        app.state.last_bodies["messages"] = body
+        if app.state.rate_limit and app.state.in_flight >= app.state.rate_limit:
+            app.state.rate_limited += 1
+            return Response(
+                status_code=429, media_type="application/json",
+                content=json.dumps({"type": "error", "error": {"type": "rate_limit_error",
+                                                               "message": "Too many concurrent requests"}}),
+                headers={"retry-after": "1", **rate_limit_headers(0)},
+            )
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+        try:
+            return await anthropic_reply(body)
+        finally:
+            app.state.in_flight -= 1
+
+    async def anthropic_reply(body: dict):
+        blocks = _text_blocks(body.get("system"))
+        for msg in body.get("messages", []):
+            blocks.extend(_text_blocks(msg.get("content")))
+        usage = anthropic_cache.anthropic(blocks)
+        message = {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "content": [{"type": "text", "text": reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {**usage, "output_tokens": len(tokens)},
+        }
+        if not body.get("stream"):
+            extra = _inject_faults(app)
+            if extra < 0:
+                app.state.failed += 1
+                return Response(status_code=503, media_type="application/json",
+                                content=json.dumps({"type": "error", "error": {"type": "overloaded_error",
+                                                                               "message": "Injected failure"}}))
+            await asyncio.sleep(latency + extra)
+            if app.state.rate_limit:
+                return Response(content=json.dumps(message), media_type="application/json",
+                                headers=rate_limit_headers(app.state.rate_limit - app.state.in_flight))
+            return message
+
+        async def events():
+            yield _sse("message_start", {"type": "message_start", "message": {
+                **message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 0},
+            }})
+            yield _sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                               "content_block": {"type": "text", "text": ""}})
+            async for token in token_stream():
+                yield _sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                   "delta": {"type": "text_delta", "text": token}})
+            yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            yield _sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn",
+                                                                           "stop_sequence": None},
+                                         "usage": {"output_tokens": len(tokens)}})
+            yield _sse("message_stop", {"type": "message_stop"})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def _fake_job(query: str, rank: int) -> dict:
+    return {
+        "title": f"{query} #{rank}",
+        "url": f"https://jobs.example.com/{abs(hash(query)) % 100000}/{rank}",
+        "job": {"job_id": f"job-{rank}", "title": f"{query} #{rank}", "location": "San Francisco, CA"},
+        "score": round(1.0 / (rank + 1), 4),
+    }
+
+
+def create_triton_app(latency: float = 0.05, per_item_latency: float = 0.0, instances: int = 1,
+                      slow_fraction: float = 0.0, slow_latency: float = 0.0, error_fraction: float = 0.0) -> FastAPI:
+    """Build a fake Triton server hosting the ``searcher`` ensemble.
+
+    A batch of N queries costs ``latency + N * per_item_latency`` seconds and
+    at most ``instances`` batches execute at once, like model instances on a
+    GPU. For
+    a single query ``Responses`` has shape ``[k]``; for a batch it is
+    ``[N, max_k]`` with rows padded by empty strings.
+    """
+    app = FastAPI()
+    app.state.infer_calls = 0
+    app.state.batch_sizes = []
+    _set_faults(app, slow_fraction, slow_latency, error_fraction)
+    model_instances = asyncio.Semaphore(instances)
+
+    @app.get("/v2/health/ready")
+    async def ready():
+        return {}
+
+    @app.post("/v2/models/{model_name}/infer")
+    async def infer(model_name: str, request: Request):
+        body = await request.body()
+        header_size = int(request.headers.get("Inference-Header-Content-Length", len(body)))
+        header = json.loads(body[:header_size])
+
+        offset = header_size
+        tensors = {}
+        for tensor in header["inputs"]:
+            binary_size = tensor.get("parameters", {}).get("binary_data_size")
+            if binary_size is None:
+                data = np.array(tensor["data"], dtype=object if tensor["datatype"] == "BYTES" else np.int32)
+            else:
+                raw = body[offset:offset + binary_size]
+                offset += binary_size
+                if tensor["datatype"] == "BYTES":
+                    data = deserialize_bytes_tensor(raw)
+                else:
+                    data = np.frombuffer(raw, dtype=np.int32)
+            tensors[tensor["name"]] = data.reshape(tensor["shape"])
+
+        queries = [q.decode() if isinstance(q, bytes) else q for q in tensors["Query"].reshape(-1)]
+        ks = [int(k) for k in tensors["K"].reshape(-1)]
+        app.state.infer_calls += 1
+        app.state.batch_sizes.append(len(queries))
+        extra = _inject_faults(app)
+        if extra < 0:
+            app.state.failed += 1
+            return Response(status_code=503, content=json.dumps({"error": "Injected failure"}),
+                            media_type="application/json")
+        async with model_instances:
+            await asyncio.sleep(latency + per_item_latency * len(queries))
+        # A slow request holds no model instance, like a stalled connection
+        await asyncio.sleep(extra)
+
+        rows = [[json.dumps(_fake_job(q, rank)).encode() for rank in range(k)] for q, k in zip(queries, ks)]
+        if len(rows) == 1:
+            output = np.array(rows[0], dtype=object)
+        else:
+            width = max(ks)
+            output = np.array([row + [b""] * (width - len(row)) for row in rows], dtype=object)
+
+        raw_output = serialize_byte_tensor(output).item()
+        response_header = json.dumps({
+            "model_name": model_name,
+            "outputs": [{
+                "name": "Responses",
+                "datatype": "BYTES",
+                "shape": list(output.shape),
+                "parameters": {"binary_data_size": len(raw_output)},
+            }],
+        }).encode()
+        return Response(
+            content=response_header + raw_output,
+            media_type="application/octet-stream",
+            headers={"Inference-Header-Content-Length": str(len(response_header))},
+        )
+
+    return app
+
+
+class StubServer:
+    """Run an ASGI app with uvicorn on a background thread"""
+
+    def __init__(self, app: FastAPI, port: int = 0):
+        self.app = app
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
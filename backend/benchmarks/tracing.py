@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Check request tracing end to end and measure span overhead.
+
+The script:
+
+* times an empty ``tracer.span`` block and fails if it costs more than
+  ``--budget-us``
+* runs the application against the stub provider (which hands off to the
+  job search agent and calls ``job_search_tool``) and the fake Triton
+  server, with spans exported to a JSON-lines file. It sends an Anthropic
+  turn that continues a W3C ``traceparent``, an OpenAI agent turn and a PDF
+  upload, then checks the ``X-Trace-Id`` and ``Server-Timing`` headers, that
+  every exported span's parent is in its trace, and that the agent turn
+  nests as router -> send_message -> agent -> tool -> search -> Triton
+* exports spans with ``OtlpJsonExporter`` both to a file and to a fake
+  OTLP/HTTP collector and checks the payload shape
+
+Usage (from the backend directory):
+    python -m benchmarks.tracing [--calls 100000] [--budget-us 10]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from fastapi import FastAPI, Request
+
+from benchmarks.stubs import StubServer, create_provider_app, create_triton_app
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def _check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+def check_overhead(calls: int, budget_us: float) -> bool:
+    from services.tracing import Tracer
+
+    tracer = Tracer()
+    root = tracer.start_span("root")
+    with tracer.activate(root):
+        start = time.perf_counter()
+        for _ in range(calls):
+            with tracer.span("child", k=3):
+                pass
+        elapsed = time.perf_counter() - start
+    per_span_us = elapsed / calls * 1e6
+    return _check("span overhead within budget", per_span_us <= budget_us, f"{per_span_us:.2f} µs per span")
+
+
+def _timing_names(response) -> set:
+    header = response.headers.get("server-timing", "")
+    return {entry.split(";")[0].strip() for entry in header.split(",") if entry.strip()}
+
+
+def _ancestors(span: dict, by_id: dict) -> list:
+    names = []
+    while span.get("parent_id") in by_id:
+        span = by_id[span["parent_id"]]
+        names.append(span["name"])
+    return names
+
+
+def _print_tree(spans: list):
+    children = defaultdict(list)
+    ids = {span["span_id"] for span in spans}
+    for span in sorted(spans, key=lambda s: s["start_time_unix_nano"]):
+        children[span["parent_id"] if span["parent_id"] in ids else None].append(span)
+
+    def walk(parent, depth):
+        for span in children[parent]:
+            print(f"  {'  ' * depth}{span['name']} {span['duration_ms']:.1f} ms")
+            walk(span["span_id"], depth + 1)
+
+    walk(None, 0)
+
+
+async def check_app(pdf_path: str, trace_path: str) -> bool:
+    import httpx
+    from agents import set_trace_processors
+    from main import app as chat_app
+    from services.agent import install_trace_bridge
+    from services.llm import llm_service
+
+    ok = True
+    async with chat_app.router.lifespan_context(chat_app):
+        await llm_service.ready()
+        # Keep agent spans local instead of also uploading them to OpenAI
+        set_trace_processors([install_trace_bridge()])
+        transport = httpx.ASGITransport(app=chat_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://chat", timeout=60) as client:
+            response = await client.post("/chat/conversations/tracing-anthropic/messages", json={
+                "message": "Hello", "model_provider": "anthropic", "model_name": "claude-3-5-sonnet-20241022"
+            }, headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+            response.raise_for_status()
+            names = _timing_names(response)
+            print(f"  anthropic Server-Timing: {response.headers.get('server-timing')}")
+            ok &= _check("traceparent is continued", response.headers.get("x-trace-id") == TRACE_ID)
+            ok &= _check("Server-Timing breaks down the turn",
+                         {"send_message", "llm.generate", "llm.call", "total"} <= names, str(sorted(names)))
+
+            response = await client.post("/chat/conversations/tracing-openai/messages", json={
+                "message": "Find data engineering jobs", "model_provider": "openai", "model_name": "gpt-4o-mini"
+            })
+            response.raise_for_status()
+            agent_trace = response.headers.get("x-trace-id")
+            names = _timing_names(response)
+            print(f"  agent Server-Timing: {response.headers.get('server-timing')}")
+            ok &= _check("Server-Timing includes agent steps",
+                         {"agent.Router", "handoff", "agent.Job_Search_Agent", "tool.job_search_tool",
+                          "search", "triton.infer"} <= names, str(sorted(names)))
+
+            with open(pdf_path, "rb") as f:
+                response = await client.post("/chat/upload", files={"file": ("resume.pdf", f, "application/pdf")})
+            response.raise_for_status()
+            ok &= _check("Server-Timing includes PDF extraction", "pdf.extract" in _timing_names(response))
+
+    # The lifespan flushed the exporter on shutdown
+    traces = defaultdict(list)
+    with open(trace_path) as f:
+        for line in f:
+            span = json.loads(line)
+            traces[span["trace_id"]].append(span)
+    orphans = []
+    for trace_id, spans in traces.items():
+        by_id = {span["span_id"]: span for span in spans}
+        roots = [span for span in spans if span["parent_id"] not in by_id]
+        if len(roots) != 1:
+            orphans.append((trace_id, [span["name"] for span in roots]))
+    ok &= _check("every exported span's parent is in its trace", not orphans and len(traces) >= 3,
+                 f"{sum(map(len, traces.values()))} spans in {len(traces)} traces" +
+                 (f", orphans: {orphans}" if orphans else ""))
+    ok &= _check("remote parent kept on the root span",
+                 any(span["parent_id"] == PARENT_ID for span in traces[TRACE_ID]))
+
+    spans = traces.get(agent_trace, [])
+    by_id = {span["span_id"]: span for span in spans}
+    triton = next((span for span in spans if span["name"] == "triton.infer"), None)
+    chain = _ancestors(triton, by_id) if triton else []
+    expected = ["search", "tool.job_search_tool", "agent.Job Search Agent", "llm.call", "llm.generate",
+                "send_message", "POST /chat/conversations/tracing-openai/messages"]
+    ok &= _check("agent turn nests from the router down to Triton",
+                 all(name in chain for name in expected), " <- ".join(["triton.infer"] + chain))
+    _print_tree(spans)
+    return ok
+
+
+async def check_otlp(workdir: str) -> bool:
+    from services.tracing import OtlpJsonExporter, Tracer
+
+    collector = FastAPI()
+    collector.state.payloads = []
+
+    @collector.post("/v1/traces")
+    async def receive(request: Request):
+        collector.state.payloads.append(await request.json())
+        return {}
+
+    ok = True
+    path = os.path.join(workdir, "otlp.jsonl")
+    with StubServer(collector) as server:
+        for label, exporter in (("file", OtlpJsonExporter(path=path)),
+                                ("collector", OtlpJsonExporter(endpoint=f"{server.url}/v1/traces"))):
+            tracer = Tracer(exporter)
+            with tracer.span("root"):
+                with tracer.span("child", k=3, cached=False, score=0.5):
+                    pass
+            await asyncio.to_thread(tracer.close)
+            if label == "file":
+                with open(path) as f:
+                    payloads = [json.loads(line) for line in f]
+            else:
+                payloads = collector.state.payloads
+            spans = [span for payload in payloads for resource in payload["resourceSpans"]
+                     for scope in resource["scopeSpans"] for span in scope["spans"]]
+            child = next((span for span in spans if span["name"] == "child"), {})
+            root = next((span for span in spans if span["name"] == "root"), {})
+            ok &= _check(f"OTLP/JSON export to {label}",
+                         len(spans) == 2 and child.get("parentSpanId") == root.get("spanId")
+                         and len(child.get("traceId", "")) == 32
+                         and {"key": "k", "value": {"intValue": "3"}} in child.get("attributes", []),
+                         f"{len(spans)} spans")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--budget-us", type=float, default=10.0, help="max cost of one span")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    ok = check_overhead(args.calls, args.budget_us)
+
+    import fitz
+    with tempfile.TemporaryDirectory() as workdir, \
+            StubServer(create_provider_app(latency=0.02, agent_tools=True)) as provider, \
+            StubServer(create_triton_app(latency=0.01)) as triton:
+        pdf_path = os.path.join(workdir, "resume.pdf")
+        doc = fitz.open()
+        for page_num in range(3):
+            doc.new_page().insert_text((72, 72), f"Page {page_num + 1}: senior data engineer, Python, SQL")
+        doc.save(pdf_path)
+        doc.close()
+
+        trace_path = os.path.join(workdir, "traces.jsonl")
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-ant-stub"
+        os.environ["OPENAI_BASE_URL"] = f"{provider.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = provider.url
+        os.environ["TRITON_ENDPOINT"] = f"127.0.0.1:{triton.port}"
+        os.environ["TRACING_EXPORTER"] = "jsonl"
+        os.environ["TRACING_PATH"] = trace_path
+        ok &= asyncio.run(check_app(pdf_path, trace_path))
+        ok &= asyncio.run(check_otlp(workdir))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
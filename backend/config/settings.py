@@ -1,5 +1,6 @@
 import os
 from functools import lru_cache
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -11,6 +12,130 @@ class Settings(BaseSettings):
     max_output_tokens: int = int(os.getenv("MAX_OUTPUT_TOKENS", "5000"))
     max_file_size: int = 10 * 1024 * 1024  # 10MB
     supported_file_types: list = [".pdf", ".txt"]
+    # Directory for spooling uploads to disk (system temp dir if unset)
+    upload_spool_dir: Optional[str] = os.getenv("UPLOAD_SPOOL_DIR")
+    # PDF extraction process pool
+    pdf_workers: int = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+    pdf_pages_per_task: int = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+    pdf_extract_timeout: float = float(os.getenv("PDF_EXTRACT_TIMEOUT", "60"))
+    # Extracted text cache: in-memory LRU plus an optional compressed on-disk tier
+    extract_cache_bytes: int = int(os.getenv("EXTRACT_CACHE_BYTES", str(64 * 1024 * 1024)))
+    extract_cache_dir: Optional[str] = os.getenv("EXTRACT_CACHE_DIR")
+    extract_cache_disk_bytes: int = int(os.getenv("EXTRACT_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+
+    # Conversation storage: "memory" or "sqlite"
+    conversation_store: str = os.getenv("CONVERSATION_STORE", "memory")
+    sqlite_path: str = os.getenv("SQLITE_PATH", "data/conversations.db")
+    conversation_write_batch_size: int = int(os.getenv("CONVERSATION_WRITE_BATCH_SIZE", "256"))
+    conversation_flush_interval_ms: float = float(os.getenv("CONVERSATION_FLUSH_INTERVAL_MS", "50"))
+    conversation_cache_size: int = int(os.getenv("CONVERSATION_CACHE_SIZE", "1000"))
+    attachment_cache_bytes: int = int(os.getenv("ATTACHMENT_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+    # Prompt assembly: input token budgets (by model name prefix) and history summaries
+    prompt_token_budget: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "16000"))
+    prompt_token_budgets: Dict[str, int] = {
+        "gpt-5": 200000,
+        "gpt-4o": 100000,
+        "gpt-4-turbo": 100000,
+        "gpt-4": 6000,
+        "gpt-3.5": 12000,
+        "claude-3": 150000,
+    }
+    prompt_min_recent_messages: int = int(os.getenv("PROMPT_MIN_RECENT_MESSAGES", "4"))
+    prompt_summary_block_size: int = int(os.getenv("PROMPT_SUMMARY_BLOCK_SIZE", "10"))
+    prompt_summary_max_tokens: int = int(os.getenv("PROMPT_SUMMARY_MAX_TOKENS", "1000"))
+    prompt_summary_cache_size: int = int(os.getenv("PROMPT_SUMMARY_CACHE_SIZE", "10000"))
+    prompt_summary_max_pending: int = int(os.getenv("PROMPT_SUMMARY_MAX_PENDING", "16"))
+    prompt_summary_timeout_seconds: float = float(os.getenv("PROMPT_SUMMARY_TIMEOUT_SECONDS", "60"))
+    summary_openai_model: str = os.getenv("SUMMARY_OPENAI_MODEL", "gpt-4o-mini")
+    summary_anthropic_model: str = os.getenv("SUMMARY_ANTHROPIC_MODEL", "claude-3-haiku-20240307")
+    # Provider prompt caching of the stable prompt prefix
+    prompt_cache_enabled: bool = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+    prompt_cache_min_tokens: int = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+    # Retrieval over long attachments (BM25 over overlapping chunks)
+    retrieval_enabled: bool = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+    retrieval_full_text_tokens: int = int(os.getenv("RETRIEVAL_FULL_TEXT_TOKENS", "2000"))
+    retrieval_top_k: int = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+    retrieval_chunk_chars: int = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1500"))
+    retrieval_chunk_overlap: int = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "200"))
+    retrieval_index_cache_size: int = int(os.getenv("RETRIEVAL_INDEX_CACHE_SIZE", "256"))
+
+    # Per-conversation agent context limits
+    agent_context_max_searches: int = int(os.getenv("AGENT_CONTEXT_MAX_SEARCHES", "20"))
+    agent_context_max_files: int = int(os.getenv("AGENT_CONTEXT_MAX_FILES", "5"))
+
+    # LLM provider endpoints (override to point at a proxy or local stub)
+    openai_base_url: Optional[str] = os.getenv("OPENAI_BASE_URL") or None
+    anthropic_base_url: Optional[str] = os.getenv("ANTHROPIC_BASE_URL") or None
+
+    # Shared outbound HTTP pool used by the LLM provider clients
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    http_max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    http_keepalive_expiry: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    http_connect_timeout: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    http_read_timeout: float = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+    http_pool_timeout: float = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+
+    # Triton job search backend
+    triton_endpoint: str = os.getenv("TRITON_ENDPOINT", "ensemble-model:8000")
+    triton_model_name: str = os.getenv("TRITON_MODEL_NAME", "searcher")
+    triton_conn_limit: int = int(os.getenv("TRITON_CONN_LIMIT", "32"))
+    triton_timeout: float = float(os.getenv("TRITON_TIMEOUT", "30"))
+    # Coalesce concurrent searches into one infer call (1 disables batching)
+    search_batch_max_size: int = int(os.getenv("SEARCH_BATCH_MAX_SIZE", "32"))
+    search_batch_window_ms: float = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "5"))
+    # Search result cache (0 entries disables it)
+    search_cache_ttl_seconds: float = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+    search_cache_max_entries: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+    search_cache_max_bytes: int = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    # Admission control for upstream LLM calls (0 concurrency disables it):
+    # concurrent calls per provider and per model, and how many requests may
+    # wait, and for how long, before getting a 429
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    llm_max_concurrency_per_model: int = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "16"))
+    llm_queue_size: int = int(os.getenv("LLM_QUEUE_SIZE", "64"))
+    llm_queue_timeout_seconds: float = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+    # Request deadline in seconds (0 disables); clients can ask for a shorter
+    # one with an X-Request-Timeout header
+    request_timeout_seconds: float = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "120"))
+    # Resilience for LLM and Triton calls: attempts per call, hedging once an
+    # attempt runs past this percentile of recent latencies (0 disables it),
+    # retries and hedges as a fraction of traffic, and how many consecutive
+    # failures open a dependency's circuit, and for how long
+    llm_max_attempts: int = int(os.getenv("LLM_MAX_ATTEMPTS", "2"))
+    llm_hedge_percentile: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    search_max_attempts: int = int(os.getenv("SEARCH_MAX_ATTEMPTS", "3"))
+    search_attempt_timeout_seconds: float = float(os.getenv("SEARCH_ATTEMPT_TIMEOUT_SECONDS", "5"))
+    search_hedge_percentile: float = float(os.getenv("SEARCH_HEDGE_PERCENTILE", "95"))
+    retry_budget_ratio: float = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+    circuit_failure_threshold: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    circuit_reset_seconds: float = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+    # Batch chat: items per request and how many of them run at once. Each
+    # item gets its own request_timeout_seconds deadline, and an item turned
+    # away by admission control is retried at most batch_max_retries times.
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+    batch_max_retries: int = int(os.getenv("BATCH_MAX_RETRIES", "5"))
+
+    # Request tracing: spans are exported to "jsonl" (tracing_path), "otlp"
+    # (OTLP/JSON POSTed to tracing_otlp_endpoint, or appended to tracing_path
+    # when no endpoint is set) or "none". Server-Timing works either way.
+    tracing_exporter: str = os.getenv("TRACING_EXPORTER", "none")
+    tracing_path: str = os.getenv("TRACING_PATH", "data/traces.jsonl")
+    tracing_otlp_endpoint: str = os.getenv("TRACING_OTLP_ENDPOINT", "")
+    server_timing_enabled: bool = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+    # Background refresh interval for the /chat/models catalog
+    model_catalog_refresh_seconds: float = float(os.getenv("MODEL_CATALOG_REFRESH_SECONDS", "3600"))
+    # Exact-match LLM response cache; requests can opt out with "use_cache": false
+    response_cache_enabled: bool = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    response_cache_ttl_seconds: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600"))
+    response_cache_max_entries: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    response_cache_max_bytes: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    # Agent runs call tools that update the conversation's search context,
+    # which a cache hit would skip
+    response_cache_agent_runs: bool = os.getenv("RESPONSE_CACHE_AGENT_RUNS", "false").lower() == "true"
     
     class Config:
         env_file = ".env"
@@ -2,13 +2,22 @@ import logging
 import os
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
 from routers import chat, search
 from config.settings import get_settings
+from services.llm import llm_service, create_http_client
+from services.model_catalog import model_catalog
+from services.search_client import SEARCHER
+from services.conversation import conversation_manager
+from services.file_processor import file_processor
+from services.uploads import BodySizeLimitMiddleware, MULTIPART_OVERHEAD_BYTES
+from services.resilience import DeadlineMiddleware
+from services.metrics import metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from services.tracing import TracingMiddleware, create_exporter, tracer
 
 # Load environment variables
 load_dotenv()
@@ -24,8 +33,27 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     logger.info("Starting Semantix Chat application")
+    settings = get_settings()
+    tracer.configure(create_exporter(settings.tracing_exporter, settings.tracing_path,
+                                     settings.tracing_otlp_endpoint))
+    conversation_manager.start()
+    # One pooled keep-alive transport shared by all provider clients; its
+    # response hook feeds provider rate-limit headers to admission control
+    http_client = create_http_client(get_settings(), on_response=llm_service.observe_response)
+    # SDK imports and client setup run in the background so the app is
+    # ready at once; requests that need them wait for the warm-up
+    llm_service.warm_up(http_client)
+    SEARCHER.warm_up()
+    # Serve /chat/models from a snapshot refreshed in the background
+    model_catalog.start()
     yield
     logger.info("Shutting down Semantix Chat application")
+    await model_catalog.close()
+    await SEARCHER.close()
+    await http_client.aclose()
+    file_processor.close()
+    conversation_manager.close()
+    tracer.close()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -35,6 +63,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Refuse oversize uploads before the multipart body is parsed; added before
+# CORS so that CORS wraps it and the 413 carries the CORS headers
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_size=get_settings().max_file_size + MULTIPART_OVERHEAD_BYTES,
+    paths=["/chat/upload"],
+)
+
 # Configure CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -42,8 +78,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read the per-request timing breakdown
+    expose_headers=["Server-Timing", "X-Trace-Id"],
 )
 
+# Give each request a deadline that LLM and search calls inherit; batch
+# items each get their own instead
+app.add_middleware(DeadlineMiddleware, default_timeout=get_settings().request_timeout_seconds,
+                   exclude_paths=["/chat/batch"])
+
+# Trace each request; outermost, so the trace covers the other middleware
+app.add_middleware(TracingMiddleware, tracer=tracer, server_timing=get_settings().server_timing_enabled)
+
 # Include routers
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(search.router, prefix="/search", tags=["search"])
@@ -53,6 +99,11 @@ async def root():
     """Health check endpoint"""
     return {"message": "Semantix Chat API is running", "status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
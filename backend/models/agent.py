@@ -1,9 +1,49 @@
+import json
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
 
 @dataclass
 class AgentRunResultContext:
+    """Agent run context for a single conversation.
+
+    Remembered searches and uploaded files are capped; the oldest entries are
+    evicted first. Uploaded files are referenced by attachment id; their text
+    lives once in the attachment store.
+    """
     search_tool_results: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
     search_queries: List[str] = field(default_factory=list)
-    user_uploaded_files: List[str] = field(default_factory=list)
+    uploaded_file_ids: List[str] = field(default_factory=list)
+    max_searches: int = 20
+    max_uploaded_files: int = 5
+
+    def add_search_result(self, query: str, results: List[Dict[str, Any]]):
+        """Remember the results of a search, evicting the oldest searches"""
+        if query in self.search_tool_results:
+            del self.search_tool_results[query]
+            self.search_queries.remove(query)
+        self.search_tool_results[query] = results
+        self.search_queries.append(query)
+
+        while len(self.search_queries) > self.max_searches:
+            oldest = self.search_queries.pop(0)
+            self.search_tool_results.pop(oldest, None)
+
+    def add_uploaded_file(self, file_id: str):
+        """Remember an uploaded file, evicting the oldest files"""
+        if file_id in self.uploaded_file_ids:
+            self.uploaded_file_ids.remove(file_id)
+        self.uploaded_file_ids.append(file_id)
+        if len(self.uploaded_file_ids) > self.max_uploaded_files:
+            del self.uploaded_file_ids[:-self.max_uploaded_files]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate size of the remembered state in bytes"""
+        search_bytes = sum(len(q) + len(json.dumps(r)) for q, r in self.search_tool_results.items())
+        file_id_bytes = sum(len(f) for f in self.uploaded_file_ids)
+        return {
+            "searches": len(self.search_queries),
+            "uploaded_files": len(self.uploaded_file_ids),
+            "search_bytes": search_bytes,
+            "total_bytes": search_bytes + file_id_bytes,
+        }
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Any, List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
 from enum import Enum
 
 class ModelProvider(str, Enum):
@@ -21,7 +21,7 @@ class Message(BaseModel):
     content: str
     timestamp: datetime
     model_used: Optional[str] = None
-    file_attachment: Optional[str] = None
+    attachment_id: Optional[str] = None
 
 class Conversation(BaseModel):
     """Conversation model"""
@@ -32,7 +32,24 @@ class Conversation(BaseModel):
     updated_at: datetime
     model_provider: ModelProvider
     model_name: str
-    user_uploaded_files: List[str] = []
+    attachment_ids: List[str] = []
+    # Provider-format message log, kept in step by the conversation manager (see services.message_log)
+    _message_log: Optional[Any] = PrivateAttr(default=None)
+
+class ConversationSummary(BaseModel):
+    """Lightweight conversation listing entry"""
+    id: str
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    model_provider: ModelProvider
+    model_name: str
+    message_count: int = 0
+
+class ConversationSummaryPage(BaseModel):
+    """One page of conversation summaries, newest first"""
+    items: List[ConversationSummary]
+    next_cursor: Optional[str] = None
 
 class ChatRequest(BaseModel):
     """Chat request model"""
@@ -40,12 +57,42 @@ class ChatRequest(BaseModel):
     model_provider: ModelProvider
     model_name: str
     conversation_id: Optional[str] = None
+    file_id: Optional[str] = None
+    # Deprecated: send the extracted text inline instead of a file_id
     file_content: Optional[str] = None
+    # Set to false to bypass the response cache (e.g. "regenerate")
+    use_cache: bool = True
+
+class TokenUsage(BaseModel):
+    """Provider-reported token usage for one request.
+
+    ``input_tokens`` counts the whole prompt, including the part served from
+    (``cached_input_tokens``) or written to (``cache_write_tokens``) the
+    provider's prompt cache.
+    """
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_input_tokens: int = 0
+    cache_write_tokens: int = 0
 
 class ChatResponse(BaseModel):
     """Chat response model"""
     message: Message
     conversation_id: str
+    usage: Optional[TokenUsage] = None
+
+class BatchChatRequest(BaseModel):
+    """Chat turns to run concurrently; items without a conversation_id start a new conversation"""
+    items: List[ChatRequest] = Field(min_length=1)
+    # At most this many items run at once (capped by BATCH_MAX_CONCURRENCY)
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+class BatchChatResult(BaseModel):
+    """Outcome of one batch item, streamed as one NDJSON line when it finishes"""
+    index: int
+    status: int
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
 
 class ModelInfo(BaseModel):
     """Model information"""
@@ -57,6 +104,7 @@ class ModelInfo(BaseModel):
 class FileUploadResponse(BaseModel):
     """File upload response"""
     filename: str
-    content: str
+    file_id: str
+    characters: int
     size: int
     type: str
\ No newline at end of file
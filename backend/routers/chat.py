@@ -1,40 +1,106 @@
+import asyncio
+import json
 import logging
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
+import math
+import time
+import weakref
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Form, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from models.chat import (
     ChatRequest, ChatResponse, Conversation, Message, MessageRole, 
-    ModelProvider, ModelInfo, FileUploadResponse
+    ModelProvider, ModelInfo, FileUploadResponse, ConversationSummaryPage, TokenUsage,
+    BatchChatRequest, BatchChatResult
 )
+from config.settings import get_settings
 from services.conversation import conversation_manager
 from services.llm import llm_service
 from services.file_processor import file_processor
+from services.attachments import attachment_store
+from services.prompt import prompt_assembler
+from services.model_catalog import model_catalog, etag_matches
+from services.admission import AdmissionRejected
+from services.resilience import CircuitOpenError, DeadlineExceeded, deadline, remaining
+from services.metrics import metrics
+from services.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+SEND_MESSAGE_SECONDS = metrics.histogram(
+    "send_message_seconds", "End-to-end latency of sending a chat message, by response status",
+    ["provider", "model", "status"]
+)
+
 @router.get("/models", response_model=List[ModelInfo])
-async def get_available_models():
-    """Get list of available LLM models"""
+async def get_available_models(request: Request):
+    """Get list of available LLM models.
+
+    Served from the model catalog's precomputed snapshot; clients can
+    revalidate with ``If-None-Match`` and get a 304 while it is unchanged.
+    """
     try:
-        models = llm_service.get_available_models()
-        logger.info(f"Returned {len(models)} available models")
-        return models
+        snapshot = await model_catalog.snapshot()
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
     except Exception as e:
         logger.error(f"Error getting available models: {e}")
         raise HTTPException(status_code=500, detail="Failed to get available models")
 
+def _too_busy(error: AdmissionRejected) -> HTTPException:
+    """429 with ``Retry-After`` for a request turned away by admission control"""
+    return HTTPException(status_code=429, detail=str(error),
+                         headers={"Retry-After": str(math.ceil(error.retry_after))})
+
+def _unavailable(error: CircuitOpenError) -> HTTPException:
+    """503 with ``Retry-After`` while a provider's circuit is open"""
+    return HTTPException(status_code=503, detail=str(error),
+                         headers={"Retry-After": str(math.ceil(error.retry_after))})
+
+@router.get("/stats")
+async def get_stats():
+    """Conversation counts, agent context and attachment memory usage, extracted text cache, token usage, response cache, admission control, resilience"""
+    return {
+        **conversation_manager.get_stats(),
+        **attachment_store.stats(),
+        "extract_cache": file_processor.stats(),
+        "llm_usage": llm_service.usage_stats(),
+        "response_cache": llm_service.response_cache_stats(),
+        "admission": llm_service.admission_stats(),
+        "resilience": llm_service.resilience_stats()
+    }
+
 @router.get("/conversations", response_model=List[Conversation])
 async def get_conversations():
     """Get all conversations"""
     try:
-        conversations = conversation_manager.get_all_conversations()
+        conversations = await conversation_manager.load_all_conversations()
         logger.info(f"Returned {len(conversations)} conversations")
         return conversations
     except Exception as e:
         logger.error(f"Error getting conversations: {e}")
         raise HTTPException(status_code=500, detail="Failed to get conversations")
 
+@router.get("/conversations/summaries", response_model=ConversationSummaryPage)
+async def get_conversation_summaries(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Get a page of conversation summaries (no messages), newest first"""
+    try:
+        items, next_cursor = await conversation_manager.load_conversation_summaries(cursor=cursor, limit=limit)
+        logger.info(f"Returned {len(items)} conversation summaries")
+        return ConversationSummaryPage(items=items, next_cursor=next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting conversation summaries: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get conversations")
+
 @router.post("/conversations", response_model=Conversation)
 async def create_conversation(
     model_provider: ModelProvider,
@@ -58,7 +124,7 @@ async def create_conversation(
 async def get_conversation(conversation_id: str):
     """Get a specific conversation"""
     try:
-        conversation = conversation_manager.get_conversation(conversation_id)
+        conversation = await conversation_manager.load_conversation(conversation_id)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         logger.info(f"Retrieved conversation {conversation_id}")
@@ -73,9 +139,12 @@ async def get_conversation(conversation_id: str):
 async def delete_conversation(conversation_id: str):
     """Delete a conversation"""
     try:
+        # Load it off the event loop first; deleting a cached conversation does not read the store
+        await conversation_manager.load_conversation(conversation_id)
         success = conversation_manager.delete_conversation(conversation_id)
         if not success:
             raise HTTPException(status_code=404, detail="Conversation not found")
+        prompt_assembler.forget(conversation_id)
         logger.info(f"Deleted conversation {conversation_id}")
         return {"message": "Conversation deleted successfully"}
     except HTTPException:
@@ -84,56 +153,99 @@ async def delete_conversation(conversation_id: str):
         logger.error(f"Error deleting conversation {conversation_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete conversation")
 
+async def _prepare_turn(conversation_id: str, request: ChatRequest) -> Tuple[str, Conversation, List[Dict[str, str]]]:
+    """Store the user message and build the LLM input for this turn"""
+    # Resolve the attachment for this turn; inline text is stored once by hash
+    attachment_id = request.file_id
+    if not attachment_id and request.file_content:
+        attachment_id = attachment_store.put(request.file_content)
+    if attachment_id and await attachment_store.load(attachment_id) is None:
+        raise HTTPException(status_code=404, detail="Uploaded file not found")
+    
+    # Get or create conversation
+    conversation = await conversation_manager.load_conversation(conversation_id)
+    if not conversation:
+        conversation = conversation_manager.create_conversation(
+            model_provider=request.model_provider,
+            model_name=request.model_name
+        )
+        conversation_id = conversation.id
+    
+    # Add file to conversation's attachment_ids list if provided
+    if attachment_id:
+        conversation_manager.add_file_to_conversation(conversation_id, attachment_id)
+    
+    # Add user message
+    user_message = conversation_manager.add_message(
+        conversation_id=conversation_id,
+        role=MessageRole.USER,
+        content=request.message,
+        attachment_id=attachment_id
+    )
+    
+    if not user_message:
+        raise HTTPException(status_code=500, detail="Failed to add user message")
+    
+    # Prepare messages for LLM within the model's token budget; its attachments
+    # are loaded (and long ones indexed) first, off the event loop
+    for file_id in conversation.attachment_ids:
+        await attachment_store.load(file_id)
+    await prompt_assembler.prepare(conversation)
+    messages = prompt_assembler.assemble(
+        conversation,
+        model_name=request.model_name,
+        provider=request.model_provider,
+        summarizer=lambda transcript: llm_service.summarize(transcript, request.model_provider)
+    )
+    
+    return conversation_id, conversation, messages
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format a Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.post("/conversations/{conversation_id}/messages", response_model=ChatResponse)
 async def send_message(conversation_id: str, request: ChatRequest):
     """Send a message in a conversation"""
+    start = time.perf_counter()
+    status = 500
     try:
-        # Get or create conversation
-        conversation = conversation_manager.get_conversation(conversation_id)
-        if not conversation:
-            conversation = conversation_manager.create_conversation(
-                model_provider=request.model_provider,
-                model_name=request.model_name
-            )
-            conversation_id = conversation.id
-        
-        # Add file to conversation's user_uploaded_files list if provided
-        if request.file_content:
-            conversation_manager.add_file_to_conversation(conversation_id, request.file_content)
-        
-        # Add user message
-        user_message = conversation_manager.add_message(
-            conversation_id=conversation_id,
-            role=MessageRole.USER,
-            content=request.message,
-            file_attachment=request.file_content
-        )
-        
-        if not user_message:
-            raise HTTPException(status_code=500, detail="Failed to add user message")
-        
-        # Prepare messages for LLM
-        messages = []
-        for msg in conversation.messages:
-            if msg.file_attachment:
-                messages.append({
-                    "role": msg.role.value,
-                    "content": msg.content + '\n\nUser Uploaded File:\n' + msg.file_attachment
-                })
-            else:
-                messages.append({
-                    "role": msg.role.value,
-                    "content": msg.content
-                })
-
-        # Generate AI response
-        logger.info(f"Generating response for conversation {conversation_id} with {request.model_provider}/{request.model_name}")
-        ai_response = await llm_service.generate_response(
-            messages=messages,
-            provider=request.model_provider,
-            model_name=request.model_name,
-            uploaded_files=conversation.user_uploaded_files
+        with tracer.span("send_message", provider=request.model_provider.value, model=request.model_name):
+            response = await _send_message(conversation_id, request)
+        status = 200
+        return response
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        SEND_MESSAGE_SECONDS.labels(request.model_provider.value, request.model_name, str(status)).observe(
+            time.perf_counter() - start
         )
+
+async def _send_message(conversation_id: str, request: ChatRequest) -> ChatResponse:
+    """Generate and store one chat turn"""
+    try:
+        # A turn the response cache may answer waits for a slot only on a miss;
+        # others are admitted before the turn is recorded, so a rejection leaves no trace
+        upfront = not llm_service.uses_response_cache(request.model_provider, request.use_cache)
+        admission = (llm_service.admitted(request.model_provider, request.model_name, conversation_id)
+                     if upfront else nullcontext())
+        async with admission:
+            conversation_id, conversation, messages = await _prepare_turn(conversation_id, request)
+
+            # Generate AI response
+            logger.info(f"Generating response for conversation {conversation_id} with {request.model_provider}/{request.model_name}")
+            usage = TokenUsage()
+            ai_response = await llm_service.generate_response(
+                messages=messages,
+                provider=request.model_provider,
+                model_name=request.model_name,
+                context=conversation_manager.get_agent_context(conversation_id),
+                usage=usage,
+                use_cache=request.use_cache,
+                conversation_id=conversation_id,
+                holds_slot=upfront
+            )
         
         # Add AI response to conversation
         assistant_message = conversation_manager.add_message(
@@ -147,38 +259,174 @@ async def send_message(conversation_id: str, request: ChatRequest):
             raise HTTPException(status_code=500, detail="Failed to add assistant message")
         
         logger.info(f"Successfully generated response for conversation {conversation_id}")
-        return ChatResponse(message=assistant_message, conversation_id=conversation_id)
+        return ChatResponse(message=assistant_message, conversation_id=conversation_id, usage=usage)
         
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise _too_busy(e)
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error sending message to conversation {conversation_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
 
-@router.post("/upload", response_model=FileUploadResponse)
-async def upload_file(file: UploadFile = File(...)):
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def stream_message(conversation_id: str, request: ChatRequest):
+    """Send a message and stream the response as Server-Sent Events.
+
+    Emits ``delta`` events with token text, ``agent_event`` events from the
+    OpenAI agent run, then a single ``done`` event carrying the stored
+    ``ChatResponse`` (or an ``error`` event, with the status the failure
+    maps to, if generation fails).
+    """
+    # Same latency histogram and span as send_message; for a stream they end
+    # with the last event, and the status is the outcome it reported
+    start = time.perf_counter()
+    span = tracer.start_span("send_message", provider=request.model_provider.value, model=request.model_name,
+                             stream=True)
+    ticket = None
+    finished = False
+
+    def finish(status: int, error: Optional[BaseException] = None):
+        nonlocal finished
+        if finished:
+            return
+        finished = True
+        if ticket:
+            ticket.release()
+        SEND_MESSAGE_SECONDS.labels(request.model_provider.value, request.model_name, str(status)).observe(
+            time.perf_counter() - start
+        )
+        tracer.end_span(span, error)
+
+    try:
+        with tracer.activate(span):
+            ticket = await llm_service.admit(request.model_provider, request.model_name, conversation_id)
+            conversation_id, conversation, messages = await _prepare_turn(conversation_id, request)
+    except AdmissionRejected as e:
+        finish(429, e)
+        raise _too_busy(e)
+    except HTTPException as e:
+        finish(e.status_code, e)
+        raise
+    except asyncio.CancelledError as e:
+        finish(500, e)
+        raise
+    except Exception as e:
+        finish(500, e)
+        logger.error(f"Error preparing message for conversation {conversation_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
+
+    async def event_stream():
+        logger.info(f"Streaming response for conversation {conversation_id} with {request.model_provider}/{request.model_name}")
+        status, error = 500, None
+        try:
+            content = ""
+            usage = TokenUsage()
+            events = llm_service.stream_response(
+                messages=messages,
+                provider=request.model_provider,
+                model_name=request.model_name,
+                context=conversation_manager.get_agent_context(conversation_id),
+                usage=usage
+            )
+            try:
+                while True:
+                    # The span is current only while we wait on the provider, not across
+                    # our own yields, which an abandoned stream may be closed from
+                    with tracer.activate(span):
+                        try:
+                            event = await events.__anext__()
+                        except StopAsyncIteration:
+                            break
+                    if event["type"] == "completed":
+                        content = event["content"]
+                    else:
+                        yield _sse_event(event["type"], event)
+            finally:
+                await events.aclose()
+            
+            # Save the assembled response once the stream has finished
+            assistant_message = conversation_manager.add_message(
+                conversation_id=conversation_id,
+                role=MessageRole.ASSISTANT,
+                content=content,
+                model_used=f"{request.model_provider.value}/{request.model_name}"
+            )
+            if not assistant_message:
+                raise ValueError("Failed to add assistant message")
+            
+            response = ChatResponse(message=assistant_message, conversation_id=conversation_id, usage=usage)
+            logger.info(f"Successfully streamed response for conversation {conversation_id}")
+            status = 200
+            yield _sse_event("done", response.model_dump(mode="json"))
+        except Exception as e:
+            status = 503 if isinstance(e, CircuitOpenError) else 504 if isinstance(e, DeadlineExceeded) else 500
+            error = e
+            logger.error(f"Error streaming message to conversation {conversation_id}: {e}")
+            yield _sse_event("error", {"detail": f"Failed to send message: {str(e)}", "status": status})
+        finally:
+            finish(status, error)
+
+    stream = event_stream()
+    # The admission slot is held for the whole stream; also free it (and
+    # record the turn) if the client goes away before the stream starts
+    weakref.finalize(stream, finish, 500)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# The body is parsed by the route itself, so describe the form for the docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+@router.post("/upload", response_model=FileUploadResponse, openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_file(request: Request):
     """Upload and process a file"""
+    filename = None
     try:
-        logger.info(f"Processing uploaded file: {file.filename}")
+        # Stream the file to disk once, checking its name and size as it arrives
+        upload = await file_processor.receive_file(request)
+        filename = upload.filename
+        logger.info(f"Processing uploaded file: {filename}")
         
-        # Process the file
-        content = await file_processor.process_file(file)
-        file_info = file_processor.get_file_info(file)
+        # Process the file and store its text once, keyed by content hash
+        content = await file_processor.process_file(upload)
+        file_info = file_processor.get_file_info(upload)
+        file_id = attachment_store.put(content)
         
         response = FileUploadResponse(
             filename=file_info["filename"],
-            content=content,
-            size=file_info["size"] or 0,
-            type=file_info["extension"] or ""
+            file_id=file_id,
+            characters=len(content),
+            size=file_info["size"],
+            type=file_info["extension"]
         )
         
-        logger.info(f"Successfully processed uploaded file: {file.filename}")
+        logger.info(f"Successfully processed uploaded file: {filename}")
         return response
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error uploading file {file.filename}: {e}")
+        logger.error(f"Error uploading file {filename}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
 @router.post("/message", response_model=ChatResponse)
@@ -198,6 +446,78 @@ async def send_standalone_message(request: ChatRequest):
         # Forward to the existing endpoint
         return await send_message(conversation_id, request)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error sending standalone message: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
+
+async def _run_batch_item(index: int, request: ChatRequest, timeout: float, max_retries: int) -> BatchChatResult:
+    """Run one batch item as a chat turn, waiting out up to ``max_retries`` admission rejections while its deadline allows"""
+    try:
+        if request.conversation_id:
+            conversation_id = request.conversation_id
+        else:
+            conversation_id = conversation_manager.create_conversation(
+                model_provider=request.model_provider,
+                model_name=request.model_name
+            ).id
+        with deadline(timeout):
+            # Bounded even without a deadline (request_timeout_seconds = 0)
+            for attempt in range(max_retries + 1):
+                try:
+                    response = await send_message(conversation_id, request)
+                    return BatchChatResult(index=index, status=200, response=response)
+                except HTTPException as e:
+                    retry_after = float((e.headers or {}).get("Retry-After", 0))
+                    left = remaining()
+                    if e.status_code != 429 or attempt == max_retries or (left is not None and left <= retry_after):
+                        raise
+                    await asyncio.sleep(retry_after)
+    except HTTPException as e:
+        return BatchChatResult(index=index, status=e.status_code, error=str(e.detail))
+    except Exception as e:
+        logger.error(f"Error running batch item {index}: {e}")
+        return BatchChatResult(index=index, status=500, error=f"Failed to send message: {str(e)}")
+
+@router.post("/batch")
+async def send_batch(batch: BatchChatRequest):
+    """Run many chat turns concurrently and stream each result as NDJSON.
+
+    Items run through the same admission control and provider limits as
+    single messages, at most ``max_concurrency`` at a time. Each result is
+    one ``BatchChatResult`` line, written as soon as its item finishes, so
+    lines arrive out of order; ``index`` is the item's position in the
+    request. A failed item reports its own status and error.
+    """
+    settings = get_settings()
+    if len(batch.items) > settings.batch_max_items:
+        raise HTTPException(status_code=422,
+                            detail=f"Batch has {len(batch.items)} items; the limit is {settings.batch_max_items}")
+    concurrency = min(batch.max_concurrency or settings.batch_max_concurrency, settings.batch_max_concurrency,
+                      len(batch.items))
+    logger.info(f"Running batch of {len(batch.items)} chat messages, {concurrency} at a time")
+
+    async def results():
+        pending = iter(enumerate(batch.items))
+        finished: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            for index, item in pending:
+                await finished.put(await _run_batch_item(
+                    index, item, settings.request_timeout_seconds, settings.batch_max_retries
+                ))
+
+        # Workers share one iterator, so at most `concurrency` items are in flight
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for _ in batch.items:
+                result = await finished.get()
+                yield result.model_dump_json() + "\n"
+        finally:
+            # Stop outstanding items if the client goes away
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
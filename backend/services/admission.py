@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Mapping, Optional
+
+from services.resilience import remaining
+
+logger = logging.getLogger(__name__)
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# (remaining, reset) header pairs for requests and tokens
+_RATE_LIMIT_HEADERS = {
+    "openai": [
+        ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+        ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+    ],
+    "anthropic": [
+        ("anthropic-ratelimit-requests-remaining", "anthropic-ratelimit-requests-reset"),
+        ("anthropic-ratelimit-tokens-remaining", "anthropic-ratelimit-tokens-reset"),
+        ("anthropic-ratelimit-input-tokens-remaining", "anthropic-ratelimit-input-tokens-reset"),
+        ("anthropic-ratelimit-output-tokens-remaining", "anthropic-ratelimit-output-tokens-reset"),
+    ],
+}
+
+def provider_for_response(path: str, headers: Mapping[str, str]) -> str:
+    """Which provider an upstream response came from"""
+    if "/messages" in path or any(name.startswith("anthropic-") for name in headers.keys()):
+        return "anthropic"
+    return "openai"
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds until a rate limit resets, from ``retry-after`` or ``*-reset`` header values.
+
+    Accepts plain seconds (``"2"``), OpenAI durations (``"1m30s"``, ``"20ms"``)
+    and Anthropic RFC 3339 timestamps.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if parts and "".join(number + unit for number, unit in parts) == value:
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted in time; maps to HTTP 429"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AdmissionTicket:
+    """A granted slot; ``release()`` is idempotent"""
+
+    __slots__ = ("_controller", "_pool", "model_name", "admitted_at", "_released")
+
+    def __init__(self, controller: "AdmissionController", pool: "_ProviderPool", model_name: str):
+        self._controller = controller
+        self._pool = pool
+        self.model_name = model_name
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+class _Waiter:
+    __slots__ = ("conversation_id", "model_name", "future")
+
+    def __init__(self, conversation_id: str, model_name: str, future: asyncio.Future):
+        self.conversation_id = conversation_id
+        self.model_name = model_name
+        self.future = future
+
+class _ProviderPool:
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.model_in_flight: Dict[str, int] = {}
+        # Waiters by conversation, served round-robin
+        self.queue: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self.queued = 0
+        self.paused_until = 0.0
+        self.resume_timer: Optional[asyncio.TimerHandle] = None
+        # Moving average of slot hold time; 0 until the first call completes
+        self.latency = 0.0
+        self.completions = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_deadline = 0
+        self.throttled = 0
+
+class AdmissionController:
+    """Per-provider admission control for upstream LLM calls.
+
+    Each provider has a concurrency limit and a bounded wait queue; each model
+    also has its own concurrency limit. Waiting requests are queued per
+    conversation and served round-robin, so one busy conversation cannot
+    starve the others. A request is rejected at once when the queue is full
+    or when the expected wait already exceeds its deadline (the queue
+    timeout, or the request deadline if sooner). A request that is still
+    queued at its deadline is rejected then.
+
+    The provider limit adapts to the upstream rate limits. A 429 halves it
+    and pauses admissions for the ``retry-after`` period. When the rate-limit
+    headers report no requests or tokens left, admissions pause until the
+    reset. Each run of ``limit`` successful calls raises the limit by one,
+    back up to the configured maximum.
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_concurrency_per_model: int = 16,
+                 queue_size: int = 64, queue_timeout: float = 10.0):
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_model = max_concurrency_per_model
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._pools: Dict[str, _ProviderPool] = {}
+
+    def _pool(self, provider: str) -> _ProviderPool:
+        pool = self._pools.get(provider)
+        if pool is None:
+            pool = self._pools[provider] = _ProviderPool(provider, self.max_concurrency)
+        return pool
+
+    def _retry_after(self, pool: _ProviderPool) -> float:
+        """Rough time until a new request would be admitted"""
+        wait = pool.latency * (pool.queued + 1) / max(pool.limit, 1)
+        return max(wait, pool.paused_until - time.monotonic(), 1.0)
+
+    async def acquire(self, provider: str, model_name: str, conversation_id: Optional[str] = None) -> AdmissionTicket:
+        """Wait for a slot for one upstream call, or raise ``AdmissionRejected``.
+
+        The wait is bounded by ``queue_timeout`` and by the request deadline.
+        """
+        pool = self._pool(provider)
+        timeout = self.queue_timeout
+        left = remaining()
+        if left is not None:
+            timeout = max(0.0, min(timeout, left))
+        if pool.queued >= self.queue_size:
+            pool.rejected_full += 1
+            raise AdmissionRejected(f"Too many queued {provider} requests", self._retry_after(pool))
+        expected_wait = max(pool.latency * pool.queued / max(pool.limit, 1), pool.paused_until - time.monotonic())
+        if expected_wait > timeout:
+            pool.rejected_deadline += 1
+            raise AdmissionRejected(f"{provider} is overloaded", self._retry_after(pool))
+
+        waiter = _Waiter(conversation_id or "", model_name, asyncio.get_running_loop().create_future())
+        pool.queue.setdefault(waiter.conversation_id, deque()).append(waiter)
+        pool.queued += 1
+        self._dispatch(pool)
+        if waiter.future.done():
+            return waiter.future.result()
+
+        try:
+            return await asyncio.wait_for(waiter.future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._remove(pool, waiter)
+            pool.rejected_deadline += 1
+            raise AdmissionRejected(f"Timed out waiting for a {provider} slot", self._retry_after(pool))
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                waiter.future.result().release()
+            else:
+                self._remove(pool, waiter)
+            raise
+
+    def _remove(self, pool: _ProviderPool, waiter: _Waiter):
+        waiters = pool.queue.get(waiter.conversation_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            pool.queued -= 1
+            if not waiters:
+                del pool.queue[waiter.conversation_id]
+
+    def _dispatch(self, pool: _ProviderPool):
+        """Grant free slots to queued requests, one conversation at a time"""
+        now = time.monotonic()
+        if now < pool.paused_until:
+            if pool.resume_timer is None:
+                pool.resume_timer = asyncio.get_running_loop().call_later(
+                    pool.paused_until - now, self._resume, pool
+                )
+            return
+        while pool.in_flight < pool.limit and pool.queued:
+            for conversation_id, waiters in pool.queue.items():
+                waiter = waiters[0]
+                if pool.model_in_flight.get(waiter.model_name, 0) < self.max_concurrency_per_model:
+                    break
+            else:
+                return
+            waiters.popleft()
+            pool.queued -= 1
+            if waiters:
+                pool.queue.move_to_end(conversation_id)
+            else:
+                del pool.queue[conversation_id]
+            if waiter.future.done():
+                continue
+            pool.in_flight += 1
+            pool.model_in_flight[waiter.model_name] = pool.model_in_flight.get(waiter.model_name, 0) + 1
+            pool.admitted += 1
+            waiter.future.set_result(AdmissionTicket(self, pool, waiter.model_name))
+
+    def _resume(self, pool: _ProviderPool):
+        pool.resume_timer = None
+        self._dispatch(pool)
+
+    def _release(self, ticket: AdmissionTicket):
+        pool = ticket._pool
+        pool.in_flight -= 1
+        remaining = pool.model_in_flight[ticket.model_name] - 1
+        if remaining:
+            pool.model_in_flight[ticket.model_name] = remaining
+        else:
+            del pool.model_in_flight[ticket.model_name]
+        held = time.monotonic() - ticket.admitted_at
+        pool.latency = held if not pool.latency else pool.latency + 0.2 * (held - pool.latency)
+        pool.completions += 1
+        if pool.limit < pool.max_concurrency and pool.completions >= pool.limit:
+            pool.limit += 1
+            pool.completions = 0
+        self._dispatch(pool)
+
+    def observe(self, provider: str, status_code: int, headers: Mapping[str, str]):
+        """Adjust a provider's limit from an upstream response"""
+        pool = self._pool(provider)
+        pause = None
+        if status_code == 429:
+            pool.limit = max(1, pool.limit // 2)
+            pool.completions = 0
+            pool.throttled += 1
+            pause = parse_reset(headers.get("retry-after")) or 1.0
+            logger.warning(f"{provider} rate limited; concurrency limit now {pool.limit}")
+        else:
+            for remaining_header, reset_header in _RATE_LIMIT_HEADERS[provider]:
+                remaining = headers.get(remaining_header)
+                if remaining is not None and remaining.strip() == "0":
+                    reset = parse_reset(headers.get(reset_header))
+                    if reset:
+                        pause = max(pause or 0.0, reset)
+        if pause:
+            pool.paused_until = max(pool.paused_until, time.monotonic() + pause)
+
+    def stats(self) -> Dict[str, Any]:
+        """Admission counters per provider"""
+        now = time.monotonic()
+        return {
+            name: {
+                "limit": pool.limit,
+                "max_concurrency": pool.max_concurrency,
+                "in_flight": pool.in_flight,
+                "in_flight_by_model": dict(pool.model_in_flight),
+                "queued": pool.queued,
+                "admitted": pool.admitted,
+                "rejected_queue_full": pool.rejected_full,
+                "rejected_deadline": pool.rejected_deadline,
+                "throttled": pool.throttled,
+                "paused_seconds": round(max(0.0, pool.paused_until - now), 3),
+                "avg_hold_seconds": round(pool.latency, 3),
+            }
+            for name, pool in self._pools.items()
+        }
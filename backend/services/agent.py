@@ -1,9 +1,122 @@
 from __future__ import annotations
-from agents import Agent
+import time
+from typing import Any, Dict, Optional
+from agents import Agent, RunContextWrapper, RunHooks, add_trace_processor
+from agents.tracing import Span as SDKSpan, Trace as SDKTrace, TracingProcessor, get_current_span
 
 from models.agent import AgentRunResultContext
+from services.metrics import metrics
+from services.tracing import Span, Tracer, tracer
 from services.tools import job_search_tool
 
+AGENT_TURN_SECONDS = metrics.histogram(
+    "agent_turn_seconds", "Time each agent is active within one Runner.run, until it hands off or answers",
+    ["agent"]
+)
+AGENT_HANDOFFS = metrics.counter("agent_handoffs_total", "Handoffs between agents", ["from_agent", "to_agent"])
+
+
+class AgentMetricsHooks(RunHooks[AgentRunResultContext]):
+    """Run hooks that record per-agent turn time and handoffs; use one instance per run"""
+
+    def __init__(self):
+        self._agent: Optional[str] = None
+        self._started = 0.0
+
+    def _finish(self):
+        if self._agent is not None:
+            AGENT_TURN_SECONDS.labels(self._agent).observe(time.perf_counter() - self._started)
+            self._agent = None
+
+    async def on_agent_start(self, context: RunContextWrapper[AgentRunResultContext], agent: Agent) -> None:
+        self._finish()
+        self._agent = agent.name
+        self._started = time.perf_counter()
+
+    async def on_handoff(self, context: RunContextWrapper[AgentRunResultContext],
+                         from_agent: Agent, to_agent: Agent) -> None:
+        AGENT_HANDOFFS.labels(from_agent.name, to_agent.name).inc()
+
+    async def on_agent_end(self, context: RunContextWrapper[AgentRunResultContext], agent: Agent, output: Any) -> None:
+        self._finish()
+
+
+class AgentTraceBridge(TracingProcessor):
+    """Agents SDK tracing processor that re-creates SDK spans in our traces.
+
+    Agent turns, handoffs, tool calls and model responses become children of
+    the span that was current when ``Runner.run`` started, so they show up in
+    the request's trace. While an SDK span is open, spans started by our own
+    code (e.g. a search from a tool) nest under it.
+    """
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._spans: Dict[str, Span] = {}
+
+    def current(self) -> Optional[Span]:
+        sdk_span = get_current_span()
+        return self._spans.get(sdk_span.span_id) if sdk_span is not None else None
+
+    @staticmethod
+    def _describe(sdk_span: SDKSpan[Any]) -> tuple:
+        data = sdk_span.span_data
+        if data.type == "agent":
+            return f"agent.{data.name}", {"agent": data.name}
+        if data.type == "handoff":
+            return "handoff", {"from_agent": data.from_agent or "", "to_agent": data.to_agent or ""}
+        if data.type == "function":
+            return f"tool.{data.name}", {"tool": data.name}
+        if data.type in ("generation", "response"):
+            return "llm.response", {}
+        return f"agents.{data.type}", {}
+
+    def on_trace_start(self, trace: SDKTrace) -> None:
+        pass
+
+    def on_trace_end(self, trace: SDKTrace) -> None:
+        pass
+
+    def on_span_start(self, span: SDKSpan[Any]) -> None:
+        name, attributes = self._describe(span)
+        self._spans[span.span_id] = self.tracer.start_span(name, parent=self._spans.get(span.parent_id),
+                                                           **attributes)
+
+    def on_span_end(self, span: SDKSpan[Any]) -> None:
+        ours = self._spans.pop(span.span_id, None)
+        if ours is None:
+            return
+        data = span.span_data
+        if data.type == "response" and getattr(data, "response", None) is not None:
+            ours.set_attribute("model", data.response.model)
+        elif data.type == "handoff":
+            ours.set_attribute("to_agent", data.to_agent or "")
+        error = getattr(span, "error", None)
+        if error:
+            ours.error = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+        self.tracer.end_span(ours)
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
+
+_trace_bridge: Optional[AgentTraceBridge] = None
+
+def install_trace_bridge() -> AgentTraceBridge:
+    """Register the bridge with the agents SDK once and return it.
+
+    SDK tracing must be on (``OPENAI_AGENTS_DISABLE_TRACING`` unset) for
+    agent spans to reach our traces.
+    """
+    global _trace_bridge
+    if _trace_bridge is None:
+        _trace_bridge = AgentTraceBridge(tracer)
+        add_trace_processor(_trace_bridge)
+        tracer.parent_resolver = _trace_bridge.current
+    return _trace_bridge
+
 
 job_search_agent = Agent[AgentRunResultContext](
     name="Job Search Agent",
@@ -19,7 +132,8 @@ job_search_agent = Agent[AgentRunResultContext](
         "   - The user's explicit request.\n"
         "   - The uploaded file content, if available.\n"
         "3. The number of results to be returned, by default is 10, otherwise use the number user requested as k.\n"
-        "4. After calling the tool, append the exact search query you used to `context.search_queries`.\n"
+        "4. The tool remembers the query and its results for follow-up questions "
+        "(`context.add_search_result`); do not record them yourself.\n"
         "5. Present results as a Markdown-formatted list:\n"
         "   * <id> | [<title>](<url>) | <location> | <publish_date>\n"
         "   (omit publish_date if missing).\n\n"
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from config.settings import get_settings
+from services.conversation import conversation_manager
+from services.storage import ConversationStore
+
+logger = logging.getLogger(__name__)
+
+class AttachmentStore:
+    """Content-addressed store for uploaded file text.
+
+    Text is keyed by its SHA-256, so an upload is stored once no matter how
+    many messages, conversations or agent runs refer to it; everything else
+    holds the id and resolves the text only when a prompt is built. With a
+    persistent backing store the in-memory copy is an LRU cache bounded by
+    ``max_cached_bytes``, and async callers use ``load`` so a cache miss
+    reads the store in a worker thread.
+    """
+
+    def __init__(self, backing: ConversationStore, max_cached_bytes: int = 256 * 1024 * 1024):
+        self.backing = backing
+        self.max_cached_bytes = max_cached_bytes
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        self.cached_bytes = 0
+        logger.info("AttachmentStore initialized")
+
+    @staticmethod
+    def compute_id(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def put(self, content: str) -> str:
+        """Store attachment text and return its id"""
+        attachment_id = self.compute_id(content)
+        if attachment_id in self._texts:
+            self._texts.move_to_end(attachment_id)
+            logger.debug(f"Attachment {attachment_id[:12]} already stored")
+            return attachment_id
+
+        self.backing.save_attachment(attachment_id, content)
+        self._cache(attachment_id, content)
+        logger.info(f"Stored attachment {attachment_id[:12]} ({len(content)} characters)")
+        return attachment_id
+
+    def get(self, attachment_id: str) -> Optional[str]:
+        """Resolve an attachment id to its text"""
+        content = self._texts.get(attachment_id)
+        if content is not None:
+            self._texts.move_to_end(attachment_id)
+            return content
+        if self.backing.persistent:
+            content = self.backing.load_attachment(attachment_id)
+            if content is not None:
+                self._cache(attachment_id, content)
+                return content
+        logger.warning(f"Attachment {attachment_id} not found")
+        return None
+
+    async def load(self, attachment_id: str) -> Optional[str]:
+        """Resolve an attachment id to its text, reading the store off the event loop on a cache miss"""
+        if attachment_id not in self._texts and self.backing.persistent:
+            content = await asyncio.to_thread(self.backing.load_attachment, attachment_id)
+            if content is None:
+                logger.warning(f"Attachment {attachment_id} not found")
+                return None
+            if attachment_id not in self._texts:
+                self._cache(attachment_id, content)
+        return self.get(attachment_id)
+
+    def exists(self, attachment_id: str) -> bool:
+        return self.get(attachment_id) is not None
+
+    def _cache(self, attachment_id: str, content: str):
+        self._texts[attachment_id] = content
+        self.cached_bytes += len(content)
+        if not self.backing.persistent:
+            return
+        while self.cached_bytes > self.max_cached_bytes and len(self._texts) > 1:
+            _, evicted = self._texts.popitem(last=False)
+            self.cached_bytes -= len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """Attachment counts and cached bytes"""
+        return {"cached_attachments": len(self._texts), "cached_bytes": self.cached_bytes}
+
+# Global attachment store instance, persisted alongside conversations
+attachment_store = AttachmentStore(
+    conversation_manager.store,
+    max_cached_bytes=get_settings().attachment_cache_bytes
+)
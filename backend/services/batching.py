@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into batched calls.
+
+    Items submitted within ``window_ms`` of the first pending item (or until
+    ``max_batch_size`` items are waiting) are passed to ``batch_fn`` together.
+    ``batch_fn`` must return one result per item, in order; each caller gets
+    its own result back. If the batch call fails, every caller in the batch
+    sees the error. Items of cancelled callers are dropped from the batch
+    if it has not started yet. ``close()`` dispatches what is still queued and waits
+    for the batches in flight.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = 32, window_ms: float = 5.0, name: str = "batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+        self.name = name
+        self._pending: List[Any] = []
+        self._futures: List[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.max_observed_batch = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(item)
+        self._futures.append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Drop the item if its batch has not been dispatched yet
+            if future in self._futures:
+                index = self._futures.index(future)
+                del self._pending[index], self._futures[index]
+                if not self._pending and self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            raise
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        items, futures = self._pending, self._futures
+        self._pending, self._futures = [], []
+        task = asyncio.ensure_future(self._run_batch(items, futures))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Dispatch queued items and wait for the batches in flight"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_batch(self, items: List[Any], futures: List[asyncio.Future]):
+        # Skip items whose callers gave up after the batch was flushed
+        live = [(item, future) for item, future in zip(items, futures) if not future.done()]
+        if not live:
+            return
+        items, futures = [item for item, _ in live], [future for _, future in live]
+        self.batches += 1
+        self.items += len(items)
+        self.max_observed_batch = max(self.max_observed_batch, len(items))
+        logger.debug(f"{self.name}: dispatching batch of {len(items)}")
+
+        try:
+            results = await self.batch_fn(items)
+            if len(results) != len(items):
+                raise ValueError(f"{self.name}: batch returned {len(results)} results for {len(items)} items")
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(items)} failed: {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching counters for monitoring"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_observed_batch,
+        }
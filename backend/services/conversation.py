@@ -1,17 +1,78 @@
+import asyncio
 import logging
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional
-from models.chat import Conversation, Message, MessageRole, ModelProvider
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import get_settings
+from models.agent import AgentRunResultContext
+from models.chat import Conversation, ConversationSummary, Message, MessageRole, ModelProvider
+from services.message_log import message_log
+from services.metrics import metrics
+from services.recency_index import RecencyIndex
+from services.storage import ConversationStore, InMemoryConversationStore, create_conversation_store
 
 logger = logging.getLogger(__name__)
 
 class ConversationManager:
-    """In-memory conversation management"""
+    """Conversation management with a hot in-memory cache in front of a pluggable store.
+
+    With the default in-memory store the cache holds every conversation; with
+    a persistent store it keeps the most recently used
+    ``conversation_cache_size`` conversations and loads the rest on demand.
+    A conversation's agent run context is dropped along with its cache entry.
+    Async callers use ``load_conversation``/``load_all_conversations``, which
+    read the store in a worker thread instead of on the event loop.
+
+    Several workers can share a persistent store. ``load_conversation``
+    checks a cached conversation against the stored ``updated_at`` and
+    reloads it when another worker has changed it, and summary pages are
+    read from the store's ``updated_at`` index. The recency index and the
+    stored-message gauges only cover this worker's view.
+    """
+    
+    def __init__(self, store: Optional[ConversationStore] = None):
+        self.settings = get_settings()
+        self.store = store or InMemoryConversationStore()
+        self.conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self.agent_contexts: Dict[str, AgentRunResultContext] = {}
+        self.recency_index = RecencyIndex()
+        # Stored message totals, kept up to date for the metrics gauges
+        self.stored_messages = 0
+        self.stored_message_bytes = 0
+        logger.info(f"ConversationManager initialized with {type(self.store).__name__}")
+    
+    def start(self):
+        """Open the storage backend and build the recency index from it"""
+        self.store.start()
+        for summary in self.store.list_summaries():
+            self.recency_index.upsert(summary)
+            self.stored_messages += summary.message_count
+        self.stored_message_bytes = self.store.message_bytes()
+        logger.info(f"Recency index loaded with {len(self.recency_index)} conversations")
+    
+    def close(self):
+        """Flush pending writes and close the storage backend"""
+        self.store.close()
+    
+    def _index(self, conversation: Conversation):
+        self.recency_index.upsert(ConversationSummary(
+            id=conversation.id,
+            title=conversation.title,
+            created_at=conversation.created_at,
+            updated_at=conversation.updated_at,
+            model_provider=conversation.model_provider,
+            model_name=conversation.model_name,
+            message_count=len(conversation.messages)
+        ))
     
-    def __init__(self):
-        self.conversations: Dict[str, Conversation] = {}
-        logger.info("ConversationManager initialized")
+    def _cache(self, conversation: Conversation):
+        self.conversations[conversation.id] = conversation
+        self.conversations.move_to_end(conversation.id)
+        if self.store.persistent:
+            while len(self.conversations) > self.settings.conversation_cache_size:
+                evicted_id, _ = self.conversations.popitem(last=False)
+                self.agent_contexts.pop(evicted_id, None)
     
     def create_conversation(self, model_provider: ModelProvider, model_name: str, title: str = "New Chat") -> Conversation:
         """Create a new conversation"""
@@ -26,34 +87,99 @@ class ConversationManager:
             updated_at=now,
             model_provider=model_provider,
             model_name=model_name,
-            user_uploaded_files=[]
+            attachment_ids=[]
         )
         
-        self.conversations[conversation_id] = conversation
+        self._cache(conversation)
+        self._index(conversation)
+        self.store.save_conversation(conversation)
         logger.info(f"Created conversation {conversation_id} with {model_provider}/{model_name}")
         return conversation
     
     def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
         """Get conversation by ID"""
         conversation = self.conversations.get(conversation_id)
+        if conversation:
+            self.conversations.move_to_end(conversation_id)
+        elif self.store.persistent:
+            conversation = self.store.load_conversation(conversation_id)
+            if conversation:
+                self._cache(conversation)
         if conversation:
             logger.debug(f"Retrieved conversation {conversation_id}")
         else:
             logger.warning(f"Conversation {conversation_id} not found")
         return conversation
     
+    async def load_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Get conversation by ID, reading the store off the event loop.
+
+        With a persistent store a cached conversation is served only if no
+        other worker has updated (or deleted) it since it was cached.
+        """
+        if not self.store.persistent:
+            return self.get_conversation(conversation_id)
+        cached = self.conversations.get(conversation_id)
+        if cached is not None:
+            stored_at = await asyncio.to_thread(self.store.stored_updated_at, conversation_id)
+            if stored_at is None:
+                logger.info(f"Conversation {conversation_id} was deleted by another worker")
+                self._forget(conversation_id)
+                return None
+            if stored_at <= cached.updated_at:
+                return self.get_conversation(conversation_id)
+            logger.debug(f"Conversation {conversation_id} was updated by another worker; reloading")
+        conversation = await asyncio.to_thread(self.store.load_conversation, conversation_id)
+        if conversation is None:
+            logger.warning(f"Conversation {conversation_id} not found")
+            return None
+        # Another request may have cached (and changed) a newer copy meanwhile; keep that one
+        current = self.conversations.get(conversation_id)
+        if current is None or current is cached:
+            self._cache(conversation)
+            self._index(conversation)
+        return self.get_conversation(conversation_id)
+    
     def get_all_conversations(self) -> List[Conversation]:
         """Get all conversations sorted by updated_at descending"""
+        return self._merge_cached(self.store.list_conversations())
+    
+    async def load_all_conversations(self) -> List[Conversation]:
+        """Get all conversations sorted by updated_at descending, reading the store off the event loop"""
+        return self._merge_cached(await asyncio.to_thread(self.store.list_conversations))
+    
+    def _merge_cached(self, stored: List[Conversation]) -> List[Conversation]:
+        merged = {c.id: c for c in stored}
+        # A cached copy may be stale if another worker wrote the conversation since
+        for conversation_id, conversation in self.conversations.items():
+            if conversation_id not in merged or merged[conversation_id].updated_at <= conversation.updated_at:
+                merged[conversation_id] = conversation
         conversations = sorted(
-            self.conversations.values(),
+            merged.values(),
             key=lambda c: c.updated_at,
             reverse=True
         )
         logger.debug(f"Retrieved {len(conversations)} conversations")
         return conversations
     
+    def list_conversation_summaries(self, cursor: Optional[str] = None,
+                                    limit: int = 50) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """Get a page of conversation summaries, most recently updated first"""
+        summaries, next_cursor = self.recency_index.page(cursor=cursor, limit=limit)
+        logger.debug(f"Retrieved {len(summaries)} conversation summaries")
+        return summaries, next_cursor
+    
+    async def load_conversation_summaries(self, cursor: Optional[str] = None,
+                                          limit: int = 50) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """Get a page of conversation summaries, read from the store when it is shared"""
+        if not self.store.persistent:
+            return self.list_conversation_summaries(cursor=cursor, limit=limit)
+        summaries, next_cursor = await asyncio.to_thread(self.store.page_summaries, cursor, limit)
+        logger.debug(f"Retrieved {len(summaries)} conversation summaries from the store")
+        return summaries, next_cursor
+    
     def add_message(self, conversation_id: str, role: MessageRole, content: str, 
-                   model_used: Optional[str] = None, file_attachment: Optional[str] = None) -> Optional[Message]:
+                   model_used: Optional[str] = None, attachment_id: Optional[str] = None) -> Optional[Message]:
         """Add a message to a conversation"""
         conversation = self.get_conversation(conversation_id)
         if not conversation:
@@ -67,41 +193,64 @@ class ConversationManager:
             content=content,
             timestamp=datetime.now(),
             model_used=model_used,
-            file_attachment=file_attachment
+            attachment_id=attachment_id
         )
         
         conversation.messages.append(message)
+        message_log(conversation)
         conversation.updated_at = datetime.now()
         
         # Update conversation title based on first user message
         if len(conversation.messages) == 1 and role == MessageRole.USER:
             conversation.title = content[:50] + "..." if len(content) > 50 else content
         
+        self.store.append_message(conversation_id, message)
+        self.store.save_conversation(conversation)
+        self.stored_messages += 1
+        self.stored_message_bytes += len(content.encode("utf-8"))
+        self._index(conversation)
+        
         logger.info(f"Added {role} message to conversation {conversation_id}")
         return message
     
-    def add_file_to_conversation(self, conversation_id: str, file_content: str) -> bool:
-        """Add file content to conversation's user_uploaded_files list"""
+    def add_file_to_conversation(self, conversation_id: str, attachment_id: str) -> bool:
+        """Add an uploaded file (by attachment id) to the conversation's attachment_ids list"""
         conversation = self.get_conversation(conversation_id)
         if not conversation:
             logger.error(f"Cannot add file to non-existent conversation {conversation_id}")
             return False
         
-        conversation.user_uploaded_files.append(file_content)
+        if attachment_id not in conversation.attachment_ids:
+            conversation.attachment_ids.append(attachment_id)
         conversation.updated_at = datetime.now()
+        self.store.save_conversation(conversation)
+        self._index(conversation)
+        self.get_agent_context(conversation_id).add_uploaded_file(attachment_id)
         
-        logger.info(f"Added file to conversation {conversation_id}, total files: {len(conversation.user_uploaded_files)}")
+        logger.info(f"Added file to conversation {conversation_id}, total files: {len(conversation.attachment_ids)}")
         return True
     
     def delete_conversation(self, conversation_id: str) -> bool:
         """Delete a conversation"""
-        if conversation_id in self.conversations:
-            del self.conversations[conversation_id]
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None and self.store.persistent:
+            conversation = self.store.load_conversation(conversation_id)
+        if conversation:
+            self.stored_messages -= len(conversation.messages)
+            self.stored_message_bytes -= sum(len(m.content.encode("utf-8")) for m in conversation.messages)
+            self._forget(conversation_id)
+            self.store.delete_conversation(conversation_id)
             logger.info(f"Deleted conversation {conversation_id}")
             return True
         logger.warning(f"Attempted to delete non-existent conversation {conversation_id}")
         return False
     
+    def _forget(self, conversation_id: str):
+        """Drop a conversation from the cache, its agent context and the recency index"""
+        self.conversations.pop(conversation_id, None)
+        self.agent_contexts.pop(conversation_id, None)
+        self.recency_index.remove(conversation_id)
+    
     def get_conversation_history(self, conversation_id: str) -> List[Message]:
         """Get message history for a conversation"""
         conversation = self.get_conversation(conversation_id)
@@ -110,5 +259,39 @@ class ConversationManager:
             return conversation.messages
         return []
 
+    def get_agent_context(self, conversation_id: str) -> AgentRunResultContext:
+        """Get (or create) the agent run context for a conversation.
+
+        A new context starts with the conversation's uploaded files, so one
+        dropped on cache eviction only loses its remembered searches.
+        """
+        context = self.agent_contexts.get(conversation_id)
+        if context is None:
+            context = AgentRunResultContext(
+                max_searches=self.settings.agent_context_max_searches,
+                max_uploaded_files=self.settings.agent_context_max_files
+            )
+            conversation = self.conversations.get(conversation_id)
+            for attachment_id in conversation.attachment_ids if conversation else []:
+                context.add_uploaded_file(attachment_id)
+            self.agent_contexts[conversation_id] = context
+        return context
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Conversation counts and agent context memory usage"""
+        context_usage = [context.memory_usage() for context in self.agent_contexts.values()]
+        return {
+            "cached_conversations": len(self.conversations),
+            "cached_messages": sum(len(c.messages) for c in self.conversations.values()),
+            "agent_contexts": len(self.agent_contexts),
+            "agent_context_bytes": sum(usage["total_bytes"] for usage in context_usage),
+            "agent_context_max_bytes": max((usage["total_bytes"] for usage in context_usage), default=0)
+        }
+
 # Global conversation manager instance
-conversation_manager = ConversationManager()
\ No newline at end of file
+conversation_manager = ConversationManager(store=create_conversation_store(get_settings()))
+
+metrics.gauge("conversations_stored", "Stored conversations", lambda: len(conversation_manager.recency_index))
+metrics.gauge("messages_stored", "Stored messages", lambda: conversation_manager.stored_messages)
+metrics.gauge("message_bytes_stored", "UTF-8 size of stored message contents",
+              lambda: conversation_manager.stored_message_bytes)
\ No newline at end of file
@@ -1,100 +1,231 @@
+import asyncio
 import logging
+import multiprocessing
 import os
-from typing import Optional
-from fastapi import UploadFile, HTTPException
-import PyPDF2
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Set
+from fastapi import HTTPException, Request
 from config.settings import get_settings
-import fitz
-import io
+from services.metrics import metrics
+from services.pdf_extraction import extract_page_range
+from services.text_cache import ExtractedTextCache
+from services.tracing import tracer
+from services.uploads import ReceivedUpload, UploadTooLarge, receive_upload
 
 logger = logging.getLogger(__name__)
 
+PDF_EXTRACT_SECONDS = metrics.histogram(
+    "pdf_extract_seconds", "Time to extract the text of one PDF in the worker pool", ["outcome"]
+)
+PDF_PAGES = metrics.histogram(
+    "pdf_pages", "Pages per extracted PDF", buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+
 class FileProcessor:
-    """Service for processing uploaded files"""
+    """Service for processing uploaded files.
+
+    Upload bodies are parsed as they stream in: the file is written once,
+    straight to a temp file, and hashed on the way, and workers open PDFs
+    from that file, so memory per upload does not grow with the document. PDF text is extracted in a bounded process pool so parsing
+    never blocks the event loop. Large documents are split into page ranges that are
+    extracted in parallel, and the page texts are joined once at the end.
+    Extracted PDF text is cached by the SHA-256 of the uploaded bytes.
+    """
     
     def __init__(self):
         self.settings = get_settings()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.text_cache = ExtractedTextCache(
+            max_memory_bytes=self.settings.extract_cache_bytes,
+            disk_dir=self.settings.extract_cache_dir,
+            max_disk_bytes=self.settings.extract_cache_disk_bytes
+        )
         logger.info("FileProcessor initialized")
-    
-    def validate_file(self, file: UploadFile) -> bool:
-        """Validate uploaded file"""
-        # Check file size
-        if file.size and file.size > self.settings.max_file_size:
-            logger.warning(f"File {file.filename} exceeds size limit: {file.size} bytes")
-            raise HTTPException(
-                status_code=413,
-                detail=f"File size exceeds limit of {self.settings.max_file_size} bytes"
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers do not inherit the server's threads or open connections
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.settings.pdf_workers,
+                mp_context=multiprocessing.get_context("spawn")
             )
+            logger.info(f"Started PDF extraction pool with {self.settings.pdf_workers} workers")
+        return self._pool
+
+    def _reset_pool(self, pool: Optional[ProcessPoolExecutor] = None):
+        """Discard ``pool`` (the current one by default), stopping workers still busy with an abandoned document.
+
+        Work from other uploads on the same pool is cancelled or fails with
+        ``BrokenProcessPool``; ``_run_range`` resubmits it to the fresh pool.
+        A pool that was already replaced is left alone.
+        """
+        if pool is None:
+            pool = self._pool
+        if pool is None or pool is not self._pool:
+            return
+        self._pool = None
+        processes = list(getattr(pool, "_processes", {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def close(self):
+        """Shut down the extraction worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+    
+    def validate_file(self, filename: str) -> bool:
+        """Validate an uploaded file's name, before its content is read"""
+        if not filename:
+            raise HTTPException(status_code=400, detail="No filename provided")
         
         # Check file extension
-        if file.filename:
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext not in self.settings.supported_file_types:
-                logger.warning(f"Unsupported file type: {file_ext}")
-                raise HTTPException(
-                    status_code=415,
-                    detail=f"Unsupported file type. Supported types: {', '.join(self.settings.supported_file_types)}"
-                )
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext not in self.settings.supported_file_types:
+            logger.warning(f"Unsupported file type: {file_ext}")
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported file type. Supported types: {', '.join(self.settings.supported_file_types)}"
+            )
         
-        logger.info(f"File {file.filename} validation passed")
+        logger.info(f"File {filename} validation passed")
         return True
     
-    async def process_file(self, file: UploadFile) -> str:
-        """Process uploaded file and extract text content"""
-        self.validate_file(file)
-        
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No filename provided")
-        
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        content = await file.read()
+    async def receive_file(self, request: Request) -> ReceivedUpload:
+        """Stream the ``file`` part of an upload request to disk, validating it on the way"""
+        try:
+            return await receive_upload(
+                request, "file", self.settings.max_file_size, self.settings.upload_spool_dir,
+                validate=self.validate_file
+            )
+        except UploadTooLarge:
+            logger.warning(f"Upload exceeds size limit of {self.settings.max_file_size} bytes")
+            raise HTTPException(
+                status_code=413,
+                detail=f"File size exceeds limit of {self.settings.max_file_size} bytes"
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    
+    async def process_file(self, upload: ReceivedUpload) -> str:
+        """Extract the text content of a received upload, then delete its temp file"""
+        file_ext = os.path.splitext(upload.filename)[1].lower()
         
         try:
             if file_ext == ".pdf":
-                text_content = self._extract_pdf_text(content)
+                # Re-uploads of the same bytes skip extraction entirely
+                text_content = await self.text_cache.get(upload.sha256, raw_size=upload.size)
+                if text_content is None:
+                    text_content = await self._extract_pdf_text(upload.path)
+                    await self.text_cache.put(upload.sha256, text_content)
+                else:
+                    logger.info(f"Extracted text cache hit for {upload.filename} ({upload.sha256[:12]})")
             elif file_ext == ".txt":
-                text_content = content.decode('utf-8')
+                text_content = await asyncio.to_thread(self._read_text, upload.path)
             else:
                 raise HTTPException(status_code=415, detail=f"Unsupported file type: {file_ext}")
             
-            logger.info(f"Successfully processed {file.filename}: {len(text_content)} characters extracted")
+            logger.info(f"Successfully processed {upload.filename}: {len(text_content)} characters extracted")
             return text_content
             
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {e}")
+            logger.error(f"Error processing file {upload.filename}: {e}")
             raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+        finally:
+            os.unlink(upload.path)
     
-    def _extract_pdf_text(self, pdf_content: bytes) -> str:
-        """Extract text from PDF content"""
+    @staticmethod
+    def _read_text(path: str) -> str:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    
+    async def _run_range(self, pdf_path: str, first: int, used: Set[ProcessPoolExecutor]):
+        """Extract one page range in the worker pool, noting the pools used in ``used``.
+
+        If the pool is reset or breaks because of another document while the
+        range is queued or running, the range is resubmitted once to a fresh
+        pool. Cancellation of the calling task itself is passed through.
+        """
+        loop = asyncio.get_running_loop()
+        last = first + self.settings.pdf_pages_per_task
+        for attempt in (1, 2):
+            pool = self._get_pool()
+            used.add(pool)
+            try:
+                return await loop.run_in_executor(pool, extract_page_range, pdf_path, first, last)
+            except (BrokenProcessPool, asyncio.CancelledError) as e:
+                task = asyncio.current_task()
+                if isinstance(e, asyncio.CancelledError) and task is not None and task.cancelling():
+                    raise
+                # A broken pool cannot run anything more; start a fresh one
+                self._reset_pool(pool)
+                if attempt == 2:
+                    raise BrokenProcessPool(f"Extraction pool failed twice for pages {first}-{last}") from e
+                logger.warning(f"⚠️ PDF extraction pool was reset under pages {first}-{last}; retrying")
+
+    async def _extract_pdf_text(self, pdf_path: str) -> str:
+        """Extract text from a PDF file in the worker pool, one task per page range"""
+        pages_per_task = self.settings.pdf_pages_per_task
+        used: Set[ProcessPoolExecutor] = set()
+
+        async def extract() -> str:
+            # The first range also reports the page count for scheduling the rest
+            page_count, first_texts = await self._run_range(pdf_path, 0, used)
+            rest = await asyncio.gather(*(
+                self._run_range(pdf_path, first, used)
+                for first in range(pages_per_task, page_count, pages_per_task)
+            ))
+            page_texts = first_texts + [text for _, texts in rest for text in texts]
+            PDF_PAGES.observe(page_count)
+            span.set_attribute("pages", page_count)
+            logger.info(f"Successfully extracted {page_count} pages from PDF in {1 + len(rest)} tasks")
+            return "".join(page_texts)
+
+        start = time.perf_counter()
         try:
-            text_content = ""
-            pdf_stream = io.BytesIO(pdf_content)
-            doc=fitz.open(stream = pdf_stream, filetype='pdf')
-            
-            for page_num in range(doc.page_count):
-                try:
-                    text_content+=doc[page_num].get_text()
-                except Exception as e:
-                    logger.warning(f"Error extracting text from page {page_num + 1}: {e}")
-                    continue
-            
-            if not text_content.strip():
-                raise ValueError("No text content could be extracted from PDF")
-            
-            logger.info(f"Successfully extracted {len(doc)} pages from PDF")
-            return text_content.strip()
-            
+            with tracer.span("pdf.extract") as span:
+                text_content = await asyncio.wait_for(extract(), timeout=self.settings.pdf_extract_timeout)
+            PDF_EXTRACT_SECONDS.labels("ok").observe(time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            PDF_EXTRACT_SECONDS.labels("timeout").observe(time.perf_counter() - start)
+            logger.error(f"PDF extraction timed out after {self.settings.pdf_extract_timeout}s")
+            # Stop the workers still busy with this document
+            for pool in used:
+                self._reset_pool(pool)
+            raise HTTPException(
+                status_code=422,
+                detail=f"PDF text extraction timed out after {self.settings.pdf_extract_timeout} seconds"
+            )
+        except BrokenProcessPool as e:
+            PDF_EXTRACT_SECONDS.labels("error").observe(time.perf_counter() - start)
+            # A worker died (e.g. crashed in the PDF parser) even after a retry in a fresh pool
+            logger.error(f"PDF extraction worker died: {e}")
+            raise ValueError("Failed to extract text from PDF: extraction worker crashed")
         except Exception as e:
+            PDF_EXTRACT_SECONDS.labels("error").observe(time.perf_counter() - start)
             logger.error(f"Error extracting PDF text: {e}")
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+
+        if not text_content.strip():
+            raise ValueError("No text content could be extracted from PDF")
+        return text_content.strip()
+    
+    def stats(self) -> dict:
+        """Extracted text cache counters"""
+        return self.text_cache.stats()
     
-    def get_file_info(self, file: UploadFile) -> dict:
+    def get_file_info(self, upload: ReceivedUpload) -> dict:
         """Get file information"""
         return {
-            "filename": file.filename,
-            "content_type": file.content_type,
-            "size": file.size,
-            "extension": os.path.splitext(file.filename)[1].lower() if file.filename else None
+            "filename": upload.filename,
+            "content_type": upload.content_type,
+            "size": upload.size,
+            "extension": os.path.splitext(upload.filename)[1].lower()
         }
 
 # Global file processor instance
@@ -1,28 +1,157 @@
+import asyncio
 import logging
-from typing import List, Dict
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Iterator, List, Dict, Optional
+import httpx
 from models.agent import AgentRunResultContext
-from services.agent import ROUTER_AGENT
-import openai
-import anthropic
-from config.settings import get_settings
-from models.chat import ModelProvider, ModelInfo
-from agents import Runner
+from config.settings import Settings, get_settings
+from models.chat import ModelProvider, ModelInfo, TokenUsage
+from services.admission import AdmissionController, AdmissionRejected, AdmissionTicket, provider_for_response
+from services.metrics import metrics
+from services.resilience import CircuitBreaker, ResiliencePolicy, RetryBudget
+from services.response_cache import ResponseCache
+from services.tracing import tracer
+
+# The provider SDKs and the agents SDK take seconds to import; they are
+# loaded by init_clients(), normally in a warm-up thread (see warm_up()).
+if TYPE_CHECKING:
+    import anthropic
+    import openai
+    from agents import Agent
 
 
 logger = logging.getLogger(__name__)
 
+ANTHROPIC_SYSTEM_PROMPT = "You are a helpful assistant."
+EPHEMERAL_CACHE = {"type": "ephemeral"}
+# Anthropic allows four cache breakpoints per request; one is kept for the history
+MAX_SYSTEM_CACHE_BREAKPOINTS = 2
+
+LLM_CALL_SECONDS = metrics.histogram(
+    "llm_call_seconds", "Latency of one non-streaming provider call; an agent run counts as one call",
+    ["provider", "model", "outcome"]
+)
+LLM_TOKENS = metrics.counter("llm_tokens_total", "Provider-reported tokens by kind", ["model", "kind"])
+
+@contextmanager
+def _timed_call(provider: str, model_name: str) -> Iterator[None]:
+    """Record a provider call's latency under its outcome (ok, error or cancelled, e.g. a lost hedge),
+    and trace it as an ``llm.call`` span"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with tracer.span("llm.call", provider=provider, model=model_name):
+            yield
+        outcome = "ok"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        LLM_CALL_SECONDS.labels(provider, model_name, outcome).observe(time.perf_counter() - start)
+
+def create_http_client(settings: Settings,
+                       on_response: Optional[Callable[[httpx.Response], Awaitable[None]]] = None) -> httpx.AsyncClient:
+    """Create the shared, size-limited keep-alive HTTP pool for provider clients.
+
+    ``on_response`` is called with every upstream response (see
+    ``LLMService.observe_response``).
+    """
+    return httpx.AsyncClient(
+        event_hooks={"response": [on_response]} if on_response else None,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry
+        ),
+        timeout=httpx.Timeout(
+            settings.http_read_timeout,
+            connect=settings.http_connect_timeout,
+            pool=settings.http_pool_timeout
+        )
+    )
+
 class LLMService:
     """Service for interacting with different LLM providers"""
     
     def __init__(self):
         self.settings = get_settings()
-        self._init_clients()
+        self.openai_client: Optional["openai.AsyncOpenAI"] = None
+        self.anthropic_client: Optional["anthropic.AsyncAnthropic"] = None
         self._init_models()
-        self.agent = ROUTER_AGENT
-        self.agent_context = AgentRunResultContext()
+        self._agent: Optional["Agent"] = None
+        self._warm_up: Optional[asyncio.Task] = None
+        self.usage_totals: Dict[str, Dict[str, int]] = {}
+        self.response_cache: Optional[ResponseCache] = None
+        if self.settings.response_cache_enabled:
+            self.response_cache = ResponseCache(
+                ttl_seconds=self.settings.response_cache_ttl_seconds,
+                max_entries=self.settings.response_cache_max_entries,
+                max_bytes=self.settings.response_cache_max_bytes
+            )
+        self.admission: Optional[AdmissionController] = None
+        if self.settings.llm_max_concurrency > 0:
+            self.admission = AdmissionController(
+                max_concurrency=self.settings.llm_max_concurrency,
+                max_concurrency_per_model=self.settings.llm_max_concurrency_per_model,
+                queue_size=self.settings.llm_queue_size,
+                queue_timeout=self.settings.llm_queue_timeout_seconds
+            )
+        self.resilience = self._create_policies()
     
-    def _init_clients(self):
-        """Initialize API clients"""
+    def _create_policies(self) -> Dict[ModelProvider, ResiliencePolicy]:
+        """One resilience policy, and so one circuit breaker, per provider endpoint.
+
+        Agent runs update the conversation's run context as they go, so they
+        are neither retried nor hedged; they still get the deadline and the
+        circuit breaker. The SDK clients do no retries of their own (see
+        ``init_clients``), so every upstream attempt goes through a policy.
+
+        Hedges and retries run inside the turn's admission slot and are not
+        counted against admission control; the retry budget is what bounds
+        them, to ``retry_budget_ratio`` of calls on top of the admitted load.
+        """
+        policies = {}
+        for provider in ModelProvider:
+            repeatable = provider == ModelProvider.ANTHROPIC
+            policies[provider] = ResiliencePolicy(
+                name=provider.value,
+                max_attempts=self.settings.llm_max_attempts if repeatable else 1,
+                hedge_percentile=self.settings.llm_hedge_percentile if repeatable else 0,
+                budget=RetryBudget(ratio=self.settings.retry_budget_ratio),
+                breaker=CircuitBreaker(
+                    provider.value,
+                    failure_threshold=self.settings.circuit_failure_threshold,
+                    reset_seconds=self.settings.circuit_reset_seconds
+                )
+            )
+        return policies
+
+    @property
+    def agent(self) -> "Agent":
+        """The router agent; importing it loads the agents SDK"""
+        if self._agent is None:
+            from services.agent import ROUTER_AGENT
+            self._agent = ROUTER_AGENT
+        return self._agent
+
+    def init_clients(self, http_client: httpx.AsyncClient):
+        """Initialize async API clients on top of the shared HTTP pool.
+
+        ``http_client`` is owned by the application lifespan, which closes
+        it on shutdown. This imports the provider SDKs, so the lifespan runs
+        it through ``warm_up()``.
+        """
+        import anthropic
+        import openai
+        from agents import set_default_openai_client
+        from services.agent import install_trace_bridge
+
+        # Load the router agent and its tools here too, off the event loop
+        self.agent
+        # Agent, handoff and tool spans from agent runs join our traces
+        install_trace_bridge()
         self.openai_client = None
         self.anthropic_client = None
         
@@ -32,13 +161,15 @@ class LLMService:
         # Check if OpenAI API key is valid (not placeholder)
         if self.settings.openai_api_key and not self.settings.openai_api_key.startswith("your_"):
             try:
-                # Use the modern OpenAI API (v1.0+) with explicit http_client to avoid proxy issues
-                import httpx
-                http_client = httpx.Client()
-                self.openai_client = openai.OpenAI(
+                self.openai_client = openai.AsyncOpenAI(
                     api_key=self.settings.openai_api_key,
-                    http_client=http_client
+                    base_url=self.settings.openai_base_url,
+                    http_client=http_client,
+                    # Retries and hedges are left to the resilience policy
+                    max_retries=0
                 )
+                # Let the agents SDK reuse the same client (and connection pool)
+                set_default_openai_client(self.openai_client)
                 logger.info("✅ OpenAI client initialized successfully")
             except Exception as e:
                 logger.error(f"❌ Failed to initialize OpenAI client: {e}")
@@ -48,13 +179,69 @@ class LLMService:
         # Check if Anthropic API key is valid (not placeholder)
         if self.settings.anthropic_api_key and not self.settings.anthropic_api_key.startswith("your_"):
             try:
-                self.anthropic_client = anthropic.Anthropic(api_key=self.settings.anthropic_api_key)
+                self.anthropic_client = anthropic.AsyncAnthropic(
+                    api_key=self.settings.anthropic_api_key,
+                    base_url=self.settings.anthropic_base_url,
+                    http_client=http_client,
+                    max_retries=0
+                )
                 logger.info("✅ Anthropic client initialized successfully")
             except Exception as e:
                 logger.error(f"❌ Failed to initialize Anthropic client: {e}")
         else:
             logger.info("⚠️ No valid Anthropic API key configured")
+
+    def warm_up(self, http_client: httpx.AsyncClient):
+        """Run ``init_clients`` in a worker thread so startup does not wait on SDK imports.
+
+        Requests that arrive first wait for it in ``ready()``.
+        """
+        if self._warm_up is None:
+            self._warm_up = asyncio.create_task(asyncio.to_thread(self.init_clients, http_client))
+            self._warm_up.add_done_callback(self._log_warm_up_failure)
+
+    @staticmethod
+    def _log_warm_up_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"❌ LLM client warm-up failed: {task.exception()}")
+
+    async def ready(self):
+        """Wait for a pending warm-up to finish"""
+        if self._warm_up is not None and not self._warm_up.done():
+            await asyncio.wait({self._warm_up})
     
+    async def admit(self, provider: ModelProvider, model_name: str,
+                    conversation_id: Optional[str] = None) -> Optional[AdmissionTicket]:
+        """Wait for an upstream slot; raises ``AdmissionRejected`` when overloaded.
+
+        Returns ``None`` when admission control is disabled. The caller must
+        ``release()`` the ticket once the upstream call has finished.
+        """
+        if self.admission is None:
+            return None
+        return await self.admission.acquire(provider.value, model_name, conversation_id)
+
+    @asynccontextmanager
+    async def admitted(self, provider: ModelProvider, model_name: str,
+                       conversation_id: Optional[str] = None) -> AsyncIterator[None]:
+        """``async with`` form of ``admit``"""
+        ticket = await self.admit(provider, model_name, conversation_id)
+        try:
+            yield
+        finally:
+            if ticket:
+                ticket.release()
+
+    async def observe_response(self, response: httpx.Response):
+        """HTTP client hook: feed provider rate-limit headers to admission control"""
+        if self.admission is not None:
+            provider = provider_for_response(response.request.url.path, response.headers)
+            self.admission.observe(provider, response.status_code, response.headers)
+
+    def admission_stats(self) -> Dict[str, Any]:
+        """Admission control counters per provider"""
+        return self.admission.stats() if self.admission else {"enabled": False}
+
     def _init_models(self):
         """Initialize available models"""
         self.static_anthropic_models = [
@@ -83,21 +270,18 @@ class LLMService:
         self.openai_models_last_fetched = None
         logger.info("Model system initialized - OpenAI models will be fetched dynamically")
     
-    def _fetch_openai_models(self) -> List[ModelInfo]:
-        """Fetch available OpenAI models from API"""
+    async def _fetch_openai_models(self) -> List[ModelInfo]:
+        """Fetch available OpenAI models from API.
+
+        Called by the model catalog's background refresher, which decides when
+        to refetch. On failure the last fetched list is returned.
+        """
         if not self.openai_client:
             return []
         
         try:
-            # Check cache validity (cache for 1 hour)
-            from datetime import datetime, timedelta
-            now = datetime.now()
-            if (self.openai_models_last_fetched and 
-                now - self.openai_models_last_fetched < timedelta(hours=1)):
-                return self.openai_models_cache
-            
             logger.info("Fetching OpenAI models from API...")
-            models_response = self.openai_client.models.list()
+            models_response = await self.openai_client.models.list()
             
             # Add ALL models from OpenAI API without filtering
             all_models = []
@@ -174,7 +358,7 @@ class LLMService:
             
             # Update cache
             self.openai_models_cache = all_models
-            self.openai_models_last_fetched = now
+            self.openai_models_last_fetched = datetime.now()
             
             logger.info(f"Successfully fetched {len(all_models)} OpenAI models")
             return all_models
@@ -184,13 +368,18 @@ class LLMService:
             # Return cached models if available, otherwise return empty list
             return self.openai_models_cache if self.openai_models_cache else []
     
-    def get_available_models(self) -> List[ModelInfo]:
-        """Get list of available models based on configured API keys"""
+    async def get_available_models(self) -> List[ModelInfo]:
+        """Get list of available models based on configured API keys.
+
+        This always refetches the OpenAI models; serve requests from
+        ``services.model_catalog.model_catalog`` instead.
+        """
+        await self.ready()
         available = []
         
         # Add OpenAI models if client is available
         if self.openai_client:
-            openai_models = self._fetch_openai_models()
+            openai_models = await self._fetch_openai_models()
             available.extend(openai_models)
         
         # Add Anthropic models if client is available
@@ -200,32 +389,83 @@ class LLMService:
         logger.debug(f"Returning {len(available)} available models")
         return available
     
+    def uses_response_cache(self, provider: ModelProvider, use_cache: bool = True) -> bool:
+        """Whether ``generate_response`` may serve this provider's responses from the cache"""
+        if not (use_cache and self.response_cache):
+            return False
+        return provider != ModelProvider.OPENAI or self.settings.response_cache_agent_runs
+
     async def generate_response(self, messages: List[Dict[str, str]], 
-                              provider: ModelProvider, model_name: str, uploaded_files: List[str]) -> str:
-        """Generate response from LLM"""
+                              provider: ModelProvider, model_name: str,
+                              context: Optional[AgentRunResultContext] = None,
+                              usage: Optional[TokenUsage] = None,
+                              use_cache: bool = True,
+                              conversation_id: Optional[str] = None,
+                              holds_slot: bool = False) -> str:
+        """Generate response from LLM.
+
+        ``context`` is the conversation's agent run context, used on the
+        OpenAI agent path. Provider-reported token usage is added to
+        ``usage`` when given; a response served from the response cache
+        reports no usage. ``use_cache=False`` bypasses the cache. Upstream
+        calls go through the provider's ``ResiliencePolicy`` and, unless the
+        caller ``holds_slot`` already, wait for admission on behalf of
+        ``conversation_id``; cache hits and requests joining an in-flight
+        call take no slot.
+        """
+        await self.ready()
         try:
             if provider == ModelProvider.OPENAI:
                 # return await self._generate_openai_response(messages, model_name)
-                return await self._generate_openai_agent_response(messages, uploaded_files)
+                call = lambda: self._generate_openai_agent_response(messages, context, model_name, usage)
             elif provider == ModelProvider.ANTHROPIC:
-                return await self._generate_anthropic_response(messages, model_name)
+                call = lambda: self._generate_anthropic_response(messages, model_name, usage)
             else:
                 raise ValueError(f"Unsupported provider: {provider}")
+
+            async def generate() -> str:
+                # Deadline, hedging, retries and circuit breaker
+                if holds_slot:
+                    return await self.resilience[provider].call(call)
+                async with self.admitted(provider, model_name, conversation_id):
+                    return await self.resilience[provider].call(call)
+
+            with tracer.span("llm.generate", provider=provider.value, model=model_name) as span:
+                if not self.uses_response_cache(provider, use_cache):
+                    return await generate()
+                key = ResponseCache.make_key(provider.value, model_name, self._generation_params(provider), messages)
+                span.set_attribute("cacheable", True)
+                return await self.response_cache.get_or_load(key, generate)
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Error generating response with {provider}/{model_name}: {e}")
             raise
 
-    async def _generate_openai_agent_response(self, messages: List[Dict[str, str]], uploaded_files: List[str]) -> str:
-            # Update agent context with user uploaded files
-            self.agent_context.user_uploaded_files.append(uploaded_files)
-            logger.debug(f"Latest uploaded: {self.agent_context.user_uploaded_files[-1]}")
-            result = await Runner.run(starting_agent=self.agent,
-                                      input=messages,
-                                      context=self.agent_context)
+    def _generation_params(self, provider: ModelProvider) -> Dict[str, Any]:
+        """Request settings besides model and messages that shape the response"""
+        if provider == ModelProvider.OPENAI:
+            return {"agent": self.agent.name, "instructions": self.agent.instructions}
+        return {"system": ANTHROPIC_SYSTEM_PROMPT, "temperature": 0.7, "max_tokens": self.settings.max_output_tokens}
+
+    async def _generate_openai_agent_response(self, messages: List[Dict[str, str]],
+                                              context: Optional[AgentRunResultContext],
+                                              model_name: str = "agent",
+                                              usage: Optional[TokenUsage] = None) -> str:
+            from agents import Runner
+            from services.agent import AgentMetricsHooks
+
+            with _timed_call("openai", model_name):
+                result = await Runner.run(starting_agent=self.agent,
+                                          input=messages,
+                                          context=context if context is not None else AgentRunResultContext(),
+                                          hooks=AgentMetricsHooks())
             
+            self._record_usage(model_name, self._agent_usage(result.context_wrapper.usage), usage)
             return result.final_output
     
-    async def _generate_openai_response(self, messages: List[Dict[str, str]], model_name: str) -> str:
+    async def _generate_openai_response(self, messages: List[Dict[str, str]], model_name: str,
+                                        usage: Optional[TokenUsage] = None) -> str:
         """Generate response using OpenAI API"""
         if not self.openai_client:
             raise ValueError("OpenAI client not initialized")
@@ -238,22 +478,26 @@ class LLMService:
             # GPT-5 models have different parameter requirements
             if 'gpt-5' in model_name.lower():
                 # GPT-5 models: use max_completion_tokens and don't support custom temperature
-                response = self.openai_client.chat.completions.create(
-                    model=model_name,
-                    messages=messages,
-                    max_completion_tokens=self.settings.max_output_tokens
-                )
+                params = {"max_completion_tokens": self.settings.max_output_tokens}
             else:
                 # Other models: use standard parameters
-                response = self.openai_client.chat.completions.create(
+                params = {"temperature": 0.7, "max_tokens": self.settings.max_output_tokens}
+            with _timed_call("openai", model_name):
+                response = await self.openai_client.chat.completions.create(
                     model=model_name,
                     messages=messages,
-                    temperature=0.7,
-                    max_tokens=self.settings.max_output_tokens
+                    **params
                 )
             
             # Modern OpenAI response format
             logger.debug(f"OpenAI response object: {response}")
+            if response.usage:
+                details = response.usage.prompt_tokens_details
+                self._record_usage(model_name, TokenUsage(
+                    input_tokens=response.usage.prompt_tokens,
+                    output_tokens=response.usage.completion_tokens,
+                    cached_input_tokens=(details.cached_tokens or 0) if details else 0
+                ), usage)
             
             if not response.choices:
                 logger.error("No choices in OpenAI response")
@@ -289,7 +533,8 @@ class LLMService:
             logger.error(f"OpenAI API error: {e}")
             raise
     
-    async def _generate_anthropic_response(self, messages: List[Dict[str, str]], model_name: str) -> str:
+    async def _generate_anthropic_response(self, messages: List[Dict[str, str]], model_name: str,
+                                           usage: Optional[TokenUsage] = None) -> str:
         """Generate response using Anthropic API"""
         if not self.anthropic_client:
             raise ValueError("Anthropic client not initialized")
@@ -297,27 +542,12 @@ class LLMService:
         logger.info(f"Generating Anthropic response with model {model_name}")
         
         try:
-            # Convert messages to Anthropic format
-            system_message = ""
-            anthropic_messages = []
-            
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_message = msg["content"]
-                else:
-                    anthropic_messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
-            
-            response = self.anthropic_client.messages.create(
-                model=model_name,
-                system=system_message if system_message else "You are a helpful assistant.",
-                messages=anthropic_messages,
-                temperature=0.7,
-                max_tokens=self.settings.max_output_tokens
-            )
+            with _timed_call("anthropic", model_name):
+                response = await self.anthropic_client.messages.create(
+                    **self._build_anthropic_request(messages, model_name)
+                )
             
+            self._record_usage(model_name, self._anthropic_usage(response.usage), usage)
             content = response.content[0].text
             logger.info(f"Generated Anthropic response: {len(content)} characters")
             return content
@@ -326,5 +556,252 @@ class LLMService:
             logger.error(f"Anthropic API error: {e}")
             raise
 
+    async def summarize(self, transcript: str, provider: ModelProvider) -> str:
+        """Summarize a span of conversation with the provider's summary model.
+
+        Summaries run in the background after the turn that needed them, so
+        they take their own admission slot (and may be rejected when busy)
+        and go through the provider's ``ResiliencePolicy`` like any other call.
+        """
+        messages = [
+            {"role": "system", "content": (
+                "Summarize this conversation excerpt in a few sentences. Keep names, numbers, "
+                "decisions, job titles and any facts the user may refer back to."
+            )},
+            {"role": "user", "content": transcript}
+        ]
+        await self.ready()
+        if provider == ModelProvider.ANTHROPIC:
+            model_name = self.settings.summary_anthropic_model
+            call = lambda: self._generate_anthropic_response(messages, model_name)
+        else:
+            model_name = self.settings.summary_openai_model
+            call = lambda: self._generate_openai_response(messages, model_name)
+        async with self.admitted(provider, model_name):
+            return await self.resilience[provider].call(call)
+
+    def _build_anthropic_request(self, messages: List[Dict[str, Any]], model_name: str) -> Dict[str, Any]:
+        """Convert chat messages into Anthropic ``messages.create`` arguments.
+
+        System messages become system blocks after the default instructions.
+        With prompt caching on, cache breakpoints mark the end of the stable
+        prefix once it is long enough to be cached.
+        """
+        # System messages lead the list; the rest are already Anthropic-format entries
+        start = 0
+        while start < len(messages) and messages[start]["role"] == "system":
+            start += 1
+        system_messages = messages[:start]
+        anthropic_messages = messages[start:]
+        if any(msg["role"] == "system" for msg in anthropic_messages):
+            system_messages = [msg for msg in messages if msg["role"] == "system"]
+            anthropic_messages = [msg for msg in messages if msg["role"] != "system"]
+        
+        system_blocks = [{"type": "text", "text": ANTHROPIC_SYSTEM_PROMPT}]
+        system_ends = []
+        for msg in system_messages:
+            system_blocks.extend(self._anthropic_blocks(msg["content"]))
+            system_ends.append(len(system_blocks) - 1)
+        if self.settings.prompt_cache_enabled:
+            anthropic_messages = self._add_cache_breakpoints(system_blocks, system_ends, anthropic_messages)
+        
+        return {
+            "model": model_name,
+            "system": system_blocks,
+            "messages": anthropic_messages,
+            "temperature": 0.7,
+            "max_tokens": self.settings.max_output_tokens
+        }
+
+    @staticmethod
+    def _anthropic_blocks(content: Any) -> List[Dict[str, Any]]:
+        """New text blocks for a message's content (a string or a list of text parts)"""
+        if isinstance(content, str):
+            return [{"type": "text", "text": content}]
+        return [{"type": "text", "text": part["text"]} for part in content]
+
+    def _add_cache_breakpoints(self, system_blocks: List[Dict[str, Any]], system_ends: List[int],
+                               messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Mark cacheable prefixes with ``cache_control``.
+
+        The last system messages (uploaded files, then the summary) and the
+        last message before the current turn each end a prefix that the next
+        turn sends unchanged. Prefixes shorter than ``prompt_cache_min_tokens``
+        are left unmarked, because caching them only adds the cache-write
+        surcharge. Shared message entries are never modified.
+        """
+        min_chars = self.settings.prompt_cache_min_tokens * 4
+        prefix_chars = 0
+        eligible = []
+        for index, block in enumerate(system_blocks):
+            prefix_chars += len(block["text"])
+            if index in system_ends and prefix_chars >= min_chars:
+                eligible.append(index)
+        for index in eligible[-MAX_SYSTEM_CACHE_BREAKPOINTS:]:
+            system_blocks[index]["cache_control"] = EPHEMERAL_CACHE
+        
+        if len(messages) < 2:
+            return messages
+        for msg in messages[:-1]:
+            content = msg["content"]
+            prefix_chars += len(content) if isinstance(content, str) else sum(len(part["text"]) for part in content)
+        if prefix_chars < min_chars:
+            return messages
+        messages = list(messages)
+        blocks = self._anthropic_blocks(messages[-2]["content"])
+        blocks[-1]["cache_control"] = EPHEMERAL_CACHE
+        messages[-2] = {"role": messages[-2]["role"], "content": blocks}
+        return messages
+
+    @staticmethod
+    def _anthropic_usage(usage: Any) -> TokenUsage:
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        return TokenUsage(
+            input_tokens=(usage.input_tokens or 0) + cache_read + cache_write,
+            output_tokens=usage.output_tokens or 0,
+            cached_input_tokens=cache_read,
+            cache_write_tokens=cache_write
+        )
+
+    @staticmethod
+    def _agent_usage(usage: Any) -> TokenUsage:
+        return TokenUsage(
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            cached_input_tokens=usage.input_tokens_details.cached_tokens or 0
+        )
+
+    def _record_usage(self, model_name: str, measured: TokenUsage, usage: Optional[TokenUsage] = None):
+        """Log one request's token usage, add it to the per-model totals and to ``usage``"""
+        logger.info(
+            f"Token usage for {model_name}: {measured.input_tokens} input "
+            f"({measured.cached_input_tokens} cached, {measured.cache_write_tokens} cache write), "
+            f"{measured.output_tokens} output"
+        )
+        totals = self.usage_totals.setdefault(model_name, {"requests": 0, **TokenUsage().model_dump()})
+        totals["requests"] += 1
+        for field, value in measured.model_dump().items():
+            totals[field] += value
+            if value:
+                LLM_TOKENS.labels(model_name, field[:-len("_tokens")]).inc(value)
+            if usage is not None:
+                setattr(usage, field, getattr(usage, field) + value)
+
+    def usage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model token totals and the share of input tokens served from prompt caches"""
+        return {
+            model_name: {
+                **totals,
+                "cached_input_ratio": round(totals["cached_input_tokens"] / totals["input_tokens"], 4)
+                if totals["input_tokens"] else 0.0
+            }
+            for model_name, totals in self.usage_totals.items()
+        }
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Retry, hedging and circuit breaker counters per provider"""
+        return {provider.value: policy.stats() for provider, policy in self.resilience.items()}
+
+    def response_cache_stats(self) -> Dict[str, Any]:
+        """Response cache counters, including hit rate and upstream latency saved"""
+        return self.response_cache.stats() if self.response_cache else {"enabled": False}
+
+    async def stream_response(self, messages: List[Dict[str, str]],
+                              provider: ModelProvider, model_name: str,
+                              context: Optional[AgentRunResultContext] = None,
+                              usage: Optional[TokenUsage] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response from the LLM as it is generated.
+
+        Yields ``{"type": "delta", "content": ...}`` events for text tokens and,
+        on the agent path, ``{"type": "agent_event", ...}`` events for agent
+        switches, tool calls and handoffs. The last event is always
+        ``{"type": "completed", "content": <full response>}``.
+
+        Opening the stream, up to its first event, goes through the
+        provider's ``ResiliencePolicy``: an open circuit fails fast, and the
+        attempt timeout bounds the wait for the first event. Nothing has
+        reached the caller before then, so a failed opening can be retried.
+        """
+        await self.ready()
+        if provider == ModelProvider.OPENAI:
+            open_events = lambda: self._stream_openai_agent_response(messages, context, model_name, usage)
+        elif provider == ModelProvider.ANTHROPIC:
+            open_events = lambda: self._stream_anthropic_response(messages, model_name, usage)
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
+
+        async def open_stream():
+            events = open_events()
+            try:
+                return events, await events.__anext__()
+            except BaseException:
+                await events.aclose()
+                raise
+
+        try:
+            with tracer.span("llm.stream_open", provider=provider.value, model=model_name):
+                events, first = await self.resilience[provider].call(open_stream)
+            try:
+                yield first
+                async for event in events:
+                    yield event
+            finally:
+                await events.aclose()
+        except Exception as e:
+            logger.error(f"Error streaming response with {provider}/{model_name}: {e}")
+            raise
+
+    async def _stream_openai_agent_response(self, messages: List[Dict[str, str]],
+                                            context: Optional[AgentRunResultContext],
+                                            model_name: str = "agent",
+                                            usage: Optional[TokenUsage] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream agent run events and output text deltas"""
+        from agents import Runner
+        from agents.stream_events import RawResponsesStreamEvent, RunItemStreamEvent, AgentUpdatedStreamEvent
+        from services.agent import AgentMetricsHooks
+
+        result = Runner.run_streamed(starting_agent=self.agent,
+                                     input=messages,
+                                     context=context if context is not None else AgentRunResultContext(),
+                                     hooks=AgentMetricsHooks())
+        
+        async for event in result.stream_events():
+            if isinstance(event, RawResponsesStreamEvent):
+                if event.data.type == "response.output_text.delta":
+                    yield {"type": "delta", "content": event.data.delta}
+            elif isinstance(event, AgentUpdatedStreamEvent):
+                yield {"type": "agent_event", "name": "agent_updated", "agent": event.new_agent.name}
+            elif isinstance(event, RunItemStreamEvent):
+                agent_event = {"type": "agent_event", "name": event.name, "agent": event.item.agent.name}
+                tool_name = getattr(event.item.raw_item, "name", None)
+                if event.name == "tool_called" and tool_name:
+                    agent_event["tool"] = tool_name
+                yield agent_event
+        
+        self._record_usage(model_name, self._agent_usage(result.context_wrapper.usage), usage)
+        yield {"type": "completed", "content": str(result.final_output)}
+
+    async def _stream_anthropic_response(self, messages: List[Dict[str, str]], model_name: str,
+                                         usage: Optional[TokenUsage] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream text deltas from the Anthropic API"""
+        if not self.anthropic_client:
+            raise ValueError("Anthropic client not initialized")
+        
+        logger.info(f"Streaming Anthropic response with model {model_name}")
+        chunks = []
+        async with self.anthropic_client.messages.stream(
+            **self._build_anthropic_request(messages, model_name)
+        ) as stream:
+            async for text in stream.text_stream:
+                chunks.append(text)
+                yield {"type": "delta", "content": text}
+            final_message = await stream.get_final_message()
+        self._record_usage(model_name, self._anthropic_usage(final_message.usage), usage)
+        
+        content = "".join(chunks)
+        logger.info(f"Streamed Anthropic response: {len(content)} characters")
+        yield {"type": "completed", "content": content}
+
 # Global LLM service instance
 llm_service = LLMService()
\ No newline at end of file
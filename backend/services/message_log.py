@@ -0,0 +1,73 @@
+from typing import Dict, List, Optional, Tuple
+from models.chat import Conversation, Message, ModelProvider
+
+# Fixed per-message overhead (role markers, separators) in provider formats
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+# Content part type for text, per provider (OpenAI input goes through the Responses API)
+TEXT_PART_TYPES = {
+    ModelProvider.OPENAI: "input_text",
+    ModelProvider.ANTHROPIC: "text",
+}
+
+class MessageLog:
+    """Append-only, provider-ready message entries for one conversation.
+
+    Each message becomes a ``{"role", "content"}`` dict once, when it is
+    added. Plain text turns are the same in the OpenAI and Anthropic
+    formats, so both providers share the entries. A turn then hands over a
+    slice of entry references instead of rebuilding every message. A message
+    given extra text for one turn (such as retrieved excerpts) becomes a list
+    of content parts. The extra text is referenced, not concatenated.
+
+    The log also keeps running token totals (``cumulative[i]`` is the
+    estimate for ``entries[:i]``) and the indexes of messages with
+    attachments, so fitting a window to a budget needs no pass over the
+    history.
+    """
+
+    def __init__(self):
+        self.entries: List[Dict[str, str]] = []
+        self.cumulative: List[int] = [0]
+        self.attachments: List[Tuple[int, str]] = []
+
+    def append(self, message: Message):
+        if message.attachment_id:
+            self.attachments.append((len(self.entries), message.attachment_id))
+        self.entries.append({"role": message.role.value, "content": message.content})
+        self.cumulative.append(self.cumulative[-1] + estimate_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS)
+
+    def sync(self, messages: List[Message]) -> "MessageLog":
+        """Append entries for messages not in the log yet (e.g. loaded from storage)"""
+        for message in messages[len(self.entries):]:
+            self.append(message)
+        return self
+
+    def window(self, start: int, provider: ModelProvider,
+               attachments: Optional[Dict[int, List[Tuple[str, str]]]] = None) -> List[Dict]:
+        """Entries from ``start`` on, with ``(header, text)`` attachment parts added to the given message indexes"""
+        window = self.entries[start:]
+        if attachments:
+            part_type = TEXT_PART_TYPES[provider]
+            for index, parts in attachments.items():
+                entry = self.entries[index]
+                (first_header, first_text), rest = parts[0], parts[1:]
+                content = [
+                    {"type": part_type, "text": entry["content"] + first_header},
+                    {"type": part_type, "text": first_text},
+                ]
+                for header, text in rest:
+                    content.append({"type": part_type, "text": header})
+                    content.append({"type": part_type, "text": text})
+                window[index - start] = {"role": entry["role"], "content": content}
+        return window
+
+def message_log(conversation: Conversation) -> MessageLog:
+    """The conversation's message log, created and caught up on first use"""
+    if conversation._message_log is None:
+        conversation._message_log = MessageLog()
+    return conversation._message_log.sync(conversation.messages)
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+from pydantic import TypeAdapter
+from config.settings import get_settings
+from models.chat import ModelInfo
+from services.llm import llm_service
+
+logger = logging.getLogger(__name__)
+
+_MODEL_LIST = TypeAdapter(List[ModelInfo])
+
+class CatalogSnapshot(NamedTuple):
+    """A model list with its serialized response body and ETag"""
+    models: List[ModelInfo]
+    body: bytes
+    etag: str
+    built_at: float
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches ``etag`` (weak comparison)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+class ModelCatalog:
+    """Available models, served from a snapshot and refreshed in the background.
+
+    Requests get the last snapshot without waiting on the provider
+    (stale-while-revalidate). A background task started from the application
+    lifespan rebuilds it every ``refresh_seconds``. A request that finds it
+    older than that also triggers a refresh. Concurrent refreshes share one
+    load. If a refresh fails, the previous snapshot is kept.
+    """
+
+    def __init__(self, load: Callable[[], Awaitable[List[ModelInfo]]], refresh_seconds: float = 3600.0):
+        self._load = load
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background refresher; the first load begins immediately"""
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        for task in (self._refresher, self._refreshing):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._refresher = None
+        self._refreshing = None
+
+    async def snapshot(self) -> CatalogSnapshot:
+        """The current snapshot; only the very first call waits for a load"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await asyncio.shield(self._start_refresh())
+        if time.monotonic() - snapshot.built_at > self.refresh_seconds:
+            self._start_refresh()
+        return snapshot
+
+    async def refresh(self) -> CatalogSnapshot:
+        """Rebuild the snapshot now, joining a refresh already in flight"""
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._build())
+            # Mark the error retrieved so a background refresh nobody awaits
+            # is not reported as "never retrieved"; _build logs it.
+            self._refreshing.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._refreshing
+
+    async def _build(self) -> CatalogSnapshot:
+        try:
+            models = await self._load()
+        except Exception as e:
+            logger.error(f"Failed to refresh model catalog: {e}")
+            raise
+        body = _MODEL_LIST.dump_json(models)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if self._snapshot is None or self._snapshot.etag != etag:
+            logger.info(f"Model catalog updated: {len(models)} models")
+        self._snapshot = CatalogSnapshot(models=models, body=body, etag=etag, built_at=time.monotonic())
+        return self._snapshot
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # logged in _build; keep serving the previous snapshot
+            await asyncio.sleep(self.refresh_seconds)
+
+# Global model catalog instance
+model_catalog = ModelCatalog(
+    load=llm_service.get_available_models,
+    refresh_seconds=get_settings().model_catalog_refresh_seconds
+)
@@ -0,0 +1,31 @@
+"""PDF text extraction run in worker processes.
+
+Kept free of application imports so spawned workers only load PyMuPDF.
+PyMuPDF itself is imported on first use, so the API process that schedules
+the work never loads it.
+"""
+
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+def extract_page_range(pdf_path: str, first_page: int, last_page: int) -> Tuple[int, List[str]]:
+    """Extract text from pages ``[first_page, last_page)`` of the PDF at ``pdf_path``.
+
+    MuPDF reads the file on demand, so a worker never holds the whole
+    document in memory.
+
+    Returns the document's page count with the page texts, so the first range
+    also tells the caller how many more ranges to schedule.
+    """
+    import fitz
+
+    with fitz.open(pdf_path, filetype="pdf") as doc:
+        texts = []
+        for page_num in range(first_page, min(last_page, doc.page_count)):
+            try:
+                texts.append(doc[page_num].get_text())
+            except Exception as e:
+                logger.warning(f"Error extracting text from page {page_num + 1}: {e}")
+        return doc.page_count, texts
@@ -0,0 +1,287 @@
+import asyncio
+import contextvars
+import logging
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from config.settings import get_settings
+from models.chat import Conversation, Message, MessageRole, ModelProvider
+from services.attachments import attachment_store
+from services.message_log import MESSAGE_OVERHEAD_TOKENS, TEXT_PART_TYPES, estimate_tokens, message_log
+from services.resilience import deadline
+from services.retrieval import DocumentChunkIndex
+
+logger = logging.getLogger(__name__)
+
+Summarizer = Callable[[str], Awaitable[str]]
+
+DOCUMENTS_HEADER = "Files the user uploaded in this conversation:"
+EXCERPTS_HEADER = '\n\nRelevant excerpts from the user\'s uploaded files:\n'
+
+class PromptAssembler:
+    """Build the LLM input for a turn within a per-model token budget.
+
+    The newest messages are kept verbatim, newest first, until the budget is
+    spent. Older messages are replaced by summaries of fixed-size blocks of
+    messages; each block is summarized once in the background and the
+    summary is cached and reused on later turns (a cheap extract stands in
+    until it is ready). Messages come from the conversation's incremental
+    message log, so a turn only builds entries for the summary and
+    attachments.
+
+    Short attachments are pasted verbatim where they fit. Long ones are
+    chunked into a per-conversation BM25 index, and only the chunks most
+    relevant to the current user message go in, attached to that message.
+
+    Parts that stay the same from turn to turn come first: uploaded files,
+    then the summary, then the message window. The parts that change each
+    turn come last. That keeps a long shared prefix that provider prompt
+    caches can reuse.
+    """
+
+    def __init__(self, resolve_attachment: Callable[[str], Optional[str]]):
+        self.settings = get_settings()
+        self.resolve_attachment = resolve_attachment
+        self._attachment_tokens: Dict[str, int] = {}
+        self._summaries: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._pending_summaries: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self._chunk_indexes: "OrderedDict[str, DocumentChunkIndex]" = OrderedDict()
+
+    def budget_for(self, model_name: str) -> int:
+        """Input token budget for a model (longest matching name prefix wins)"""
+        name = model_name.lower()
+        matches = [prefix for prefix in self.settings.prompt_token_budgets if name.startswith(prefix)]
+        if matches:
+            return self.settings.prompt_token_budgets[max(matches, key=len)]
+        return self.settings.prompt_token_budget
+
+    def _tokens_for_attachment(self, attachment_id: str, text: str) -> int:
+        tokens = self._attachment_tokens.get(attachment_id)
+        if tokens is None:
+            tokens = estimate_tokens(text)
+            self._attachment_tokens[attachment_id] = tokens
+        return tokens
+
+    def _long_attachments(self, conversation: Conversation) -> Dict[str, str]:
+        """Text of the conversation's attachments that are searched rather than pasted, oldest first"""
+        documents: Dict[str, str] = {}
+        if not self.settings.retrieval_enabled:
+            return documents
+        for _, attachment_id in message_log(conversation).attachments:
+            if attachment_id in documents:
+                continue
+            text = self.resolve_attachment(attachment_id)
+            if text and self._tokens_for_attachment(attachment_id, text) > self.settings.retrieval_full_text_tokens:
+                documents[attachment_id] = text
+        return documents
+
+    async def prepare(self, conversation: Conversation):
+        """Index the conversation's long attachments in a worker thread before ``assemble``.
+
+        The index is built from scratch off the event loop and swapped in,
+        so ``assemble`` only searches it. Without this call ``assemble``
+        indexes what is missing itself, on the calling thread.
+        """
+        documents = self._long_attachments(conversation)
+        index = self._chunk_indexes.get(conversation.id)
+        if not documents or (index is not None and all(d in index.document_chunks for d in documents)):
+            return
+        index = await asyncio.to_thread(self._build_index, documents)
+        self._cache_index(conversation.id, index)
+
+    def _build_index(self, documents: Dict[str, str]) -> DocumentChunkIndex:
+        index = DocumentChunkIndex(self.settings.retrieval_chunk_chars, self.settings.retrieval_chunk_overlap)
+        for document_id, text in documents.items():
+            index.add_document(document_id, text)
+        return index
+
+    def _cache_index(self, conversation_id: str, index: DocumentChunkIndex):
+        self._chunk_indexes[conversation_id] = index
+        self._chunk_indexes.move_to_end(conversation_id)
+        while len(self._chunk_indexes) > self.settings.retrieval_index_cache_size:
+            self._chunk_indexes.popitem(last=False)
+
+    def assemble(self, conversation: Conversation, model_name: str, provider: ModelProvider,
+                 summarizer: Optional[Summarizer] = None) -> List[Dict[str, Any]]:
+        """Build the provider-format input messages for the next turn"""
+        budget = self.budget_for(model_name)
+        messages = conversation.messages
+        log = message_log(conversation)
+        reserve = self.settings.prompt_summary_max_tokens
+
+        # Oldest start whose verbatim window fits, keeping the most recent messages regardless
+        total = log.cumulative[-1]
+        start = bisect_left(log.cumulative, total - (budget - reserve), 0, len(messages))
+        start = max(0, min(start, len(messages) - self.settings.prompt_min_recent_messages))
+        # Providers expect the window to open with a user turn
+        while start < len(messages) - 1 and messages[start].role != MessageRole.USER:
+            start += 1
+        used = total - log.cumulative[start]
+
+        remaining = budget - used
+        summary = self._summarize_prefix(conversation, start, summarizer) if start else ""
+        if summary:
+            remaining -= estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+
+        # Short attachments go in verbatim, newest first, only where they still fit;
+        # long ones (from anywhere in the conversation) are searched instead
+        documents: Dict[str, str] = {}
+        retrieved: Dict[str, str] = {}
+        for _, attachment_id in reversed(log.attachments):
+            if attachment_id in documents or attachment_id in retrieved:
+                continue
+            text = self.resolve_attachment(attachment_id)
+            if not text:
+                continue
+            tokens = self._tokens_for_attachment(attachment_id, text)
+            if self.settings.retrieval_enabled and tokens > self.settings.retrieval_full_text_tokens:
+                retrieved[attachment_id] = text
+                continue
+            if tokens <= remaining:
+                remaining -= tokens
+            elif remaining > 0:
+                text = text[:remaining * 4] + "\n[... file truncated to fit the context window]"
+                remaining = 0
+            else:
+                logger.debug(f"Attachment {attachment_id[:12]} does not fit in the context window")
+                continue
+            documents[attachment_id] = text
+
+        # Excerpts depend on the current question, so they go last, with it
+        excerpt_parts: Dict[int, List[Tuple[str, str]]] = {}
+        if retrieved and messages[-1].role == MessageRole.USER:
+            excerpts = self._retrieve(conversation.id, retrieved, messages[-1].content, remaining)
+            if excerpts:
+                remaining -= estimate_tokens(excerpts)
+                excerpt_parts[len(messages) - 1] = [(EXCERPTS_HEADER, excerpts)]
+
+        # Stable parts lead, so providers can reuse the cached prefix across turns:
+        # uploaded files (oldest first), then the history summary, then the messages
+        prefix = []
+        if documents:
+            prefix.append(self._documents_message(list(reversed(documents.values())), provider))
+        if summary:
+            prefix.append({"role": "system", "content": "Summary of the earlier conversation:\n" + summary})
+        assembled = log.window(start, provider, excerpt_parts)
+        assembled[:0] = prefix
+
+        logger.debug(
+            f"Assembled prompt for {conversation.id}: {len(messages) - start}/{len(messages)} messages verbatim, "
+            f"~{budget - remaining} of {budget} tokens"
+        )
+        return assembled
+
+    @staticmethod
+    def _documents_message(texts: List[str], provider: ModelProvider) -> Dict[str, Any]:
+        """System message carrying uploaded file text as content parts (the text is not copied)"""
+        part_type = TEXT_PART_TYPES[provider]
+        content = [{"type": part_type, "text": DOCUMENTS_HEADER}]
+        for number, text in enumerate(texts, start=1):
+            content.append({"type": part_type, "text": f"--- File {number} ---"})
+            content.append({"type": part_type, "text": text})
+        return {"role": "system", "content": content}
+
+    def _retrieve(self, conversation_id: str, documents: Dict[str, str], query: str, budget: int) -> str:
+        """Top chunks of the conversation's long attachments for ``query``, within ``budget`` tokens"""
+        index = self._chunk_indexes.get(conversation_id)
+        if index is None:
+            # Not prepared (or evicted since); index inline
+            index = self._build_index(documents)
+            self._cache_index(conversation_id, index)
+        else:
+            self._chunk_indexes.move_to_end(conversation_id)
+            for document_id, text in documents.items():
+                index.add_document(document_id, text)
+
+        excerpts, used = [], 0
+        for number, (_, chunk) in enumerate(index.search(query, self.settings.retrieval_top_k), start=1):
+            excerpt = f"[Excerpt {number}]\n{chunk}"
+            tokens = estimate_tokens(excerpt)
+            if used + tokens > budget:
+                break
+            excerpts.append(excerpt)
+            used += tokens
+        logger.debug(f"Retrieved {len(excerpts)} excerpts (~{used} tokens) for conversation {conversation_id}")
+        return "\n\n".join(excerpts)
+
+    def _summarize_prefix(self, conversation: Conversation, end: int,
+                          summarizer: Optional[Summarizer]) -> str:
+        """Summaries for messages[:end], built from cached per-block summaries"""
+        block_size = self.settings.prompt_summary_block_size
+        messages = conversation.messages
+        parts = []
+        for block_start in range(0, end, block_size):
+            block = messages[block_start:min(block_start + block_size, end)]
+            key = (conversation.id, block[0].id, block[-1].id)
+            summary = self._summaries.get(key)
+            if summary is None:
+                # Only complete blocks are summarized by the LLM; a partial
+                # trailing block would change (and be re-summarized) next turn.
+                if summarizer and len(block) == block_size:
+                    self._schedule_summary(key, block, summarizer)
+                summary = self._extract(block)
+            else:
+                self._summaries.move_to_end(key)
+            parts.append(summary)
+
+        # Keep the most recent block summaries that fit the summary budget
+        kept, tokens = [], 0
+        for part in reversed(parts):
+            tokens += estimate_tokens(part)
+            if tokens > self.settings.prompt_summary_max_tokens:
+                break
+            kept.append(part)
+        return "\n".join(reversed(kept))
+
+    @staticmethod
+    def _extract(block: List[Message], chars_per_message: int = 160) -> str:
+        """Cheap stand-in summary: the opening of each message"""
+        lines = []
+        for message in block:
+            text = " ".join(message.content.split())
+            if len(text) > chars_per_message:
+                text = text[:chars_per_message] + "..."
+            lines.append(f"- {message.role.value}: {text}")
+        return "\n".join(lines)
+
+    def _schedule_summary(self, key: Tuple[str, str, str], block: List[Message], summarizer: Summarizer):
+        """Summarize a block in the background, at most ``prompt_summary_max_pending`` at a time.
+
+        A block that is not scheduled keeps its extract and is offered again
+        on the conversation's next turn. The task starts from an empty
+        context, so it gets its own deadline and trace rather than those of
+        the request that scheduled it.
+        """
+        if key in self._pending_summaries:
+            return
+        if len(self._pending_summaries) >= self.settings.prompt_summary_max_pending:
+            logger.debug(f"Summary backlog full; deferring messages of conversation {key[0]}")
+            return
+        transcript = "\n\n".join(f"{m.role.value}: {m.content}" for m in block)
+
+        async def run():
+            try:
+                with deadline(self.settings.prompt_summary_timeout_seconds):
+                    summary = await summarizer(transcript)
+                self._summaries[key] = summary.strip()
+                while len(self._summaries) > self.settings.prompt_summary_cache_size:
+                    self._summaries.popitem(last=False)
+                logger.info(f"Cached summary for {len(block)} messages of conversation {key[0]}")
+            except Exception as e:
+                logger.warning(f"Failed to summarize messages of conversation {key[0]}: {e}")
+            finally:
+                if self._pending_summaries.get(key) is asyncio.current_task():
+                    del self._pending_summaries[key]
+
+        self._pending_summaries[key] = asyncio.create_task(run(), context=contextvars.Context())
+
+    def forget(self, conversation_id: str):
+        """Drop cached and pending summaries and the chunk index of a deleted conversation"""
+        self._chunk_indexes.pop(conversation_id, None)
+        for key in [k for k in self._summaries if k[0] == conversation_id]:
+            del self._summaries[key]
+        for key in [k for k in self._pending_summaries if k[0] == conversation_id]:
+            self._pending_summaries.pop(key).cancel()
+
+# Global prompt assembler instance
+prompt_assembler = PromptAssembler(resolve_attachment=attachment_store.get)
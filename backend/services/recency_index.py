@@ -0,0 +1,86 @@
+import bisect
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from models.chat import ConversationSummary
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _micros(moment: datetime) -> int:
+    # Exact integer microseconds; float timestamps lose precision.
+    return (moment.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+
+def encode_cursor(updated_at: datetime, conversation_id: str) -> str:
+    """Page cursor naming the last summary of the previous page"""
+    return f"{_micros(updated_at)}:{conversation_id}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """``(updated_at, conversation_id)`` of a page cursor; raises ``ValueError`` if malformed"""
+    try:
+        micros, conversation_id = cursor.split(":", 1)
+        return _EPOCH + timedelta(microseconds=int(micros)), conversation_id
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+class RecencyIndex:
+    """Conversation summaries kept sorted by ``updated_at`` (newest first).
+
+    Updates are a binary search plus a list insert/delete, and a page is a
+    slice of the sorted key list, so listing costs O(log n + page) instead of
+    re-sorting every conversation. Cursors name the last item of the previous
+    page, so pages stay stable while conversations are being updated.
+    """
+
+    def __init__(self):
+        # Ascending (-updated_at_us, id) == newest first
+        self._keys: List[Tuple[int, str]] = []
+        self._summaries: Dict[str, ConversationSummary] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _key(summary: ConversationSummary) -> Tuple[int, str]:
+        return -_micros(summary.updated_at), summary.id
+
+    def upsert(self, summary: ConversationSummary):
+        """Insert or move a conversation to its new position"""
+        self.remove(summary.id)
+        bisect.insort(self._keys, self._key(summary))
+        self._summaries[summary.id] = summary
+
+    def remove(self, conversation_id: str):
+        """Drop a conversation from the index"""
+        summary = self._summaries.pop(conversation_id, None)
+        if summary is None:
+            return
+        key = self._key(summary)
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+
+    def get(self, conversation_id: str) -> Optional[ConversationSummary]:
+        return self._summaries.get(conversation_id)
+
+    def page(self, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """Return up to ``limit`` summaries after ``cursor`` and the next cursor"""
+        start = 0
+        if cursor:
+            start = bisect.bisect_right(self._keys, self._decode_cursor(cursor))
+        keys = self._keys[start:start + limit]
+        items = [self._summaries[conversation_id] for _, conversation_id in keys]
+        next_cursor = None
+        if keys and start + limit < len(self._keys):
+            next_cursor = self._encode_cursor(keys[-1])
+        return items, next_cursor
+
+    @staticmethod
+    def _encode_cursor(key: Tuple[int, str]) -> str:
+        return f"{-key[0]}:{key[1]}"
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[int, str]:
+        updated_at, conversation_id = decode_cursor(cursor)
+        return -_micros(updated_at), conversation_id
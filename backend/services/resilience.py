@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import random
+import time
+from bisect import insort
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Set, TypeVar
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() deadline of the current request, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# SDK and aiohttp connection errors that carry no status code
+_TRANSIENT_ERROR_NAMES = {"APIConnectionError", "ClientConnectionError", "ClientPayloadError"}
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before a dependency answered; maps to HTTP 504"""
+
+class CircuitOpenError(Exception):
+    """A dependency is failing and calls to it are short-circuited; maps to HTTP 503"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable")
+        self.retry_after = retry_after
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bound everything awaited inside the block to ``seconds`` from now.
+
+    Nested deadlines can only shorten the outer one. ``None`` or 0 leaves
+    the current deadline unchanged.
+    """
+    current = _deadline.get()
+    if seconds:
+        at = time.monotonic() + seconds
+        current = at if current is None else min(current, at)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or ``None`` without one"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an error is worth retrying and counts against a dependency's health.
+
+    Timeouts, connection errors, 429s and 5xx responses are; client errors
+    such as a bad request or an unknown model are not.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in _TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    # openai / anthropic status errors have status_code; tritonclient has status()
+    status = getattr(error, "status_code", None)
+    if status is None and callable(getattr(error, "status", None)):
+        status = error.status()
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return False
+    return status == 429 or status >= 500
+
+class DeadlineMiddleware:
+    """Give each HTTP request a deadline that dependency calls inherit.
+
+    Clients can ask for a shorter one with an ``X-Request-Timeout`` header
+    (seconds); it cannot exceed ``default_timeout`` when that is set.
+    Requests to ``exclude_paths`` get no request-wide deadline; they set
+    their own (e.g. one per batch item).
+    """
+
+    def __init__(self, app: ASGIApp, default_timeout: float = 0.0, exclude_paths: Sequence[str] = ()):
+        self.app = app
+        self.default_timeout = default_timeout
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        timeout = self.default_timeout
+        requested = dict(scope["headers"]).get(b"x-request-timeout")
+        if requested:
+            try:
+                requested_timeout = float(requested)
+            except ValueError:
+                requested_timeout = 0.0
+            if requested_timeout > 0:
+                timeout = min(timeout, requested_timeout) if timeout else requested_timeout
+        with deadline(timeout):
+            await self.app(scope, receive, send)
+
+class LatencyTracker:
+    """Recent successful call latencies, for picking hedge delays"""
+
+    def __init__(self, window: int = 512):
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._sorted: List[float] = []
+
+    def record(self, seconds: float):
+        if len(self._recent) == self._recent.maxlen:
+            self._sorted.remove(self._recent[0])
+        self._recent.append(seconds)
+        insort(self._sorted, seconds)
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self._sorted:
+            return None
+        index = min(len(self._sorted) - 1, int(len(self._sorted) * percent / 100))
+        return self._sorted[index]
+
+class RetryBudget:
+    """Cap retries and hedges to a fraction of recent traffic.
+
+    Every call deposits ``ratio`` tokens and every retry or hedge withdraws
+    one, so extra load on a struggling dependency stays around ``ratio`` of
+    the normal load. ``min_tokens`` lets low-traffic services retry at all.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max(max_tokens, min_tokens)
+        self.tokens = min_tokens
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        self.exhausted += 1
+        return False
+
+class CircuitBreaker:
+    """Fail fast while a dependency is unhealthy.
+
+    ``failure_threshold`` consecutive transient failures open the circuit.
+    While it is open, calls raise ``CircuitOpenError`` at once. After
+    ``reset_seconds`` one probe call is let through (half-open): success
+    closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened = 0
+        self.short_circuited = 0
+
+    def before_call(self):
+        """Raise ``CircuitOpenError`` unless a call may go ahead"""
+        if self.state == self.CLOSED:
+            return
+        wait = self.opened_at + self.reset_seconds - time.monotonic()
+        if self.state == self.OPEN and wait <= 0:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self.probing:
+            self.probing = True
+            return
+        self.short_circuited += 1
+        raise CircuitOpenError(self.name, max(wait, 1.0))
+
+    def record(self, success: bool):
+        self.probing = False
+        if success:
+            if self.state != self.CLOSED:
+                logger.info(f"✅ {self.name} recovered; circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+                logger.warning(f"⚠️ {self.name} failing; circuit open for {self.reset_seconds:.0f}s")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """The call ended without telling us anything about the dependency"""
+        self.probing = False
+
+class ResiliencePolicy:
+    """Deadlines, hedging, retries and a circuit breaker around one dependency.
+
+    ``call(fn)`` runs ``fn()`` (a coroutine factory; it may run more than
+    once, so it must be safe to repeat) as follows:
+
+    * each attempt is bounded by ``attempt_timeout`` and by the request
+      deadline; running out of the deadline raises ``DeadlineExceeded``
+    * once ``min_samples`` latencies are known, an attempt still running
+      after the ``hedge_percentile`` latency gets a backup call, and the
+      first success wins; the other call is cancelled
+    * transient failures are retried up to ``max_attempts`` times in all,
+      after a jittered exponential backoff
+    * hedges and retries both draw on a shared ``RetryBudget``, and every
+      attempt outcome feeds the ``CircuitBreaker``
+    """
+
+    def __init__(self, name: str, max_attempts: int = 2, attempt_timeout: Optional[float] = None,
+                 hedge_percentile: float = 95.0, min_samples: int = 20,
+                 backoff_base: float = 0.1, backoff_max: float = 2.0,
+                 budget: Optional[RetryBudget] = None, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.attempt_timeout = attempt_timeout or None
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long an attempt may run before it is hedged, if hedging is on"""
+        if not self.hedge_percentile or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            self.breaker.before_call()
+            left = remaining()
+            if left is not None and left <= 0:
+                self.breaker.abandon()
+                self.deadline_exceeded += 1
+                raise DeadlineExceeded(f"Deadline exceeded before calling {self.name}")
+            # Whichever is sooner: the attempt timeout or the request deadline
+            deadline_bound = left is not None and (self.attempt_timeout is None or left < self.attempt_timeout)
+            timeout = left if deadline_bound else self.attempt_timeout
+
+            try:
+                result = await self._attempt(fn, timeout)
+            except asyncio.TimeoutError as e:
+                if deadline_bound:
+                    # The request ran out of time, not the dependency
+                    self.breaker.abandon()
+                    self.deadline_exceeded += 1
+                    raise DeadlineExceeded(f"Deadline exceeded waiting for {self.name}") from e
+                error = e
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.abandon()
+                    raise
+                error = e
+            else:
+                self.breaker.record(True)
+                return result
+
+            self.breaker.record(False)
+            if attempt >= self.max_attempts or not self.budget.withdraw():
+                raise error
+            backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            left = remaining()
+            if left is not None and backoff >= left:
+                # No time left for another attempt
+                self.deadline_exceeded += 1
+                raise DeadlineExceeded(f"Deadline exceeded retrying {self.name}") from error
+            logger.warning(f"{self.name} attempt {attempt} failed ({error!r}); retrying in {backoff:.2f}s")
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(backoff)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], timeout: Optional[float]) -> T:
+        """One attempt, hedged when it runs long; raises ``asyncio.TimeoutError`` after ``timeout``"""
+        started = time.monotonic()
+        primary = asyncio.ensure_future(fn())
+        tasks: Set[asyncio.Future] = {primary}
+        starts: Dict[asyncio.Future, float] = {primary: started}
+        try:
+            delay = self.hedge_delay()
+            if delay is not None and (timeout is None or delay < timeout):
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self.budget.withdraw():
+                    self.hedges += 1
+                    backup = asyncio.ensure_future(fn())
+                    tasks.add(backup)
+                    starts[backup] = time.monotonic()
+
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                wait = None if timeout is None else timeout - (time.monotonic() - started)
+                if wait is not None and wait <= 0:
+                    raise asyncio.TimeoutError()
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        self.latency.record(time.monotonic() - starts[task])
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    # Retrieve the loser's outcome so it is not logged as unhandled
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        """Resilience counters for monitoring"""
+        p50 = self.latency.percentile(50)
+        delay = self.hedge_delay()
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded,
+            "retry_budget_tokens": round(self.budget.tokens, 2),
+            "retry_budget_exhausted": self.budget.exhausted,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "short_circuited": self.breaker.short_circuited,
+            "latency_p50_seconds": round(p50, 3) if p50 is not None else None,
+            "hedge_delay_seconds": round(delay, 3) if delay is not None else None,
+        }
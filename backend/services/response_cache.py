@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _Entry:
+    response: str
+    size: int
+    latency: float
+    expires_at: float
+
+class ResponseCache:
+    """TTL + LRU cache for LLM responses with single-flight loading.
+
+    Entries are keyed on a SHA-256 of the provider, model, generation
+    parameters and the normalized messages. Concurrent misses for the same
+    key share one upstream call. That call runs as its own task and callers
+    await it shielded. A client that disconnects therefore does not cancel
+    the call for the others, and its retry finds the finished response.
+    Failed calls are not cached.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[float, asyncio.Task]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.inflight_joins = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.saved_latency = 0.0
+
+    @staticmethod
+    def make_key(provider: str, model_name: str, params: Dict[str, Any], messages: List[Dict[str, Any]]) -> str:
+        """Stable hash of a request; message content is reduced to its role and text"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([provider, model_name, params], sort_keys=True, separators=(",", ":")).encode())
+        for msg in messages:
+            content = msg["content"]
+            texts = [content] if isinstance(content, str) else [part["text"] for part in content]
+            digest.update(b"\x1e" + msg["role"].encode())
+            for text in texts:
+                digest.update(b"\x1f" + text.encode())
+        return digest.hexdigest()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[str]]) -> str:
+        """Return the cached response for ``key`` or load it once"""
+        entry = self._get_entry(key)
+        if entry:
+            self.hits += 1
+            self.saved_latency += entry.latency
+            return entry.response
+
+        inflight = self._inflight.get(key)
+        if inflight:
+            started_at, task = inflight
+            self.inflight_joins += 1
+            # The upstream call had been running this long before the join
+            self.saved_latency += time.monotonic() - started_at
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._load(key, loader))
+        # Mark the error retrieved so a failure whose callers all went away
+        # is not reported as "never retrieved".
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = (time.monotonic(), task)
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[str]]) -> str:
+        started = time.monotonic()
+        try:
+            response = await loader()
+        finally:
+            del self._inflight[key]
+        self._put(key, response, time.monotonic() - started)
+        return response
+
+    def _get_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: str, response: str, latency: float):
+        size = len(response.encode())
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = _Entry(response=response, size=size, latency=latency,
+                                    expires_at=time.monotonic() + self.ttl)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses + self.inflight_joins
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight_joins": self.inflight_joins,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.hits + self.inflight_joins) / lookups, 4) if lookups else 0.0,
+            "saved_latency_seconds": round(self.saved_latency, 3),
+        }
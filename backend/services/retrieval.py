@@ -0,0 +1,149 @@
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i in is it its me my of on or our so "
+    "than that the their them then there these they this to was we were what when where which "
+    "who why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms without common stopwords"""
+    return [term for term in _TOKEN_RE.findall(text.lower()) if term not in STOPWORDS]
+
+def chunk_text(text: str, chunk_chars: int = 1500, overlap_chars: int = 200) -> List[str]:
+    """Split text into overlapping chunks of about ``chunk_chars`` characters.
+
+    Chunk boundaries are moved back to the nearest whitespace so words are not
+    cut in half; consecutive chunks share about ``overlap_chars`` characters.
+    """
+    text = text.strip()
+    if len(text) <= chunk_chars:
+        return [text] if text else []
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + chunk_chars // 2, end)
+            if cut != -1:
+                end = cut
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        next_start = max(end - overlap_chars, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return [chunk for chunk in chunks if chunk]
+
+class BM25Index:
+    """In-memory BM25 inverted index over text chunks.
+
+    Postings are appended as chunks are added. On the first search after a
+    change they are frozen into NumPy arrays. A query then scores every
+    matching chunk with one vectorized update per query term.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[str] = []
+        self._vocab: Dict[str, int] = {}
+        self._postings: List[Tuple[List[int], List[int]]] = []
+        self._lengths: List[int] = []
+        self._frozen: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None
+        self._length_array: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, chunks: List[str]) -> range:
+        """Index chunks; returns their ids"""
+        first = len(self.chunks)
+        for chunk in chunks:
+            chunk_id = len(self.chunks)
+            terms = tokenize(chunk)
+            for term, tf in Counter(terms).items():
+                term_id = self._vocab.setdefault(term, len(self._postings))
+                if term_id == len(self._postings):
+                    self._postings.append(([], []))
+                ids, tfs = self._postings[term_id]
+                ids.append(chunk_id)
+                tfs.append(tf)
+            self.chunks.append(chunk)
+            self._lengths.append(len(terms))
+        self._frozen = None
+        return range(first, len(self.chunks))
+
+    def _freeze(self):
+        self._frozen = {}
+        self._length_array = np.asarray(self._lengths, dtype=np.float32)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top ``k`` ``(chunk_id, score)`` pairs for the query, best first; only chunks scoring above zero"""
+        if not self.chunks:
+            return []
+        if self._frozen is None:
+            self._freeze()
+        term_ids = {self._vocab[term] for term in tokenize(query) if term in self._vocab}
+        if not term_ids:
+            return []
+
+        n = len(self.chunks)
+        lengths = self._length_array
+        avg_length = max(float(lengths.mean()), 1.0)
+        scores = np.zeros(n, dtype=np.float32)
+        for term_id in term_ids:
+            postings = self._frozen.get(term_id)
+            if postings is None:
+                ids, tfs = self._postings[term_id]
+                postings = (np.asarray(ids, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+                self._frozen[term_id] = postings
+            ids, tfs = postings
+            idf = math.log(1.0 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[ids] / avg_length)
+            scores[ids] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(chunk_id), float(scores[chunk_id])) for chunk_id in top if scores[chunk_id] > 0]
+
+class DocumentChunkIndex:
+    """BM25 index over the attachments of one conversation"""
+
+    def __init__(self, chunk_chars: int, overlap_chars: int):
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+        self.index = BM25Index()
+        self.chunk_documents: List[str] = []
+        self.document_chunks: Dict[str, range] = {}
+
+    def add_document(self, document_id: str, text: str):
+        if document_id in self.document_chunks:
+            return
+        chunk_ids = self.index.add(chunk_text(text, self.chunk_chars, self.overlap_chars))
+        self.document_chunks[document_id] = chunk_ids
+        self.chunk_documents.extend([document_id] * len(chunk_ids))
+        logger.debug(f"Indexed document {document_id[:12]} as {len(chunk_ids)} chunks")
+
+    def search(self, query: str, k: int) -> List[Tuple[str, str]]:
+        """Top ``k`` ``(document_id, chunk)`` pairs for the query.
+
+        If nothing matches (e.g. "summarize this"), the opening chunk of each
+        document is returned instead, newest document first.
+        """
+        hits = self.index.search(query, k)
+        if hits:
+            return [(self.chunk_documents[chunk_id], self.index.chunks[chunk_id]) for chunk_id, _ in hits]
+        openings = [(document_id, self.index.chunks[chunk_ids[0]])
+                    for document_id, chunk_ids in reversed(self.document_chunks.items()) if chunk_ids]
+        return openings[:k]
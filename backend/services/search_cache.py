@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+
+@dataclass
+class _Entry:
+    k: int
+    results: List[Dict[str, Any]]
+    size: int
+    expires_at: float
+
+    def covers(self, k: int) -> bool:
+        # A larger-k entry serves any smaller k; a short result list means the
+        # backend had nothing more to return, so it also serves larger k.
+        return k <= self.k or len(self.results) < self.k
+
+class SearchCache:
+    """TTL + LRU cache for job search results with in-flight de-duplication.
+
+    Entries are keyed on the normalized query text and the canonical JSON of
+    the Elasticsearch query; the entry remembers the ``k`` it was fetched
+    with and serves smaller ``k`` by slicing. Concurrent misses for the same
+    key share one in-flight load. The load runs as its own task and callers
+    await it shielded, so a caller that is cancelled does not cancel it for
+    the others.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._inflight: Dict[CacheKey, Tuple[int, asyncio.Task]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.inflight_joins = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(query: str, es_query: Optional[Dict[str, Any]]) -> CacheKey:
+        normalized_query = " ".join(query.lower().split())
+        canonical_es_query = json.dumps(es_query, sort_keys=True, separators=(",", ":"))
+        return normalized_query, canonical_es_query
+
+    async def get_or_load(self, query: str, k: int, es_query: Optional[Dict[str, Any]],
+                          loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """Return cached results for ``(query, es_query, k)`` or load them once"""
+        key = self.make_key(query, es_query)
+
+        entry = self._get_entry(key)
+        if entry and entry.covers(k):
+            self.hits += 1
+            return entry.results[:k]
+
+        inflight = self._inflight.get(key)
+        if inflight and inflight[0] >= k:
+            self.inflight_joins += 1
+            results = await asyncio.shield(inflight[1])
+            return results[:k]
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._load(key, k, loader))
+        # Mark the error retrieved so a failure whose callers all went away
+        # is not reported as "never retrieved".
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = (k, task)
+        return await asyncio.shield(task)
+
+    async def _load(self, key: CacheKey, k: int,
+                    loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        try:
+            results = await loader()
+        finally:
+            # A load for a larger k may have taken the slot meanwhile
+            if self._inflight.get(key, (None, None))[1] is asyncio.current_task():
+                del self._inflight[key]
+        self._put(key, k, results)
+        return results
+
+    def _get_entry(self, key: CacheKey) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: CacheKey, k: int, results: List[Dict[str, Any]]):
+        existing = self._get_entry(key)
+        if existing and existing.k > k and existing.covers(k):
+            return
+
+        size = len(json.dumps(results))
+        if size > self.max_bytes:
+            return
+        if existing:
+            self._remove(key)
+
+        self._entries[key] = _Entry(k=k, results=results, size=size, expires_at=time.monotonic() + self.ttl)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses + self.inflight_joins
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight_joins": self.inflight_joins,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.hits + self.inflight_joins) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,224 @@
+import asyncio
+import importlib
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import numpy as np
+
+from config.settings import get_settings
+from services.batching import MicroBatcher
+from services.metrics import metrics
+from services.resilience import CircuitBreaker, ResiliencePolicy, RetryBudget
+from services.search_cache import SearchCache
+from services.tracing import tracer
+
+if TYPE_CHECKING:
+    import tritonclient.http.aio as httpclient
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INFER_SECONDS = metrics.histogram(
+    "search_infer_seconds", "Latency of one Triton infer call (one batch of searches)", ["outcome"]
+)
+SEARCH_BATCH_SIZE = metrics.histogram(
+    "search_infer_batch_size", "Searches per Triton infer call", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+SEARCH_RESULTS = metrics.histogram(
+    "search_results", "Results returned per search", buckets=(0, 1, 5, 10, 20, 50, 100)
+)
+
+class Searcher:
+    """Async client for the Triton ``searcher`` ensemble.
+
+    A single pooled connection is shared by the agent tool and the
+    ``/search`` router. The underlying aiohttp session must be created on the
+    running event loop, so the application lifespan calls ``start()`` and
+    ``close()``, or ``warm_up()`` to connect in the background while the app
+    already serves requests. ``tritonclient`` is imported on connect, in a
+    worker thread. Without an endpoint the app runs with search unavailable.
+
+    When ``max_batch_size`` > 1, concurrent searches are coalesced by a
+    ``MicroBatcher`` into a single ``[N, 1]`` / ``[N]`` infer call (the
+    ensemble must be deployed with dynamic batching enabled). An optional
+    ``SearchCache`` sits in front of ``search()``. Infer calls go through an
+    optional ``ResiliencePolicy``, so a slow or failing server gets hedged,
+    retried or short-circuited instead of hanging the caller.
+    """
+
+    def __init__(self, url: str, model_name: str = "searcher", conn_limit: int = 32, timeout: float = 30.0,
+                 max_batch_size: int = 1, batch_window_ms: float = 5.0, cache: Optional[SearchCache] = None,
+                 resilience: Optional[ResiliencePolicy] = None):
+        self.url = url
+        self.model_name = model_name
+        self.conn_limit = conn_limit
+        self.timeout = timeout
+        self.client: Optional["httpclient.InferenceServerClient"] = None
+        self.cache = cache
+        self.resilience = resilience
+        self._starting: Optional[asyncio.Task] = None
+        self.batcher: Optional[MicroBatcher] = None
+        if max_batch_size > 1:
+            self.batcher = MicroBatcher(
+                self._infer_batch_items,
+                max_batch_size=max_batch_size,
+                window_ms=batch_window_ms,
+                name="triton-search"
+            )
+
+    @property
+    def configured(self) -> bool:
+        """Whether a Triton endpoint is configured"""
+        return bool(self.url)
+
+    async def start(self):
+        """Open the pooled connection to the inference server"""
+        if not self.url:
+            logger.warning("⚠️ No Triton endpoint configured - job search is unavailable")
+            return
+        httpclient = await asyncio.to_thread(importlib.import_module, "tritonclient.http.aio")
+        self.client = httpclient.InferenceServerClient(
+            url=self.url,
+            conn_limit=self.conn_limit,
+            conn_timeout=self.timeout
+        )
+        logger.info(f"Triton search client connected to {self.url} (conn_limit={self.conn_limit})")
+
+    def warm_up(self):
+        """Connect in the background; searches issued meanwhile wait for it"""
+        if self._starting is None:
+            self._starting = asyncio.create_task(self.start())
+            self._starting.add_done_callback(self._log_start_failure)
+
+    @staticmethod
+    def _log_start_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"❌ Failed to start Triton search client: {task.exception()}")
+
+    async def close(self):
+        """Finish batched searches in flight and close the pooled connection"""
+        if self._starting and not self._starting.done():
+            self._starting.cancel()
+        self._starting = None
+        if self.batcher:
+            await self.batcher.close()
+        if self.client:
+            await self.client.close()
+            self.client = None
+
+    async def infer_batch(self, queries: List[str], ks: List[int],
+                          es_queries: List[Optional[Dict[str, Any]]]) -> List[np.ndarray]:
+        """Run N searches in one infer call and return each caller's raw ``Responses`` row"""
+        if not self.client and self._starting:
+            await asyncio.wait({self._starting})
+        if not self.client:
+            raise RuntimeError("Triton search client not initialized")
+        from tritonclient.http.aio import InferInput
+
+        batch_size = len(queries)
+        inputs = [
+            InferInput("Query", [batch_size, 1], "BYTES"),
+            InferInput("ElasticsearchQuery", [batch_size], "BYTES"),
+            InferInput("K", [batch_size], "INT32")
+        ]
+
+        inputs[0].set_data_from_numpy(np.asarray([[query] for query in queries], dtype=object))
+        inputs[1].set_data_from_numpy(np.array([json.dumps(es_query).encode('utf-8') for es_query in es_queries], dtype=object))
+        inputs[2].set_data_from_numpy(np.array(ks, dtype=np.int32))
+
+        start = time.perf_counter()
+        try:
+            response = await self.client.infer(model_name=self.model_name, inputs=inputs)
+        except BaseException:
+            SEARCH_INFER_SECONDS.labels("error").observe(time.perf_counter() - start)
+            raise
+        SEARCH_INFER_SECONDS.labels("ok").observe(time.perf_counter() - start)
+        SEARCH_BATCH_SIZE.observe(batch_size)
+        responses = response.as_numpy('Responses')
+        if responses is None:
+            raise ValueError("Inference server did not return 'Responses' output")
+
+        # A single query comes back as a flat [k] array; batches as [N, max_k]
+        # rows padded with empty strings.
+        if responses.ndim == 1:
+            rows = [responses]
+        else:
+            rows = [np.array([f for f in row if len(f)], dtype=object) for row in responses]
+        if len(rows) != batch_size:
+            raise ValueError(f"Expected {batch_size} result rows from inference server, got {len(rows)}")
+        results = [row[:k] for row, k in zip(rows, ks)]
+        for row in results:
+            SEARCH_RESULTS.observe(len(row))
+        return results
+
+    async def _infer_batch_items(self, items: List[tuple]) -> List[np.ndarray]:
+        queries, ks, es_queries = zip(*items)
+        return await self.infer_batch(list(queries), list(ks), list(es_queries))
+
+    async def infer(self, query: str, k: int, es_query: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """Run one search and return the raw ``Responses`` output"""
+        with tracer.span("triton.infer", k=k):
+            if self.resilience:
+                return await self.resilience.call(lambda: self._infer(query, k, es_query))
+            return await self._infer(query, k, es_query)
+
+    async def _infer(self, query: str, k: int, es_query: Optional[Dict[str, Any]]) -> np.ndarray:
+        if self.batcher:
+            return await self.batcher.submit((query, k, es_query))
+        rows = await self.infer_batch([query], [k], [es_query])
+        return rows[0]
+
+    async def search(self, query: str, k: int, es_query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Search for jobs and decode each result"""
+        es_query = es_query if es_query is not None else {}
+        with tracer.span("search", k=k):
+            if self.cache:
+                return await self.cache.get_or_load(query, k, es_query, lambda: self._search(query, k, es_query))
+            return await self._search(query, k, es_query)
+
+    async def _search(self, query: str, k: int, es_query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        responses = await self.infer(query=query, k=k, es_query=es_query)
+        results = [json.loads(f) for f in responses]
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Search client counters for monitoring"""
+        return {
+            "batching": self.batcher.stats() if self.batcher else None,
+            "cache": self.cache.stats() if self.cache else None,
+            "resilience": self.resilience.stats() if self.resilience else None
+        }
+
+def _create_searcher() -> Searcher:
+    settings = get_settings()
+    cache = None
+    if settings.search_cache_max_entries > 0:
+        cache = SearchCache(
+            ttl_seconds=settings.search_cache_ttl_seconds,
+            max_entries=settings.search_cache_max_entries,
+            max_bytes=settings.search_cache_max_bytes
+        )
+    return Searcher(
+        url=settings.triton_endpoint,
+        model_name=settings.triton_model_name,
+        conn_limit=settings.triton_conn_limit,
+        timeout=settings.triton_timeout,
+        max_batch_size=settings.search_batch_max_size,
+        batch_window_ms=settings.search_batch_window_ms,
+        cache=cache,
+        resilience=ResiliencePolicy(
+            name="triton-search",
+            max_attempts=settings.search_max_attempts,
+            attempt_timeout=settings.search_attempt_timeout_seconds,
+            hedge_percentile=settings.search_hedge_percentile,
+            budget=RetryBudget(ratio=settings.retry_budget_ratio),
+            breaker=CircuitBreaker(
+                "triton-search",
+                failure_threshold=settings.circuit_failure_threshold,
+                reset_seconds=settings.circuit_reset_seconds
+            )
+        )
+    )
+
+# Global instance
+SEARCHER = _create_searcher()
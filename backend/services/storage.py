@@ -0,0 +1,583 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from config.settings import Settings
+from models.chat import Conversation, ConversationSummary, Message, MessageRole, ModelProvider
+from services.recency_index import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+class ConversationStore:
+    """Storage backend interface used behind ConversationManager.
+
+    Writes may be applied asynchronously, but reads always see them;
+    ``flush()`` blocks until every write issued so far is durable. Reads may
+    touch disk, so async callers run them in a worker thread.
+    """
+
+    # Whether conversations survive a restart (and may be evicted from the
+    # manager's in-memory cache)
+    persistent = False
+
+    def start(self):
+        """Open the backend"""
+
+    def close(self):
+        """Flush pending writes and release resources"""
+
+    def flush(self):
+        """Wait until all pending writes have been applied"""
+
+    def save_conversation(self, conversation: Conversation):
+        """Insert or update conversation metadata (not its messages)"""
+
+    def append_message(self, conversation_id: str, message: Message):
+        """Append a message to a conversation"""
+
+    def delete_conversation(self, conversation_id: str):
+        """Delete a conversation and its messages"""
+
+    def load_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Load a conversation with its messages"""
+        return None
+
+    def list_conversations(self) -> List[Conversation]:
+        """Load all conversations with their messages"""
+        return []
+
+    def list_summaries(self) -> List[ConversationSummary]:
+        """Load summaries (with message counts) of all conversations"""
+        return []
+
+    def stored_updated_at(self, conversation_id: str) -> Optional[datetime]:
+        """``updated_at`` of the stored conversation, or ``None`` if it is not stored"""
+        return None
+
+    def page_summaries(self, cursor: Optional[str] = None,
+                       limit: int = 50) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """A page of summaries, most recently updated first, and the next cursor"""
+        return [], None
+
+    def save_attachment(self, attachment_id: str, content: str):
+        """Store attachment text under its content hash (idempotent)"""
+
+    def load_attachment(self, attachment_id: str) -> Optional[str]:
+        """Load attachment text by content hash"""
+        return None
+
+    def message_bytes(self) -> int:
+        """Total UTF-8 size of all stored message contents"""
+        return 0
+
+class InMemoryConversationStore(ConversationStore):
+    """No-op backend: the manager's in-memory dict is the only copy"""
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite (WAL mode) backend with write-behind batching.
+
+    ``save_conversation``/``append_message``/``delete_conversation`` only
+    enqueue work; a writer thread drains the queue and applies each batch in
+    a single transaction, so callers never wait on fsync. A batch that fails
+    (e.g. the database is locked or the disk is full) is retried with
+    backoff until it commits. Messages are append-only rows.
+
+    Queued writes are also kept in an in-memory overlay until the writer has
+    committed them, and reads merge it over what SQLite returns, so a read
+    never waits for the writer. The overlay is snapshotted before querying:
+    a write missing from the snapshot was committed before the query ran.
+    """
+
+    persistent = True
+
+    # Backoff between attempts to write a batch that failed
+    RETRY_INITIAL_SECONDS = 0.1
+    RETRY_MAX_SECONDS = 5.0
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            model_provider TEXT NOT NULL,
+            model_name TEXT NOT NULL,
+            attachment_ids TEXT NOT NULL DEFAULT '[]'
+        );
+        CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at);
+        CREATE TABLE IF NOT EXISTS messages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            conversation_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            model_used TEXT,
+            attachment_id TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, seq);
+        CREATE TABLE IF NOT EXISTS attachments (
+            id TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval_ms: float = 50.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+        # Overlay of queued writes, keyed like the tables; entries are dropped
+        # by the writer once committed (if not superseded meanwhile)
+        self._pending_lock = threading.Lock()
+        self._pending_conversations: Dict[str, tuple] = {}
+        self._pending_messages: Dict[str, Dict[str, tuple]] = {}
+        self._pending_attachments: Dict[str, tuple] = {}
+        self._pending_deletes: Dict[str, tuple] = {}
+        self.batches_written = 0
+        self.ops_written = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start(self):
+        if self._writer:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        conn.close()
+        self._read_conn = self._connect()
+        self._writer = threading.Thread(target=self._run_writer, name="conversation-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"SQLite conversation store opened at {self.path}")
+
+    def close(self):
+        if not self._writer:
+            return
+        self._queue.put(("stop", None))
+        self._writer.join()
+        self._writer = None
+        if self._read_conn:
+            self._read_conn.close()
+            self._read_conn = None
+        logger.info(f"SQLite conversation store closed ({self.ops_written} writes in {self.batches_written} batches)")
+
+    def flush(self):
+        if not self._writer:
+            return
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def save_conversation(self, conversation: Conversation):
+        row = (
+            conversation.id,
+            conversation.title,
+            conversation.created_at.isoformat(),
+            conversation.updated_at.isoformat(),
+            conversation.model_provider.value,
+            conversation.model_name,
+            json.dumps(conversation.attachment_ids)
+        )
+        with self._pending_lock:
+            self._pending_conversations[conversation.id] = row
+        self._queue.put(("conversation", row))
+
+    def append_message(self, conversation_id: str, message: Message):
+        row = (
+            message.id,
+            conversation_id,
+            message.role.value,
+            message.content,
+            message.timestamp.isoformat(),
+            message.model_used,
+            message.attachment_id
+        )
+        with self._pending_lock:
+            self._pending_messages.setdefault(conversation_id, {})[message.id] = row
+        self._queue.put(("message", row))
+
+    def delete_conversation(self, conversation_id: str):
+        # A tuple, so the writer can tell this delete from a later one by identity
+        marker = (conversation_id,)
+        with self._pending_lock:
+            self._pending_conversations.pop(conversation_id, None)
+            self._pending_messages.pop(conversation_id, None)
+            self._pending_deletes[conversation_id] = marker
+        self._queue.put(("delete", marker))
+
+    def save_attachment(self, attachment_id: str, content: str):
+        row = (attachment_id, content, datetime.now().isoformat())
+        with self._pending_lock:
+            self._pending_attachments[attachment_id] = row
+        self._queue.put(("attachment", row))
+
+    def _settle(self, writes: List[Tuple[str, tuple]]):
+        """Drop committed (or failed) writes from the overlay"""
+        with self._pending_lock:
+            for op, payload in writes:
+                if op == "conversation":
+                    pending = self._pending_conversations
+                    if pending.get(payload[0]) is payload:
+                        del pending[payload[0]]
+                elif op == "message":
+                    messages = self._pending_messages.get(payload[1])
+                    if messages and messages.get(payload[0]) is payload:
+                        del messages[payload[0]]
+                        if not messages:
+                            del self._pending_messages[payload[1]]
+                elif op == "attachment":
+                    if self._pending_attachments.get(payload[0]) is payload:
+                        del self._pending_attachments[payload[0]]
+                elif op == "delete":
+                    if self._pending_deletes.get(payload[0]) is payload:
+                        del self._pending_deletes[payload[0]]
+
+    def _pending(self, conversation_id: str) -> Tuple[Optional[tuple], List[tuple], bool]:
+        """Snapshot the overlay for one conversation: (row, message rows, deleted)"""
+        with self._pending_lock:
+            return (
+                self._pending_conversations.get(conversation_id),
+                list(self._pending_messages.get(conversation_id, {}).values()),
+                conversation_id in self._pending_deletes
+            )
+
+    @contextmanager
+    def _reading(self):
+        """Read connection with one snapshot for every query in the block"""
+        with self._read_lock:
+            self._read_conn.execute("BEGIN")
+            try:
+                yield self._read_conn
+            finally:
+                self._read_conn.execute("COMMIT")
+
+    @staticmethod
+    def _unwritten(conn: sqlite3.Connection, message_rows: List[tuple]) -> List[tuple]:
+        """The queued message rows that SQLite does not have yet"""
+        ids = [row[0] for row in message_rows]
+        written = set()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            written.update(message_id for (message_id,) in conn.execute(
+                f"SELECT id FROM messages WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return [row for row in message_rows if row[0] not in written]
+
+    def _run_writer(self):
+        conn = self._connect()
+        stopping = False
+        # Writes of a failed batch stay in the overlay and are retried, ahead
+        # of newer ones, with exponential backoff; flushes wait for them
+        writes: List[Tuple[str, object]] = []
+        waiters = []
+        delay = 0.0
+        while not stopping:
+            batch = [self._queue.get()] if not writes else []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not (batch and batch[-1][0] in ("flush", "stop")):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            for op, payload in batch:
+                if op == "flush":
+                    waiters.append(payload)
+                elif op == "stop":
+                    stopping = True
+                else:
+                    writes.append((op, payload))
+
+            if writes:
+                try:
+                    self._apply(conn, writes)
+                except Exception as e:
+                    if not stopping:
+                        delay = min(delay * 2 or self.RETRY_INITIAL_SECONDS, self.RETRY_MAX_SECONDS)
+                        logger.error(f"Failed to write batch of {len(writes)} conversation updates, "
+                                     f"retrying in {delay:.1f}s: {e}")
+                        time.sleep(delay)
+                        continue
+                    logger.error(f"❌ Dropping {len(writes)} conversation updates on close: {e}")
+                delay = 0.0
+                self._settle(writes)
+                writes = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+        conn.close()
+
+    def _apply(self, conn: sqlite3.Connection, writes: List[Tuple[str, object]]):
+        conn.execute("BEGIN")
+        try:
+            for op, payload in writes:
+                if op == "conversation":
+                    conn.execute(
+                        "INSERT INTO conversations (id, title, created_at, updated_at, model_provider, model_name, attachment_ids) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET title=excluded.title, updated_at=excluded.updated_at, "
+                        "model_provider=excluded.model_provider, model_name=excluded.model_name, "
+                        "attachment_ids=excluded.attachment_ids",
+                        payload
+                    )
+                elif op == "message":
+                    conn.execute(
+                        "INSERT OR IGNORE INTO messages (id, conversation_id, role, content, timestamp, model_used, attachment_id) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        payload
+                    )
+                elif op == "attachment":
+                    conn.execute(
+                        "INSERT OR IGNORE INTO attachments (id, content, created_at) VALUES (?, ?, ?)",
+                        payload
+                    )
+                elif op == "delete":
+                    conn.execute("DELETE FROM messages WHERE conversation_id = ?", payload)
+                    conn.execute("DELETE FROM conversations WHERE id = ?", payload)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self.batches_written += 1
+        self.ops_written += len(writes)
+
+    def load_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        pending_row, pending_messages, deleted = self._pending(conversation_id)
+        row, message_rows = None, []
+        if not deleted:
+            with self._reading() as conn:
+                row = conn.execute(
+                    "SELECT * FROM conversations WHERE id = ?", (conversation_id,)
+                ).fetchone()
+                if row is not None:
+                    message_rows = conn.execute(
+                        "SELECT id, role, content, timestamp, model_used, attachment_id FROM messages "
+                        "WHERE conversation_id = ? ORDER BY seq", (conversation_id,)
+                    ).fetchall()
+        row = pending_row or row
+        if row is None:
+            return None
+        return self._to_conversation(row, self._merge_messages(message_rows, pending_messages))
+
+    def list_conversations(self) -> List[Conversation]:
+        with self._pending_lock:
+            pending_rows = dict(self._pending_conversations)
+            pending_messages = {cid: list(rows.values()) for cid, rows in self._pending_messages.items()}
+            deleted = set(self._pending_deletes)
+        with self._reading() as conn:
+            rows = conn.execute(
+                "SELECT * FROM conversations ORDER BY updated_at DESC"
+            ).fetchall()
+            message_rows = conn.execute(
+                "SELECT conversation_id, id, role, content, timestamp, model_used, attachment_id FROM messages ORDER BY seq"
+            ).fetchall()
+        messages_by_conversation = {}
+        for message_row in message_rows:
+            if message_row[0] not in deleted:
+                messages_by_conversation.setdefault(message_row[0], []).append(message_row[1:])
+        rows_by_id = {row[0]: row for row in rows if row[0] not in deleted}
+        rows_by_id.update(pending_rows)
+        conversations = [
+            self._to_conversation(row, self._merge_messages(
+                messages_by_conversation.get(conversation_id, []), pending_messages.get(conversation_id, [])
+            ))
+            for conversation_id, row in rows_by_id.items()
+        ]
+        conversations.sort(key=lambda c: c.updated_at, reverse=True)
+        return conversations
+
+    def load_attachment(self, attachment_id: str) -> Optional[str]:
+        with self._pending_lock:
+            pending = self._pending_attachments.get(attachment_id)
+        if pending is not None:
+            return pending[1]
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT content FROM attachments WHERE id = ?", (attachment_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def message_bytes(self) -> int:
+        with self._pending_lock:
+            pending_messages = [row for rows in self._pending_messages.values() for row in rows.values()]
+            deleted = list(self._pending_deletes)
+        with self._reading() as conn:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM messages"
+            ).fetchone()[0]
+            for conversation_id in deleted:
+                total -= conn.execute(
+                    "SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM messages WHERE conversation_id = ?",
+                    (conversation_id,)
+                ).fetchone()[0]
+            unwritten = self._unwritten(conn, pending_messages)
+        return total + sum(len(row[3].encode("utf-8")) for row in unwritten)
+
+    def list_summaries(self) -> List[ConversationSummary]:
+        with self._pending_lock:
+            pending_rows = dict(self._pending_conversations)
+            pending_messages = [row for rows in self._pending_messages.values() for row in rows.values()]
+            deleted = set(self._pending_deletes)
+        with self._reading() as conn:
+            rows = conn.execute(
+                "SELECT c.id, c.title, c.created_at, c.updated_at, c.model_provider, c.model_name, "
+                "(SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.id) "
+                "FROM conversations c"
+            ).fetchall()
+            unwritten = self._unwritten(conn, pending_messages)
+        counts = {row[0]: row[6] for row in rows if row[0] not in deleted}
+        rows_by_id = {row[0]: row[:6] for row in rows if row[0] not in deleted}
+        for conversation_id, row in pending_rows.items():
+            rows_by_id[conversation_id] = row[:6]
+            counts.setdefault(conversation_id, 0)
+        for message_row in unwritten:
+            if message_row[1] in counts:
+                counts[message_row[1]] += 1
+        return [self._to_summary(metadata, counts[metadata[0]]) for metadata in rows_by_id.values()]
+
+    def stored_updated_at(self, conversation_id: str) -> Optional[datetime]:
+        pending_row, _, deleted = self._pending(conversation_id)
+        if pending_row is not None:
+            return datetime.fromisoformat(pending_row[3])
+        if deleted:
+            return None
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT updated_at FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def page_summaries(self, cursor: Optional[str] = None,
+                       limit: int = 50) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """Page through the ``updated_at`` index, merged with queued writes.
+
+        Each queued conversation row or delete can displace at most one
+        stored row from the page, so that many extra rows are fetched.
+        """
+        after = None
+        if cursor:
+            updated_at, conversation_id = decode_cursor(cursor)
+            after = (updated_at.isoformat(), conversation_id)
+        with self._pending_lock:
+            pending_rows = dict(self._pending_conversations)
+            deleted = set(self._pending_deletes)
+            pending_messages = [
+                row for conversation_id in pending_rows
+                for row in self._pending_messages.get(conversation_id, {}).values()
+            ]
+        fetch = limit + len(pending_rows) + len(deleted)
+        query = (
+            "SELECT c.id, c.title, c.created_at, c.updated_at, c.model_provider, c.model_name, "
+            "(SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.id) FROM conversations c "
+        )
+        params: tuple = ()
+        if after:
+            query += "WHERE c.updated_at < ? OR (c.updated_at = ? AND c.id > ?) "
+            params = (after[0], after[0], after[1])
+        query += "ORDER BY c.updated_at DESC, c.id LIMIT ?"
+        with self._reading() as conn:
+            rows = conn.execute(query, params + (fetch,)).fetchall()
+            # Stored counts of the queued conversations that are not on this page
+            stored_counts = dict(conn.execute(
+                f"SELECT conversation_id, COUNT(*) FROM messages WHERE conversation_id IN "
+                f"({','.join('?' * len(pending_rows))}) GROUP BY conversation_id", tuple(pending_rows)
+            ).fetchall()) if pending_rows else {}
+            unwritten = self._unwritten(conn, pending_messages)
+
+        candidates = {row[0]: (row[:6], row[6]) for row in rows if row[0] not in deleted and row[0] not in pending_rows}
+        for conversation_id, row in pending_rows.items():
+            if after is None or row[3] < after[0] or (row[3] == after[0] and conversation_id > after[1]):
+                count = 0 if conversation_id in deleted else stored_counts.get(conversation_id, 0)
+                candidates[conversation_id] = (row[:6], count)
+        for message_row in unwritten:
+            if message_row[1] in candidates:
+                metadata, count = candidates[message_row[1]]
+                candidates[message_row[1]] = (metadata, count + 1)
+
+        # Newest first, ties by id, like the SQL ordering (ISO timestamps sort as text)
+        ordered = sorted(candidates.values(), key=lambda c: c[0][0])
+        ordered.sort(key=lambda c: c[0][3], reverse=True)
+        page = [self._to_summary(metadata, count) for metadata, count in ordered[:limit]]
+        more = len(ordered) > limit or len(rows) == fetch
+        next_cursor = encode_cursor(page[-1].updated_at, page[-1].id) if page and more else None
+        return page, next_cursor
+
+    @staticmethod
+    def _to_summary(metadata: tuple, message_count: int) -> ConversationSummary:
+        conversation_id, title, created_at, updated_at, model_provider, model_name = metadata
+        return ConversationSummary(
+            id=conversation_id,
+            title=title,
+            created_at=datetime.fromisoformat(created_at),
+            updated_at=datetime.fromisoformat(updated_at),
+            model_provider=ModelProvider(model_provider),
+            model_name=model_name,
+            message_count=message_count
+        )
+
+    @staticmethod
+    def _merge_messages(message_rows, pending_messages: List[tuple]) -> list:
+        """Stored message rows followed by the queued ones not stored yet"""
+        stored = {row[0] for row in message_rows}
+        return list(message_rows) + [
+            (message_id, role, content, timestamp, model_used, attachment_id)
+            for message_id, _, role, content, timestamp, model_used, attachment_id in pending_messages
+            if message_id not in stored
+        ]
+
+    @staticmethod
+    def _to_conversation(row, message_rows) -> Conversation:
+        conversation_id, title, created_at, updated_at, model_provider, model_name, attachment_ids = row
+        return Conversation(
+            id=conversation_id,
+            title=title,
+            messages=[
+                Message(
+                    id=message_id,
+                    role=MessageRole(role),
+                    content=content,
+                    timestamp=datetime.fromisoformat(timestamp),
+                    model_used=model_used,
+                    attachment_id=attachment_id
+                )
+                for message_id, role, content, timestamp, model_used, attachment_id in message_rows
+            ],
+            created_at=datetime.fromisoformat(created_at),
+            updated_at=datetime.fromisoformat(updated_at),
+            model_provider=ModelProvider(model_provider),
+            model_name=model_name,
+            attachment_ids=json.loads(attachment_ids)
+        )
+
+def create_conversation_store(settings: Settings) -> ConversationStore:
+    """Build the storage backend selected by ``CONVERSATION_STORE``"""
+    if settings.conversation_store == "sqlite":
+        return SQLiteConversationStore(
+            path=settings.sqlite_path,
+            batch_size=settings.conversation_write_batch_size,
+            flush_interval_ms=settings.conversation_flush_interval_ms
+        )
+    if settings.conversation_store != "memory":
+        logger.warning(f"Unknown conversation store '{settings.conversation_store}', using in-memory storage")
+    return InMemoryConversationStore()
@@ -0,0 +1,167 @@
+import asyncio
+import gzip
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DISK_SUFFIX = ".txt.gz"
+
+class ExtractedTextCache:
+    """Two-tier cache of extracted document text keyed by the SHA-256 of the raw upload.
+
+    The memory tier is an LRU bounded by ``max_memory_bytes`` of text. The
+    optional disk tier keeps gzip-compressed text files in ``disk_dir``. It
+    is capped at ``max_disk_bytes`` of compressed data and evicts the least
+    recently used files first. It survives restarts, and processes pointing
+    at the same directory read each other's files; each process enforces the
+    cap on the files it has indexed. Disk reads and writes run in a thread.
+    """
+
+    def __init__(self, max_memory_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 max_disk_bytes: int = 1024 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self.memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        if disk_dir:
+            self._load_disk_index()
+        logger.info(f"ExtractedTextCache initialized (disk tier: {disk_dir or 'disabled'})")
+
+    def _load_disk_index(self):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(DISK_SUFFIX):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-len(DISK_SUFFIX)], stat.st_size))
+        # Oldest first, so the LRU order survives restarts
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self.disk_bytes += size
+        logger.info(f"Extracted text disk cache: {len(self._disk)} files, {self.disk_bytes} bytes")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + DISK_SUFFIX)
+
+    async def get(self, key: str, raw_size: int = 0) -> Optional[str]:
+        """Cached text for ``key``; ``raw_size`` (the upload size) counts towards bytes saved on a hit"""
+        text = self._memory.get(key)
+        if text is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            self.bytes_saved += raw_size
+            return text
+
+        if self.disk_dir:
+            text = await asyncio.to_thread(self._read_disk, key)
+            if text is not None:
+                self._remember(key, text)
+                self.disk_hits += 1
+                self.bytes_saved += raw_size
+                return text
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, text: str):
+        """Cache extracted text in memory and, if enabled, on disk"""
+        self._remember(key, text)
+        if self.disk_dir and key not in self._disk:
+            await asyncio.to_thread(self._write_disk, key, text)
+
+    def _remember(self, key: str, text: str):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = text
+        self.memory_bytes += len(text)
+        while self.memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                text = gzip.decompress(f.read()).decode("utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            logger.warning(f"Dropping unreadable cached text {key[:12]}: {e}")
+            self._drop_disk(key)
+            return None
+        with self._disk_lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            else:
+                # Written by another process sharing the directory
+                self._disk[key] = os.path.getsize(path)
+                self.disk_bytes += self._disk[key]
+        return text
+
+    def _write_disk(self, key: str, text: str):
+        data = gzip.compress(text.encode("utf-8"), compresslevel=6)
+        if len(data) > self.max_disk_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cached text {key[:12]}: {e}")
+            return
+        with self._disk_lock:
+            if key not in self._disk:
+                self._disk[key] = len(data)
+                self.disk_bytes += len(data)
+            evicted = []
+            while self.disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self.disk_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.unlink(self._path(old_key))
+            except OSError:
+                pass
+
+    def _drop_disk(self, key: str):
+        with self._disk_lock:
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self.disk_bytes -= size
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self.disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+        }
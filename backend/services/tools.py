@@ -1,45 +1,16 @@
-import os
+import logging
 from typing import Any, Dict, List
 from agents import RunContextWrapper, function_tool
-import tritonclient.http as httpclient
-import numpy as np
-import json
 
 from models.agent import AgentRunResultContext
+from services.search_client import SEARCHER
 
-
-TRITON_ENDPOINT_ENV = "TRITON_ENDPOINT"
-
-class Searcher:
-    def __init__(self, url: str):
-        self.client=httpclient.InferenceServerClient(url=url)
-    
-
-    def search(self, query: str, k: int, es_query: str = {}) -> List[Dict[str, Any]]:
-        inputs = [
-            httpclient.InferInput("Query", [1, 1], "BYTES"),
-            httpclient.InferInput("ElasticsearchQuery", [1], "BYTES"),
-            httpclient.InferInput("K", [1], "INT32")
-        ]
-
-        inputs[0].set_data_from_numpy(np.asarray([[query]], dtype=object))
-        inputs[1].set_data_from_numpy(np.array([json.dumps(es_query).encode('utf-8')], dtype=object))
-        inputs[2].set_data_from_numpy(np.array([k], dtype=np.int32))
-
-        response = self.client.infer(model_name='searcher', inputs=inputs)
-        responses = response.as_numpy('Responses')
-
-        results = [json.loads(f) for f in responses]
-        return results
-    
-# Gloabl instance
-SEARCHER = Searcher(url=os.getenv(TRITON_ENDPOINT_ENV))
-
+logger = logging.getLogger(__name__)
 
 # OpenAI function tool uses Python doc string to understand how to use the tool:
 # https://openai.github.io/openai-agents-python/tools/#function-tools
 @function_tool
-def job_search_tool(wrapper: RunContextWrapper[AgentRunResultContext], query: str, k: int) -> List[Dict[str, Any]]:
+async def job_search_tool(wrapper: RunContextWrapper[AgentRunResultContext], query: str, k: int) -> List[Dict[str, Any]]:
     """
     Search for job openings related to the given query and store results in shared context.
 
@@ -90,13 +61,16 @@ def job_search_tool(wrapper: RunContextWrapper[AgentRunResultContext], query: st
             - **score** (float): Relevance score from the search engine.
 
     Side Effects:
-        Updates ``wrapper.context.search_tool_results`` with an entry:
+        Records the search in the run context:
         
         .. code-block:: python
 
-            wrapper.context.search_tool_results[query] = <results>
+            wrapper.context.add_search_result(query, <results>)
         
-        where ``<results>`` is the returned list of job postings.
+        where ``<results>`` is the returned list of job postings. This maps
+        ``query`` to them in ``wrapper.context.search_tool_results`` and
+        makes it the latest of ``wrapper.context.search_queries``. The
+        oldest searches are evicted once the conversation's limit is reached.
 
     Example:
         >>> job_search_tool(wrapper, "machine learning engineer", 1)
@@ -109,8 +83,8 @@ def job_search_tool(wrapper: RunContextWrapper[AgentRunResultContext], query: st
             }
         ]
     """
-    results = SEARCHER.search(query=query, k=k)
+    results = await SEARCHER.search(query=query, k=k)
     # Add query -> search results to local context for agents:
     # https://openai.github.io/openai-agents-python/context/#local-context
-    wrapper.context.search_tool_results[query] = results
+    wrapper.context.add_search_result(query, results)
     return results
\ No newline at end of file
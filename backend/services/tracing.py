@@ -0,0 +1,364 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_SERVER_TIMING_UNSAFE = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]")
+
+# Span and trace ids come from a private generator, so tracing does not
+# disturb (or depend on) the seeded global ``random`` state
+_ids = random.Random()
+
+# Spans kept per request for the Server-Timing header
+MAX_TIMINGS_PER_TRACE = 256
+
+class _TraceTimings:
+    """Durations of the finished spans of one local request, by span name"""
+
+    __slots__ = ("totals", "spans")
+
+    def __init__(self):
+        self.totals: Dict[str, Tuple[float, int]] = {}
+        self.spans = 0
+
+    def add(self, name: str, seconds: float):
+        if self.spans < MAX_TIMINGS_PER_TRACE:
+            self.spans += 1
+            total, count = self.totals.get(name, (0.0, 0))
+            self.totals[name] = (total + seconds, count + 1)
+
+class Span:
+    """One timed operation in a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns",
+                 "error", "_start", "_timings")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any], timings: Optional[_TraceTimings]):
+        self.trace_id = trace_id
+        self.span_id = f"{_ids.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+        self._timings = timings
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns else time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class SpanExporter:
+    """Where finished spans go; ``export`` runs on the tracer's background thread"""
+
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def shutdown(self):
+        """Release resources"""
+
+class JsonLinesExporter(SpanExporter):
+    """Append one JSON object per span to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class OtlpJsonExporter(SpanExporter):
+    """Export spans as OTLP/JSON ``ExportTraceServiceRequest`` payloads.
+
+    With an ``endpoint`` (an OTLP/HTTP collector's ``/v1/traces`` URL) each
+    batch is POSTed there. Otherwise each batch is appended to ``path`` as
+    one line, the format the OpenTelemetry collector's file receiver reads,
+    so traces can be collected offline and replayed later.
+    """
+
+    def __init__(self, path: str = "", endpoint: str = "", service_name: str = "semantix-chat",
+                 timeout: float = 5.0):
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        if not endpoint:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "semantix.tracing"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [{"key": key, "value": _otlp_value(value)}
+                                   for key, value in span.attributes.items()],
+                    "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                } for span in spans],
+            }],
+        }]}
+
+    def export(self, spans: List[Span]):
+        body = json.dumps(self.payload(spans))
+        if self.endpoint:
+            request = urllib.request.Request(self.endpoint, data=body.encode("utf-8"),
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(body + "\n")
+
+# Current span of the running task
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class Tracer:
+    """Creates spans and hands finished ones to an exporter in the background.
+
+    Spans nest through a contextvar, so a span started in a request handler
+    is the parent of spans started in anything it awaits, including tasks it
+    creates. Export runs on a daemon thread in batches, so a slow file or
+    collector never blocks the event loop; when the queue is full the oldest
+    spans are dropped. Without an exporter spans are still timed, for the
+    ``Server-Timing`` header.
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, flush_interval: float = 1.0,
+                 max_queue: int = 4096, max_batch: int = 512):
+        self.exporter = exporter
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: Deque[Span] = deque(maxlen=max_queue)
+        self._wakeup = threading.Event()
+        self._export_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        # Extra source of the current parent span (the agents SDK bridge)
+        self.parent_resolver: Optional[Callable[[], Optional[Span]]] = None
+        self.exported = 0
+        self.dropped = 0
+
+    def configure(self, exporter: Optional[SpanExporter]):
+        self.exporter = exporter
+        self._closed = False
+
+    def current_span(self) -> Optional[Span]:
+        current = _current.get()
+        resolved = self.parent_resolver() if self.parent_resolver else None
+        if resolved is not None and (current is None or resolved.start_ns >= current.start_ns):
+            return resolved
+        return current
+
+    def start_span(self, name: str, parent: Optional[Span] = None, trace_id: Optional[str] = None,
+                   parent_id: Optional[str] = None, **attributes: Any) -> Span:
+        """Start a span as a child of ``parent`` (the current span by default),
+        or as the root of a new trace. Finish it with ``end_span``."""
+        parent = parent or (None if trace_id else self.current_span())
+        if parent is not None:
+            return Span(name, parent.trace_id, parent.span_id, attributes, parent._timings)
+        return Span(name, trace_id or f"{_ids.getrandbits(128):032x}", parent_id, attributes, _TraceTimings())
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None):
+        span.end_ns = span.start_ns + int((time.perf_counter() - span._start) * 1e9)
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if span._timings is not None and span.parent_id is not None:
+            span._timings.add(span.name, span.duration)
+        if self.exporter is not None and not self._closed:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(span)
+            if self._thread is None:
+                self._start_thread()
+            if len(self._queue) >= self.max_batch:
+                self._wakeup.set()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the ``with`` block as a child of the current span"""
+        span = self.start_span(name, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        """Make ``span`` the current span inside the block without ending it"""
+        token = _current.set(span)
+        try:
+            yield span
+        finally:
+            _current.reset(token)
+
+    def _start_thread(self):
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+
+    def _drain(self):
+        with self._export_lock:
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < self.max_batch:
+                    batch.append(self._queue.popleft())
+                try:
+                    self.exporter.export(batch)
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    def flush(self):
+        """Export everything queued so far"""
+        if self.exporter is not None:
+            self._drain()
+
+    def close(self):
+        """Flush queued spans and stop the export thread"""
+        self.flush()
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+        }
+
+def create_exporter(kind: str, path: str, otlp_endpoint: str = "") -> Optional[SpanExporter]:
+    """Exporter for the ``tracing_exporter`` setting: ``jsonl``, ``otlp`` or ``none``"""
+    kind = kind.lower()
+    if kind == "jsonl":
+        return JsonLinesExporter(path)
+    if kind == "otlp":
+        return OtlpJsonExporter(path=path, endpoint=otlp_endpoint)
+    if kind not in ("", "none"):
+        logger.warning(f"⚠️ Unknown tracing exporter {kind!r}; spans are not exported")
+    return None
+
+def server_timing(timings: _TraceTimings, total: float) -> str:
+    """``Server-Timing`` header value: time per span name, plus the total so far"""
+    entries = []
+    for name, (seconds, count) in timings.totals.items():
+        entry = f"{_SERVER_TIMING_UNSAFE.sub('_', name)};dur={seconds * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="{count} calls"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+class TracingMiddleware:
+    """Start a trace per HTTP request and report its breakdown to the client.
+
+    A W3C ``traceparent`` request header continues the caller's trace. The
+    response carries ``X-Trace-Id`` and, when ``server_timing`` is on, a
+    ``Server-Timing`` header with the time spent per span name up to the
+    start of the response (for streamed responses, up to the first byte).
+    """
+
+    def __init__(self, app: ASGIApp, tracer: "Tracer", server_timing: bool = True):
+        self.app = app
+        self.tracer = tracer
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = parent_id = None
+        traceparent = dict(scope["headers"]).get(b"traceparent")
+        if traceparent:
+            match = _TRACEPARENT_RE.match(traceparent.decode("latin-1").strip())
+            if match:
+                trace_id, parent_id = match.groups()
+        root = self.tracer.start_span(f"{scope['method']} {scope['path']}", trace_id=trace_id, parent_id=parent_id,
+                                      **{"http.method": scope["method"], "http.target": scope["path"]})
+
+        async def traced_send(message: Message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", root.trace_id.encode()))
+                if self.server_timing:
+                    headers.append((b"server-timing", server_timing(root._timings, root.duration).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with self.tracer.activate(root):
+            try:
+                await self.app(scope, receive, traced_send)
+            except BaseException as e:
+                self.tracer.end_span(root, e)
+                raise
+        self.tracer.end_span(root)
+
+# Global tracer
+tracer = Tracer()
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Batch size for writing uploads to disk
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+class UploadTooLarge(Exception):
+    """An upload crossed the configured size limit"""
+
+class BodySizeLimitMiddleware:
+    """Reject oversize request bodies on upload routes as early as possible.
+
+    A declared ``Content-Length`` over the limit is refused before any of the
+    body is read. Chunked bodies without a length are counted while they
+    stream in, and the request is cut off as soon as the running total crosses
+    the limit. The client gets a 413 instead of whatever the route would have
+    answered.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int, paths: Iterable[str]):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.paths = set(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_body_size:
+            logger.warning(f"Rejected upload to {scope['path']}: declared {int(declared)} bytes")
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    rejected = True
+                    logger.warning(f"Rejected upload to {scope['path']}: body exceeded {self.max_body_size} bytes")
+                    raise UploadTooLarge()
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal response_started
+            if rejected:
+                # Drop the route's own error response; the 413 goes out below
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            pass
+        if rejected and not response_started:
+            await self._reject(send)
+
+    async def _reject(self, send: Send):
+        body = json.dumps({"detail": f"Request body exceeds limit of {self.max_body_size} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+class ReceivedUpload(NamedTuple):
+    """The file part of a multipart upload, written to disk"""
+    filename: str
+    content_type: str
+    path: str
+    size: int
+    sha256: str
+
+async def receive_upload(request: Request, field: str, max_size: int, directory: Optional[str] = None,
+                         validate: Optional[Callable[[str], None]] = None) -> ReceivedUpload:
+    """Stream the ``field`` file part of a multipart request body to a named temp file.
+
+    The body is parsed as it arrives, so the file is written to disk once and
+    hashed on the way, in batches of about ``SPOOL_CHUNK_BYTES`` off the event
+    loop. ``validate`` is called with the filename as soon as the part headers
+    are in, and ``UploadTooLarge`` is raised as soon as the file crosses
+    ``max_size`` bytes, before the rest of the body is read; the partial file
+    is removed. Other parts are ignored. Raises ``ValueError`` if the body is
+    not multipart or has no such part. The caller deletes the returned file.
+    """
+    media_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise ValueError("Expected a multipart/form-data request body")
+
+    fd, path = tempfile.mkstemp(prefix="upload-", dir=directory)
+    target = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    headers: Dict[bytes, bytes] = {}
+    header_field = bytearray()
+    header_value = bytearray()
+    part: Optional[Dict[str, str]] = None
+    in_file = False
+    unvalidated = False
+    size = 0
+    buffer: List[bytes] = []
+    buffered = 0
+
+    def on_part_begin():
+        nonlocal in_file
+        headers.clear()
+        in_file = False
+
+    def on_header_field(data: bytes, start: int, end: int):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        nonlocal part, in_file, unvalidated
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        if part is None and disposition.get(b"name") == field.encode() and b"filename" in disposition:
+            part = {
+                "filename": disposition[b"filename"].decode("utf-8", "replace"),
+                "content_type": headers.get(b"content-type", b"").decode("latin-1")
+            }
+            in_file = True
+            unvalidated = validate is not None
+
+    def on_part_data(data: bytes, start: int, end: int):
+        nonlocal size, buffered
+        if not in_file:
+            return
+        size += end - start
+        if size > max_size:
+            raise UploadTooLarge()
+        buffer.append(data[start:end])
+        buffered += end - start
+
+    def on_part_end():
+        nonlocal in_file
+        in_file = False
+
+    def write(chunks: List[bytes]):
+        for chunk in chunks:
+            digest.update(chunk)
+            target.write(chunk)
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if unvalidated:
+                unvalidated = False
+                validate(part["filename"])
+            if buffered >= SPOOL_CHUNK_BYTES:
+                chunks, buffer, buffered = buffer, [], 0
+                await asyncio.to_thread(write, chunks)
+        parser.finalize()
+        if part is None:
+            raise ValueError(f"No '{field}' file in the request body")
+        await asyncio.to_thread(write, buffer)
+        target.close()
+        return ReceivedUpload(part["filename"], part["content_type"], path, size, digest.hexdigest())
+    except BaseException:
+        target.close()
+        os.unlink(path)
+        raise
@@ -84,30 +84,39 @@ function App() {
         message,
         model: selectedModel,
         conversationId: currentConversationId,
-        fileContent: uploadedFile?.content
+        fileId: uploadedFile?.file_id
       });
 
-      let response;
-      
-      if (currentConversationId) {
-        // Send to existing conversation
-        response = await chatAPI.sendMessage(
-          currentConversationId,
-          message,
-          selectedModel.provider,
-          selectedModel.name,
-          uploadedFile?.content || null
-        );
-      } else {
-        // Create new conversation
-        response = await chatAPI.sendStandaloneMessage(
-          message,
-          selectedModel.provider,
-          selectedModel.name,
-          null,
-          uploadedFile?.content || null
-        );
-        
+      // Show the user message and a placeholder reply that fills in as tokens stream
+      const now = new Date().toISOString();
+      const pendingMessages = [
+        { id: 'pending-user', role: 'user', content: message, timestamp: now, attachment_id: uploadedFile?.file_id || null },
+        { id: 'pending-assistant', role: 'assistant', content: '', timestamp: now },
+      ];
+      setCurrentConversation((prev) => ({
+        ...(prev || {}),
+        messages: [...(prev?.messages || []), ...pendingMessages],
+      }));
+
+      const response = await chatAPI.streamMessage(
+        currentConversationId,
+        message,
+        selectedModel.provider,
+        selectedModel.name,
+        uploadedFile?.file_id || null,
+        (eventName, data) => {
+          if (eventName !== 'delta') return;
+          setLoading(false);
+          setCurrentConversation((prev) => ({
+            ...prev,
+            messages: prev.messages.map((m) =>
+              m.id === 'pending-assistant' ? { ...m, content: m.content + data.content } : m
+            ),
+          }));
+        }
+      );
+
+      if (!currentConversationId) {
         // Update current conversation ID
         setCurrentConversationId(response.conversation_id);
       }
@@ -171,7 +180,7 @@ function App() {
         )}
         
         <ChatArea
-          messages={currentConversation?.messages || []}
+          messages={(currentConversation?.messages || []).filter((m) => m.id !== 'pending-assistant' || m.content)}
           loading={loading}
         />
         
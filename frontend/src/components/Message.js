@@ -37,7 +37,7 @@ const Message = ({ message }) => {
             // For user messages, render plain text to preserve formatting
             <div style={{ whiteSpace: 'pre-wrap' }}>
               {message.content}
-              {message.file_attachment && (
+              {message.attachment_id && (
                 <div style={{ marginTop: '12px', fontStyle: 'italic', opacity: 0.8 }}>
                   📎 File attached
                 </div>
@@ -42,10 +42,12 @@ export const chatAPI = {
     return response.data;
   },
 
-  // Get all conversations
-  getConversations: async () => {
-    const response = await api.get('/chat/conversations');
-    return response.data;
+  // Get conversation summaries for the sidebar (most recent first)
+  getConversations: async (limit = 100) => {
+    const response = await api.get('/chat/conversations/summaries', {
+      params: { limit },
+    });
+    return response.data.items;
   },
 
   // Create new conversation
@@ -73,13 +75,13 @@ export const chatAPI = {
   },
 
   // Send message
-  sendMessage: async (conversationId, message, modelProvider, modelName, fileContent = null) => {
+  sendMessage: async (conversationId, message, modelProvider, modelName, fileId = null) => {
     const requestData = {
       message,
       model_provider: modelProvider,
       model_name: modelName,
       conversation_id: conversationId,
-      file_content: fileContent,
+      file_id: fileId,
     };
     
     const response = await api.post(`/chat/conversations/${conversationId}/messages`, requestData);
@@ -87,19 +89,74 @@ export const chatAPI = {
   },
 
   // Send standalone message (creates conversation if needed)
-  sendStandaloneMessage: async (message, modelProvider, modelName, conversationId = null, fileContent = null) => {
+  sendStandaloneMessage: async (message, modelProvider, modelName, conversationId = null, fileId = null) => {
     const requestData = {
       message,
       model_provider: modelProvider,
       model_name: modelName,
       conversation_id: conversationId,
-      file_content: fileContent,
+      file_id: fileId,
     };
     
     const response = await api.post('/chat/message', requestData);
     return response.data;
   },
 
+  // Send message and stream the response (Server-Sent Events).
+  // onEvent is called with (eventName, data) for each event as it arrives;
+  // resolves with the final ChatResponse from the `done` event.
+  streamMessage: async (conversationId, message, modelProvider, modelName, fileId = null, onEvent = () => {}) => {
+    const requestData = {
+      message,
+      model_provider: modelProvider,
+      model_name: modelName,
+      conversation_id: conversationId,
+      file_id: fileId,
+    };
+
+    const response = await fetch(`${api.defaults.baseURL}/chat/conversations/${conversationId || 'new'}/messages/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(requestData),
+    });
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || `Request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let eventName = 'message';
+        let data = '';
+        frame.split('\n').forEach((line) => {
+          if (line.startsWith('event: ')) eventName = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        const payload = data ? JSON.parse(data) : null;
+
+        if (eventName === 'error') throw new Error(payload?.detail || 'Failed to send message');
+        if (eventName === 'done') result = payload;
+        onEvent(eventName, payload);
+      }
+    }
+
+    if (!result) throw new Error('Stream ended before the response completed');
+    return result;
+  },
+
   // Upload file
   uploadFile: async (file) => {
     const formData = new FormData();